@@ -0,0 +1,54 @@
+from PyQt5.QtWidgets import QLabel
+
+from QLed import QLed as KLed
+
+from Lock_methods import LOCKED, OUT_OF_RANGE, SIGNAL_ERROR, UNLOCKED
+from WLM_methods import get_wavelength_frequency_errors
+
+
+class StatusIndicators:
+    '''
+        Shows the lock state of the stabiliser: kled of the main window is green when locked and red otherwise,
+        the additional leds light up when PID went out of range (-42) or WLM reports a signal error.
+        The indicators only follow StabiliserSignals.lock_state, they never ask the WLM themselves
+    '''
+    TEXT = {UNLOCKED: "Unlocked", LOCKED: "Locked", SIGNAL_ERROR: "Signal error", OUT_OF_RANGE: "PID out of range"}
+
+    def __init__(self, ui):
+        '''
+            :param ui: Ui_MainWindow after setupUi
+        '''
+        self.kled = ui.kled
+        # the label next to kled shows the state as text
+        self.label = ui.label
+        parent = ui.verticalLayoutWidget
+        layout = ui.horizontalLayout_5
+        self.range_led = self._add_led(parent, layout, "PID range", KLed.Orange)
+        self.signal_led = self._add_led(parent, layout, "Signal", KLed.Yellow)
+        self.set_state(UNLOCKED, 0)
+
+    @staticmethod
+    def _add_led(parent, layout, name, colour):
+        layout.addWidget(QLabel(name, parent))
+        led = KLed(parent)
+        led.setOnColour(colour)
+        led.setOffColour(KLed.Grey)
+        layout.addWidget(led)
+        return led
+
+    def set_state(self, state: int, error: int):
+        '''
+            Slot for StabiliserSignals.lock_state
+
+            :param state: one of the states of Lock_methods
+            :param error: WLM error code for SIGNAL_ERROR
+        '''
+        self.kled.setValue(state == LOCKED)
+        self.range_led.setValue(state == OUT_OF_RANGE)
+        self.signal_led.setValue(state == SIGNAL_ERROR)
+        text = self.TEXT[state]
+        if(state == SIGNAL_ERROR):
+            message = get_wavelength_frequency_errors(error)
+            if(message is not None):
+                text = message
+        self.label.setText(text)
@@ -0,0 +1,76 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from Buffer_methods import MinMaxDecimator
+from GUI.workers import GUI_PERIOD
+
+# columns of the acquisition buffer and the units to show on the plots
+PLOTS = (('frequency', 'THz'), ('power', 'uW'), ('PID', 'mV'))
+
+
+class LivePlotWidget(QWidget):
+    '''
+        Tab with the live plots of frequency, power and PID against time.
+        The widget takes the new rows from the acquisition RingBuffer by its own timer,
+        so the acquisition never waits for the drawing. The whole history is kept decimated by min-max,
+        that's why hours of data are drawn as fast as seconds
+    '''
+    def __init__(self, buffer, parent = None, max_points = 2000, period = GUI_PERIOD):
+        '''
+            :param buffer: RingBuffer with the columns 'time' and the ones in PLOTS
+            :param parent: parent widget
+            :param max_points: max number of min-max buckets on every plot
+            :param period: refresh period in s
+        '''
+        super().__init__(parent)
+        self.buffer = buffer
+        self._read = buffer.count
+        self._t0 = None
+        layout = QVBoxLayout(self)
+        self.graphics = pg.GraphicsLayoutWidget(self)
+        layout.addWidget(self.graphics)
+        self.curves = {}
+        self.decimators = {}
+        previous = None
+        for name, unit in PLOTS:
+            plot = self.graphics.addPlot()
+            plot.setLabel('left', name, units=unit)
+            plot.showGrid(x=True, y=True)
+            plot.setClipToView(True)
+            if(previous is not None):
+                plot.setXLink(previous)
+            previous = plot
+            self.curves[name] = plot.plot(pen=pg.mkPen(width=1))
+            self.decimators[name] = MinMaxDecimator(max_points)
+            self.graphics.nextRow()
+        previous.setLabel('bottom', 'time', units='s')
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(period * 1000))
+
+    def clear(self):
+        self._t0 = None
+        self._read = self.buffer.count
+        for name in self.decimators:
+            self.decimators[name].clear()
+            self.curves[name].clear()
+
+    def refresh(self):
+        '''
+            Adds the rows measured since the previous refresh and redraws the curves
+        '''
+        rows, self._read = self.buffer.read_since(self._read)
+        if(rows.shape[1] == 0):
+            return
+        t = rows[self.buffer.index('time')]
+        if(self._t0 is None):
+            self._t0 = t[0]
+        t = t - self._t0
+        for name, _ in PLOTS:
+            y = rows[self.buffer.index(name)]
+            # negative frequencies and powers are error codes of WLM
+            valid = y > 0 if name != 'PID' else np.ones(len(y), dtype=bool)
+            self.decimators[name].add(t[valid], y[valid])
+            self.curves[name].setData(*self.decimators[name].curve())
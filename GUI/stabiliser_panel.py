@@ -0,0 +1,70 @@
+from PyQt5.QtCore import pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import (QComboBox, QDoubleSpinBox, QFormLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox,
+                             QVBoxLayout, QWidget)
+
+# the modes of the reference in the order of the combo box: (mode of the stabiliser, unit, decimals)
+MODES = ((True, "THz", 7), (False, "nm", 6))
+
+
+class StabiliserPanel(QWidget):
+    '''
+        Tab with the controls of the stabiliser: the reference as frequency or wavelength, the pause after
+        setting PID and the start/stop buttons. The panel only asks, the window starts the stabiliser in
+        a worker thread, and it shows the state the stabiliser sends whoever runs it
+    '''
+    # mode (True - frequency), reference in THz or nm, pause after setting PID in ms
+    start_requested = pyqtSignal(bool, float, int)
+    stop_requested = pyqtSignal()
+
+    def __init__(self, parent = None, reference = 400., time_pause = 100):
+        '''
+            :param parent: parent widget
+            :param reference: frequency in THz shown at the start
+            :param time_pause: pause after setting PID in ms shown at the start
+        '''
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.mode = QComboBox(self)
+        self.mode.addItems(["Frequency", "Wavelength"])
+        self.mode.currentIndexChanged.connect(self._set_unit)
+        form.addRow("Reference", self.mode)
+        self.reference = QDoubleSpinBox(self)
+        self.reference.setRange(0., 1e06)
+        form.addRow("", self.reference)
+        self.time_pause = QSpinBox(self)
+        self.time_pause.setRange(0, 10000)
+        self.time_pause.setSuffix(" ms")
+        self.time_pause.setValue(time_pause)
+        form.addRow("Pause after PID", self.time_pause)
+        layout.addLayout(form)
+        buttons = QHBoxLayout()
+        self.start_button = QPushButton("Start", self)
+        self.start_button.clicked.connect(self._start)
+        self.stop_button = QPushButton("Stop", self)
+        self.stop_button.clicked.connect(self.stop_requested.emit)
+        buttons.addWidget(self.start_button)
+        buttons.addWidget(self.stop_button)
+        layout.addLayout(buttons)
+        self.state_label = QLabel("", self)
+        layout.addWidget(self.state_label)
+        layout.addStretch()
+        self._set_unit(0)
+        self.reference.setValue(reference)
+
+    def _set_unit(self, index: int):
+        _, unit, decimals = MODES[index]
+        self.reference.setDecimals(decimals)
+        self.reference.setSuffix(" " + unit)
+
+    def _start(self):
+        mode = MODES[self.mode.currentIndex()][0]
+        self.start_requested.emit(mode, self.reference.value(), self.time_pause.value())
+
+    @pyqtSlot(float, float, float, bool)
+    def show_state(self, PID: float, frequency: float, delta: float, stabilised: bool):
+        '''
+            Slot for StabiliserSignals.state
+        '''
+        self.state_label.setText("PID %.3f mV   %.7f THz   delta %.3g THz   %s"
+                                 % (PID, frequency, delta, "stabilised" if stabilised else "settling"))
@@ -0,0 +1,49 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+
+class StabilityWidget(QWidget):
+    '''
+        Tab with the Allan deviation and the PSD of the locked frequency from a StabilityMonitor.
+        Both change slowly, so they are redrawn once per period
+    '''
+    def __init__(self, monitor, parent = None, period = 1.):
+        '''
+            :param monitor: StabilityMonitor fed by the stabiliser
+            :param parent: parent widget
+            :param period: refresh period in s
+        '''
+        super().__init__(parent)
+        self.monitor = monitor
+        layout = QVBoxLayout(self)
+        self.graphics = pg.GraphicsLayoutWidget(self)
+        layout.addWidget(self.graphics)
+        self.allan_plot = self.graphics.addPlot()
+        self.allan_plot.setLogMode(x=True, y=True)
+        self.allan_plot.setLabel('left', 'Allan deviation')
+        self.allan_plot.setLabel('bottom', 'tau', units='s')
+        self.allan_plot.showGrid(x=True, y=True)
+        self.allan_curve = self.allan_plot.plot(pen=pg.mkPen(width=1), symbol='o', symbolSize=5)
+        self.graphics.nextRow()
+        self.psd_plot = self.graphics.addPlot()
+        self.psd_plot.setLogMode(x=True, y=True)
+        self.psd_plot.setLabel('left', 'PSD', units='Hz^2/Hz')
+        self.psd_plot.setLabel('bottom', 'frequency', units='Hz')
+        self.psd_plot.showGrid(x=True, y=True)
+        self.psd_curve = self.psd_plot.plot(pen=pg.mkPen(width=1))
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(period * 1000))
+
+    def refresh(self):
+        deviations = self.monitor.deviations()
+        if(deviations):
+            tau, fractional, _, _ = zip(*deviations)
+            valid = np.array(fractional) > 0
+            self.allan_curve.setData(np.array(tau)[valid], np.array(fractional)[valid])
+        frequencies, psd = self.monitor.density()
+        # the log plot can't show the zero frequency
+        if(len(frequencies) > 1):
+            self.psd_curve.setData(frequencies[1:], psd[1:])
@@ -0,0 +1,208 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+import wlmData
+from Lock_methods import LockMonitor, OUT_OF_RANGE, SIGNAL_ERROR, UNLOCKED, classify_lock
+from Stabiliser_methods import Stabiliser
+
+# GUI refresh period in s. Workers never emit more often than that so the event loop of the GUI
+# isn't flooded when the WLM measures faster than the screen can show it
+GUI_PERIOD = 1 / 60
+
+
+class Worker(QObject):
+    '''
+        Base class for the objects that talk to the WLM from a separate QThread
+
+        Comment: the loop in run() blocks the event loop of the worker thread, so stop() is a plain
+        method setting a flag and not a slot
+    '''
+    finished = pyqtSignal(int)
+
+    def __init__(self, period = GUI_PERIOD):
+        '''
+            :param period: minimal time between two signals to the GUI in s
+        '''
+        super().__init__()
+        self.period = period
+        self._stop = threading.Event()
+        self._last_emit = 0.
+
+    def stop(self):
+        '''
+            Asks the worker to leave its loop. Can be called from any thread
+        '''
+        self._stop.set()
+
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _throttle(self) -> bool:
+        '''
+            Tells whether enough time passed since the last signal to the GUI
+
+            :return: True if the worker may emit now
+        '''
+        now = time.perf_counter()
+        if(now - self._last_emit >= self.period):
+            self._last_emit = now
+            return True
+        return False
+
+
+class AcquisitionWorker(Worker):
+    '''
+        Reads frequency, power and PID of the channel at the rate of the WLM
+        and sends the latest values to the GUI not more often than period.
+        If buffer is given every measurement is written there
+    '''
+    # time in s, frequency in THz, power in uW, PID in mV
+    measured = pyqtSignal(float, float, float, float)
+
+    def __init__(self, chan = 1, time_pause = 1, period = GUI_PERIOD, buffer = None):
+        '''
+            :param chan: channel to read
+            :param time_pause: pause between two readings in ms
+            :param period: minimal time between two signals to the GUI in s
+            :param buffer: RingBuffer with the columns ('time', 'frequency', 'power', 'PID') or None
+        '''
+        super().__init__(period)
+        self.chan = chan
+        self.time_pause = time_pause
+        self.buffer = buffer
+
+    def set_channel(self, chan: int):
+        self.chan = chan
+
+    @pyqtSlot()
+    def run(self):
+        self._stop.clear()
+        while(not self._stop.is_set()):
+            chan = self.chan
+            frequency = wlmData.dll.GetFrequencyNum(chan, 0)
+            power = wlmData.dll.GetPowerNum(chan, 0)
+            PID = wlmData.dll.GetDeviationSignalNum(chan, 0)
+            t = time.time()
+            if(self.buffer is not None):
+                self.buffer.append(t, frequency, power, PID)
+            if(self._throttle()):
+                self.measured.emit(t, frequency, power, PID)
+            time.sleep(self.time_pause / 1000)
+        self.finished.emit(0)
+
+
+class StabiliserSignals(QObject):
+    '''
+        Signals of a Stabiliser to the GUI whoever runs it (StabiliserWorker, RpcServer, RelockSupervisor,
+        the calibration). It's attached to the stabiliser once: its callback is chained before the callback the
+        stabiliser had (as RelockSupervisor does) and its on_finish reports the final state.
+        The changes of the lock state are debounced by LockMonitor and emitted at once, the state is throttled.
+        The signals are emitted from the thread of the stabiliser, Qt queues them to the GUI thread
+    '''
+    # PID in mV, frequency in THz, delta in THz, stabilised
+    state = pyqtSignal(float, float, float, bool)
+    # one of the states of Lock_methods, WLM error code
+    lock_state = pyqtSignal(int, int)
+
+    def __init__(self, stabiliser: Stabiliser, period = GUI_PERIOD):
+        '''
+            :param stabiliser: Stabiliser to follow
+            :param period: minimal time between two state signals in s
+        '''
+        super().__init__()
+        self.stabiliser = stabiliser
+        self.period = period
+        self.monitor = LockMonitor(self.lock_state.emit)
+        self._last_emit = 0.
+        self._callback = stabiliser.callback
+        self._on_finish = stabiliser.on_finish
+        stabiliser.callback = self._step
+        stabiliser.on_finish = self._finish
+
+    def _step(self, PID_current, frequency, delta, stabilised) -> bool:
+        lock = classify_lock(frequency, stabilised)
+        self.monitor.update(lock, int(frequency) if lock == SIGNAL_ERROR else 0)
+        now = time.perf_counter()
+        if(now - self._last_emit >= self.period):
+            self._last_emit = now
+            self.state.emit(PID_current, frequency, delta, stabilised)
+        if(self._callback is not None):
+            return self._callback(PID_current, frequency, delta, stabilised)
+        return False
+
+    def _finish(self, result):
+        self.monitor.force(OUT_OF_RANGE if result == -42 else UNLOCKED)
+        if(self._on_finish is not None):
+            self._on_finish(result)
+
+    def detach(self):
+        '''
+            Gives the stabiliser back its own callback and on_finish
+        '''
+        self.stabiliser.callback = self._callback
+        self.stabiliser.on_finish = self._on_finish
+
+
+class StabiliserWorker(Worker):
+    '''
+        Starts a Stabiliser (the same one RpcServer and the supervisors control) on the reference and waits
+        in the worker thread until it stops, so the GUI thread never calls the DLL. Emits finished(-42) if PID
+        went out of range and finished(0) if stopped. The stabiliser keeps its own settings (koef, channel,
+        detector, lookup, profiler, callbacks): what it does is shown by StabiliserSignals whoever started it
+    '''
+    def __init__(self, stabiliser: Stabiliser, mode: bool, reference_wl: float, start_PID_point = None):
+        '''
+            :param stabiliser: Stabiliser to run
+            :param mode: True - reference_wl is frequency
+            :param reference_wl: frequency in THz or wavelength in nm
+            :param start_PID_point: PID in mV to start from or None (see Stabiliser.set_reference)
+        '''
+        super().__init__()
+        self.stabiliser = stabiliser
+        self.mode = mode
+        self.reference_wl = reference_wl
+        self.start_PID_point = start_PID_point
+
+    def stop(self):
+        '''
+            Asks the stabiliser to stop without waiting for it. Can be called from any thread
+        '''
+        self._stop.set()
+        self.stabiliser.stop(0)
+
+    @pyqtSlot()
+    def run(self):
+        self._stop.clear()
+        self.stabiliser.set_reference(self.reference_wl, self.mode, self.start_PID_point)
+        self.stabiliser.wait()
+        answer = self.stabiliser.result
+        self.finished.emit(0 if answer is None else answer)
+
+
+def start_worker(worker: Worker) -> QThread:
+    '''
+        Moves the worker to a new thread and starts it. The thread quits as soon as the worker finishes
+
+        :param worker: the worker to start
+        :return: the started thread (keep the reference, otherwise Qt destroys it)
+    '''
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(thread.quit)
+    thread.start()
+    return thread
+
+
+def stop_worker(worker: Worker, thread: QThread):
+    '''
+        Stops the worker and waits until its thread ends
+
+        :param worker: the worker to stop
+        :param thread: the thread returned by start_worker
+    '''
+    worker.stop()
+    thread.quit()
+    thread.wait()
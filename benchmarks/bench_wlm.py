@@ -0,0 +1,244 @@
+'''
+    Benchmarks of the WLM methods against SimulatedDLL.
+
+    Every benchmark reports wall and CPU time, the number of measurements, samples per second,
+    DLL calls per measurement, peak Python memory and, for the stabilisers, the settle time.
+    The metrics that don't depend on the machine are compared with baseline.json (committed, written by --save),
+    the timings and the memory only with baseline.local.json (written by --save-local on this machine,
+    not committed).
+    The script exits with 1 if a metric got worse by more than the tolerance.
+
+    Usage:
+        python benchmarks/bench_wlm.py [--save] [--save-local] [--tolerance 0.25] [--only name ...]
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wlm'))
+
+import wlmConst
+import WLM_methods
+from Common_methods import del_mod, find_breadth_mod, find_max_mod
+from Simulator_methods import SimulatedDLL, SimulationLimit
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+LOCAL_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.local.json')
+
+# metric -> True if the greater value is the better one. Only these metrics are compared with the baselines.
+# PORTABLE are the same on any machine (the simulation is seeded), MACHINE depend on the machine and the
+# interpreter and are compared only with a baseline of this machine
+PORTABLE = {
+    "measurements": False,
+    "calls_per_measurement": False,
+    "settle_measurements": False,
+    "unsettled": False,
+}
+MACHINE = {
+    "wall": False,
+    "cpu": False,
+    "samples_per_s": True,
+    "peak_memory_kb": False,
+    "settle_s": False,
+}
+
+# frequency of the simulated laser at PID = 2048 mV and the reference of the stabilisers (PID = 1900 mV)
+FREQUENCY = 400.
+REFERENCE = FREQUENCY + WLM_methods.cDependFrequencyPID * (1900. - 2048.)
+
+
+def settle(trace, reference: float, precision = 1e-07):
+    '''
+        :param trace: trace of SimulatedDLL
+        :param reference: frequency in THz
+        :param precision: max deviation in THz
+        :return: (time in s, number of measurements) until the frequency is within precision from the reference
+                 - tuple pack, (None, None) if it never is
+    '''
+    for i, (moment, PID, frequency) in enumerate(trace):
+        if(abs(frequency - reference) < precision):
+            return moment - trace[0][0], i + 1
+    return None, None
+
+
+def run(sim: SimulatedDLL, function, reference = None):
+    '''
+        Runs function with sim installed in place of wlmData.dll and measures it
+
+        :param sim: SimulatedDLL to use
+        :param function: function without arguments. SimulationLimit raised in it ends the run
+        :param reference: frequency in THz to measure the settle time to, or None
+        :return: dictionary of the metrics
+    '''
+    sim.install()
+    tracemalloc.start()
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    try:
+        # the old methods print their progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+    except SimulationLimit:
+        pass
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        sim.uninstall()
+    measurements = sim.measurements
+    metrics = {
+        "wall": wall,
+        "cpu": cpu,
+        "measurements": measurements,
+        "samples_per_s": measurements / wall if wall > 0 else 0.,
+        "calls_per_measurement": sum(sim.calls.values()) / measurements if measurements else 0.,
+        "peak_memory_kb": peak / 1024,
+    }
+    if(reference is not None and sim.trace is not None):
+        metrics["settle_s"], metrics["settle_measurements"] = settle(sim.trace, reference)
+    return metrics
+
+
+def bench_reference_const_PID_stabilisator():
+    # 200 locks from 2048 mV to references 1000 - 3000 mV, each stops when stabilised or after 1000 iterations
+    sim = SimulatedDLL(FREQUENCY, seed=1)
+    iterations = []
+
+    def locks():
+        for PID in range(1000, 3000, 10):
+            reference = FREQUENCY + sim.koef * (PID - 2048.)
+            iterations.append(0)
+
+            def callback(PID_current, frequency, delta, stabilised):
+                iterations[-1] += 1
+                return stabilised or iterations[-1] >= 1000
+            WLM_methods.reference_const_PID_stabilisator(True, reference, sim.koef, 4096, 0, 2048., callback=callback)
+    metrics = run(sim, locks)
+    metrics["settle_measurements"] = sum(iterations) / len(iterations)
+    metrics["unsettled"] = sum(1 for n in iterations if n >= 1000)
+    return metrics
+
+
+def bench_wl_stabilisation_through_PID_const():
+    sim = SimulatedDLL(FREQUENCY, limit=20000, trace=True, seed=1)
+    reference_wl = sim.ConvertUnit(REFERENCE, wlmConst.cReturnFrequency,
+                                   wlmConst.cReturnWavelengthVac)
+    return run(sim, lambda: WLM_methods.wl_stabilisation_through_PID_const(reference_wl, sim.koef, 200, 0, 10, 2048.),
+               REFERENCE)
+
+
+def bench_wavelength_regulation():
+    sim = SimulatedDLL(FREQUENCY, seed=1)
+    wave = sim.ConvertUnit(FREQUENCY, wlmConst.cReturnFrequency, wlmConst.cReturnWavelengthVac)
+    return run(sim, lambda: WLM_methods.wavelength_regulation(5000, wave, 1e-06, 0, 0, 6))
+
+
+def bench_find_k():
+    sim = SimulatedDLL(FREQUENCY, noise=1e-08, seed=1)
+    return run(sim, lambda: WLM_methods.find_k(5000, 0.5, 100., 0))
+
+
+def bench_find_k2():
+    sim = SimulatedDLL(FREQUENCY, noise=1e-08, seed=1)
+    return run(sim, lambda: WLM_methods.find_k2(5000, 0.5, 100.))
+
+
+def bench_mode_analysis():
+    # spectrum of 20 resonances taken point by point as stepping_PID_course does, then all the modes are found
+    # and deleted one after another
+    modes = [(FREQUENCY - 6e-03 + 6e-04 * i, 5e-05, 1. + 0.1 * i) for i in range(20)]
+    sim = SimulatedDLL(FREQUENCY, modes=modes, seed=1)
+
+    def analysis():
+        frequencies = []
+        powers = []
+        meter = sim.power_meter()
+        for i in range(20000):
+            # down from 4000 mV so the frequencies go up as the mode analysis expects
+            sim.SetDeviationSignalNum(1, 4000. - i * 0.2)
+            frequencies.append(sim.GetFrequencyNum(1, 0))
+            powers.append(meter.read)
+        for _ in modes:
+            peak, frequency, index = find_max_mod(frequencies, powers)
+            breadth = find_breadth_mod(frequencies, powers, index)
+            del_mod(frequencies, powers, index, breadth)
+    return run(sim, analysis)
+
+
+# triangle_PID_course isn't benchmarked: it passes its stabilisation_time and start_PID_point to
+# reference_const_PID_stabilisator in the places of start_PID_point and chan, and without a callback that
+# stabiliser returns only when PID leaves the range, so a run would time a stabiliser started from a wrong PID
+# and never reach the triangle
+BENCHMARKS = {
+    "reference_const_PID_stabilisator": bench_reference_const_PID_stabilisator,
+    "wl_stabilisation_through_PID_const": bench_wl_stabilisation_through_PID_const,
+    "wavelength_regulation": bench_wavelength_regulation,
+    "find_k": bench_find_k,
+    "find_k2": bench_find_k2,
+    "mode_analysis": bench_mode_analysis,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, checked = PORTABLE):
+    '''
+        :param results: name -> metrics of this run
+        :param baseline: name -> metrics of the baseline
+        :param tolerance: allowed relative worsening
+        :param checked: metric -> True if the greater value is the better one
+        :return: list of (name, metric, baseline value, value) of the regressions
+    '''
+    regressions = []
+    for name, metrics in results.items():
+        for metric, greater_better in checked.items():
+            old = baseline.get(name, {}).get(metric)
+            new = metrics.get(metric)
+            if(old is None or new is None or old == 0):
+                continue
+            worse = (old - new) / old if greater_better else (new - old) / old
+            if(worse > tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the WLM methods against SimulatedDLL")
+    parser.add_argument("--save", action="store_true", help="save the machine independent results as the baseline")
+    parser.add_argument("--save-local", action="store_true", help="save all the results as the baseline of this machine")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative worsening")
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    args = parser.parse_args(argv)
+    names = args.only if args.only else list(BENCHMARKS)
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name]()
+        print("%-36s %s" % (name, ", ".join("%s=%.4g" % (k, v) for k, v in results[name].items() if v is not None)))
+    if(args.save or args.save_local):
+        if(args.save):
+            portable = {name: {k: v for k, v in metrics.items() if k in PORTABLE} for name, metrics in results.items()}
+            with open(BASELINE, "w") as f:
+                json.dump(portable, f, indent=2, sort_keys=True)
+        if(args.save_local):
+            with open(LOCAL_BASELINE, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        return 0
+    regressions = []
+    for path, checked in ((BASELINE, PORTABLE), (LOCAL_BASELINE, MACHINE)):
+        if(not os.path.exists(path)):
+            print("No %s, run with %s" % (os.path.basename(path), "--save" if path == BASELINE else "--save-local"))
+            continue
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions += compare(results, baseline, args.tolerance, checked)
+    for name, metric, old, new in regressions:
+        print("REGRESSION %s %s: %.4g -> %.4g" % (name, metric, old, new))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,148 @@
-import sys, time
+import os, sys
 from PyQt5 import QtWidgets,QtCore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wlm'))
+
+import wlmData
+from Buffer_methods import RingBuffer
+from Cache_methods import ReadCache
+from Dispatcher_methods import DllDispatcher
+from Event_methods import EventPump
+from Lookup_methods import PIDLookup
+from Rpc_methods import RpcServer
+from Stabiliser_methods import Stabiliser
+from Stability_methods import StabilityMonitor
+from Telemetry_methods import TelemetryServer
+from WLM_methods import cDependFrequencyPID
+from GUI.indicators import StatusIndicators
+from GUI.live_plot import LivePlotWidget
+from GUI.stabiliser_panel import StabiliserPanel
+from GUI.stability_plot import StabilityWidget
 from GUI.ui_Quptic import Ui_MainWindow
+from GUI.workers import AcquisitionWorker, StabiliserSignals, StabiliserWorker, start_worker, stop_worker
+
+
+class MainWindow(QtWidgets.QMainWindow):
+    '''
+        Main window of Quptic. The WLM is read only by the workers, the window only shows what they send
+    '''
+    def __init__(self, pump: EventPump):
+        '''
+            :param pump: the EventPump of the process
+        '''
+        super().__init__()
+        self.ui = Ui_MainWindow()
+        self.ui.setupUi(self)
+        # the radio buttons choose the channel in the order they are shown
+        self.channel_buttons = [self.ui.radioButton_2, self.ui.radioButton_4, self.ui.radioButton_9,
+                                self.ui.radioButton_10, self.ui.radioButton_8, self.ui.radioButton_7,
+                                self.ui.radioButton_6, self.ui.radioButton_5, self.ui.radioButton_3,
+                                self.ui.radioButton]
+        for chan, button in enumerate(self.channel_buttons, 1):
+            button.setText("Channel %d" % chan)
+            button.toggled.connect(lambda checked, chan=chan: checked and self.set_channel(chan))
+        self.ui.label_2.setText("")
+        self.indicators = StatusIndicators(self.ui)
+
+        self.buffer = RingBuffer(('time', 'frequency', 'power', 'PID'))
+        self.live_plot = LivePlotWidget(self.buffer)
+        self.ui.tabWidget.addTab(self.live_plot, "Live plot")
+        self.stability = StabilityMonitor()
+        self.stability_plot = StabilityWidget(self.stability)
+        self.ui.tabWidget.addTab(self.stability_plot, "Stability")
+        self.acquisition = AcquisitionWorker(buffer=self.buffer)
+        self.acquisition.measured.connect(self.show_measurement)
+        self.acquisition_thread = start_worker(self.acquisition)
+        # other processes get the measurements from here instead of loading the DLL
+        self.telemetry = TelemetryServer()
+        pump.add_listener(self.telemetry.on_event)
+        # one sample per measurement with the time stamp of WLM, the stabiliser only tells when it's locked
+        pump.add_listener(self.stability.on_event)
+        # the one stabiliser of the process: the GUI runs it through StabiliserWorker, remote clients through RPC
+        # the PID of a new reference is taken from the table of the past sweeps and stabilisations
+        self.lookup = PIDLookup(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pid_lookup.npz'))
+        self._stability_step = self.stability.stabiliser_callback()
+        self.stabiliser = Stabiliser(lookup=self.lookup, callback=self._stabiliser_step,
+                                     on_finish=lambda result: self.stability.set_locked(False))
+        # the indicators, the telemetry and the statistics follow the stabiliser whoever runs it
+        self.stabiliser_signals = StabiliserSignals(self.stabiliser)
+        self.stabiliser_signals.lock_state.connect(self.indicators.set_state)
+        self.stabiliser_panel = StabiliserPanel()
+        self.ui.tabWidget.addTab(self.stabiliser_panel, "Stabiliser")
+        self.stabiliser_panel.start_requested.connect(
+            lambda mode, reference_wl, time_pause: self.start_stabiliser(mode, reference_wl, cDependFrequencyPID,
+                                                                         4096, time_pause))
+        self.stabiliser_panel.stop_requested.connect(self.stop_stabiliser)
+        self.stabiliser_signals.state.connect(self.stabiliser_panel.show_state)
+        self.rpc = RpcServer(stabiliser=self.stabiliser)
+        self.rpc.start()
+        self.stabiliser_worker = None
+        self.stabiliser_thread = None
+        self.channel_buttons[0].setChecked(True)
+
+    def set_channel(self, chan: int):
+        self.acquisition.set_channel(chan)
+        self.live_plot.clear()
+
+    def show_measurement(self, t, frequency, power, PID):
+        self.ui.label_2.setText("%.7f THz   %.2f uW   %.3f mV" % (frequency, power, PID))
+
+    def start_stabiliser(self, mode: bool, reference_wl: float, koef: float, max_PID_val: int, time_pause: int,
+                         start_PID_point = None):
+        '''
+            Starts the stabiliser in its own thread on the chosen channel. Without start_PID_point it starts from
+            the PID the lookup gives for the reference or from the current PID
+        '''
+        self.stop_stabiliser()
+        self.stability.reset()
+        self.stability.chan = self.acquisition.chan
+        self.stabiliser.koef = koef
+        self.stabiliser.max_PID_val = max_PID_val
+        self.stabiliser.time_pause = time_pause
+        self.stabiliser.chan = self.acquisition.chan
+        self.stabiliser_worker = StabiliserWorker(self.stabiliser, mode, reference_wl, start_PID_point)
+        self.stabiliser_thread = start_worker(self.stabiliser_worker)
+
+    def _stabiliser_step(self, PID_current, frequency, delta, stabilised) -> bool:
+        '''
+            Callback of the stabiliser: publishes its status and gives the stability statistics the lock state
+        '''
+        chan = self.stabiliser.chan
+        self.stability.chan = chan
+        self.telemetry.publish_status(chan, PID_current, frequency, delta, stabilised)
+        return self._stability_step(PID_current, frequency, delta, stabilised)
+
+    def stop_stabiliser(self):
+        if(self.stabiliser_worker is not None):
+            stop_worker(self.stabiliser_worker, self.stabiliser_thread)
+            self.stabiliser_worker = None
+            self.stabiliser_thread = None
+            if(self.stability.count > 0):
+                print(self.stability.report())
+        # it can be running for a remote client too
+        self.stabiliser.stop()
+
+    def closeEvent(self, event):
+        self.stop_stabiliser()
+        self.rpc.close()
+        stop_worker(self.acquisition, self.acquisition_thread)
+        self.telemetry.close()
+        super().closeEvent(event)
+
 
 if __name__ == '__main__':
+    wlmData.LoadDLL(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wlm', 'wlmData.dll')
+                    if os.name == 'nt' else 'libwlmData.so')
+    # the workers, the telemetry and the GUI call the DLL from different threads
+    dispatcher = DllDispatcher()
+    dispatcher.install()
+    # the same values are read by several workers, they are taken from the DLL once per measurement
+    cache = ReadCache()
+    cache.install()
+    pump = EventPump()
+    pump.add_listener(cache.on_event)
+    pump.start()
     app = QtWidgets.QApplication(sys.argv)
-    window = QtWidgets.QMainWindow()
-    ui = Ui_MainWindow()
-    ui.setupUi(window)
+    window = MainWindow(pump)
     window.show()
-    ui.kled.setValue(False)
-    time.sleep(3)
-    ui.kled.setValue(True)
-    time.sleep(3)
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
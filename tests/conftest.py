@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# the methods import each other by their flat names, as in main.py and the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wlm'))
+
+import wlmData
+
+
+@pytest.fixture(autouse=True)
+def restore_dll():
+    '''
+        Gives back wlmData.dll after a test which installed a proxy
+    '''
+    dll = wlmData.dll
+    yield
+    wlmData.dll = dll
@@ -0,0 +1,68 @@
+import numpy as np
+
+from Buffer_methods import MinMaxDecimator, RingBuffer
+
+
+def test_ring_buffer_wraps():
+    buffer = RingBuffer(('time', 'frequency'), capacity=4)
+    for i in range(3):
+        buffer.append(i, 10 * i)
+    rows, count = buffer.read_since(0)
+    assert count == 3
+    assert rows[0].tolist() == [0, 1, 2]
+    for i in range(3, 6):
+        buffer.append(i, 10 * i)
+    assert len(buffer) == 4
+    assert buffer.count == 6
+    # the rows 3, 4, 5 are new, but only the last 4 rows are kept in order across the end of the array
+    rows, count = buffer.read_since(0)
+    assert count == 6
+    assert rows[0].tolist() == [2, 3, 4, 5]
+    assert rows[1].tolist() == [20, 30, 40, 50]
+    rows, _ = buffer.read_since(4)
+    assert rows[0].tolist() == [4, 5]
+    rows, _ = buffer.read_since(6)
+    assert rows.shape == (2, 0)
+    assert buffer.snapshot()['frequency'].tolist() == [20, 30, 40, 50]
+
+
+def test_ring_buffer_skips_overwritten_rows():
+    buffer = RingBuffer(('x',), capacity=4)
+    for i in range(10):
+        buffer.append(i)
+    rows, count = buffer.read_since(1)
+    assert count == 10
+    assert rows[0].tolist() == [6, 7, 8, 9]
+
+
+def test_min_max_decimator_keeps_extremes():
+    rng = np.random.RandomState(0)
+    x = np.arange(100000, dtype=float)
+    y = rng.randn(len(x))
+    y[12345] = 100.
+    y[67890] = -100.
+    decimator = MinMaxDecimator(max_points=500)
+    for start in range(0, len(x), 777):
+        decimator.add(x[start:start + 777], y[start:start + 777])
+    cx, cy = decimator.curve()
+    assert len(cx) == len(cy)
+    assert len(cx) <= 2 * decimator.max_points + decimator.block
+    assert cy.max() == 100.
+    assert cy.min() == -100.
+    assert np.all(np.diff(cx) >= 0)
+    assert np.isin(cx, x).all()
+
+
+def test_min_max_decimator_buckets():
+    x = np.arange(10, dtype=float)
+    y = np.array([3., 1., 4., 1., 5., 9., 2., 6., 5., 3.])
+    decimator = MinMaxDecimator(max_points=2)
+    decimator.add(x, y)
+    # 10 buckets of 1 -> 5 of 2 -> [0-3] [4-7] [8-9] -> [0-7] [8-9], the odd bucket at the end isn't merged
+    assert decimator.block == 8
+    cx, cy = decimator.curve()
+    assert cx.tolist() == [0., 0., 8., 8.]
+    assert cy.tolist() == [1., 9., 3., 5.]
+    decimator.clear()
+    assert decimator.block == 1
+    assert len(decimator.curve()[0]) == 0
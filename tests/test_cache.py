@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+import wlmConst
+import wlmData
+from Cache_methods import CachedDLL, ReadCache
+from Simulator_methods import SimulatedDLL
+from WLM_methods import get_frequency, set_PID_const
+
+
+def test_reads_are_kept_until_the_next_measurement():
+    sim = SimulatedDLL(noise=1e-06, seed=1)
+    cache = ReadCache(sim, max_age=10., wait=False)
+    first = cache.read("GetFrequencyNum", 1, 0.)
+    assert cache.read("GetFrequencyNum", 1, 0.) == first
+    assert (cache.hits, cache.misses, sim.calls["GetFrequencyNum"]) == (1, 1, 1)
+    cache.on_event(wlmConst.cmiNowTick, 17, 0.)
+    assert cache.tick == 17
+    assert cache.read("GetFrequencyNum", 1, 0.) != first
+    assert sim.calls["GetFrequencyNum"] == 2
+
+
+def test_max_age():
+    sim = SimulatedDLL()
+    cache = ReadCache(sim, max_age=0.01, wait=False)
+    cache.read("GetPowerNum", 1, 0)
+    time.sleep(0.02)
+    cache.read("GetPowerNum", 1, 0)
+    assert cache.misses == 2
+
+
+def test_setting_invalidates():
+    sim = SimulatedDLL()
+    cache = ReadCache(sim, max_age=10., wait=False)
+    wlmData.dll = CachedDLL(cache)
+    assert get_frequency(1) == 400.
+    assert set_PID_const(1, 2048. + 1e-03 / sim.koef) == 0
+    assert get_frequency(1) == pytest.approx(400.001)
+    assert cache.tick == 1
+
+
+def test_second_read_waits_for_the_next_measurement():
+    sim = SimulatedDLL()
+    cache = ReadCache(sim, max_age=1.)
+    cache.read("GetFrequencyNum", 1, 0.)
+    # another thread keeps the cache of its own
+    other = []
+    thread = threading.Thread(target=lambda: other.append(cache.read("GetFrequencyNum", 1, 0.)))
+    thread.start()
+    thread.join()
+    assert other == [400.] and cache.waits == 0
+    timer = threading.Timer(0.05, cache.on_event, (wlmConst.cmiNowTick, 5, 0.))
+    start = time.perf_counter()
+    timer.start()
+    cache.read("GetFrequencyNum", 1, 0.)
+    waited = time.perf_counter() - start
+    assert 0.04 < waited < 0.9
+    assert cache.waits == 1 and cache.tick == 5
+    assert sim.calls["GetFrequencyNum"] == 2
+
+
+def test_wait_is_limited_by_max_age():
+    sim = SimulatedDLL()
+    cache = ReadCache(sim, max_age=0.02)
+    cache.read("GetFrequencyNum", 1, 0.)
+    start = time.perf_counter()
+    cache.read("GetFrequencyNum", 1, 0.)
+    assert time.perf_counter() - start >= 0.015
+    assert cache.waits == 1 and cache.misses == 2
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+import wlmConst
+from Calibration_methods import CalibrationManager
+from Simulator_methods import SimulatedDLL
+from Stabiliser_methods import Stabiliser
+
+
+class CalibratingDLL(SimulatedDLL):
+    '''
+        SimulatedDLL with the calibration and the autocalibration settings of WLM. Calibration takes duration s
+        and counts the calls of the stabiliser made meanwhile
+    '''
+    def __init__(self, duration = 0.05, answer = wlmConst.ResERR_NoErr, **kwargs):
+        super().__init__(**kwargs)
+        self.duration = duration
+        self.answer = answer
+        self.calibrations = 0
+        self.during = None
+        self.auto_cal = {"mode": 1, wlmConst.cmiAutoCalPeriod: 2, wlmConst.cmiAutoCalUnit: wlmConst.cACHours}
+
+    def Calibration(self, source_type, unit, value, chan):
+        self.calibrations += 1
+        before = self.calls["SetDeviationSignalNum"] + self.calls["GetWavelengthNum"]
+        time.sleep(self.duration)
+        self.during = self.calls["SetDeviationSignalNum"] + self.calls["GetWavelengthNum"] - before
+        return self.answer
+
+    def GetAutoCalMode(self, value):
+        return self.auto_cal["mode"]
+
+    def SetAutoCalMode(self, mode):
+        self.auto_cal["mode"] = mode
+        return wlmConst.ResERR_NoErr
+
+    def GetAutoCalSetting(self, setting, value, p2, reserved):
+        value._obj.value = self.auto_cal[setting]
+        return wlmConst.ResERR_NoErr
+
+
+def test_stabiliser_is_held_while_calibrating():
+    sim = CalibratingDLL(noise=2e-06, seed=5)
+    sim.install()
+    stabiliser = Stabiliser(time_pause=0)
+    stabiliser.set_reference(400., True, 2048)
+    thread = stabiliser._thread
+    manager = CalibrationManager(stabilisers=[stabiliser, Stabiliser()])
+    assert manager.calibrate() == wlmConst.ResERR_NoErr
+    assert sim.during == 0
+    record = manager.history[-1]
+    assert record.downtime >= sim.duration
+    assert manager.last == record.time and manager.failures == 0
+    # resumed in the same thread
+    time.sleep(0.02)
+    assert stabiliser.running and not stabiliser.paused and stabiliser._thread is thread
+    calls = sim.calls["GetWavelengthNum"]
+    time.sleep(0.02)
+    assert sim.calls["GetWavelengthNum"] > calls
+    stabiliser.stop()
+
+
+def test_calibration_waits_for_the_measurements():
+    sim = CalibratingDLL(duration=0.)
+    sim.install()
+    manager = CalibrationManager(min_idle=0.05)
+    done = threading.Event()
+    with manager.busy():
+        assert not manager.idle and not manager.step()
+        thread = threading.Thread(target=lambda: manager.calibrate() or done.set())
+        thread.start()
+        assert not done.wait(0.05)
+        assert sim.calibrations == 0
+    thread.join(2)
+    assert sim.calibrations == 1
+    # just calibrated: neither due nor idle
+    assert not manager.due and not manager.idle and not manager.step()
+
+
+def test_step_calibrates_when_due_and_idle():
+    sim = CalibratingDLL(duration=0.)
+    sim.install()
+    manager = CalibrationManager(period=0.05, min_idle=0.)
+    assert manager.step()
+    assert not manager.step()
+    time.sleep(0.06)
+    assert list(manager.guard(iter(range(3)))) == [0, 1, 2]
+    assert manager.step()
+    times, effects = manager.effects()
+    assert len(times) == 2 and sim.calibrations == 2
+
+
+def test_failures_back_off_up_to_the_period():
+    sim = CalibratingDLL(duration=0., answer=wlmConst.ResERR_WlmMissing)
+    sim.install()
+    manager = CalibrationManager(period=25., min_idle=0., retry=10.)
+    assert manager.calibrate() == wlmConst.ResERR_WlmMissing
+    assert manager.failures == 1 and manager.last is None
+    assert not manager.due
+    manager.failed -= 10.
+    assert manager.due
+    manager.calibrate()
+    manager.failed -= 19.
+    # 20 s after two failures
+    assert not manager.due
+    manager.failed -= 1.
+    assert manager.due
+    manager.calibrate()
+    # 40 s after three failures, but the period is 25 s
+    manager.failed -= 25.
+    assert manager.due
+    assert manager.effects() == ([], [])
+    sim.answer = wlmConst.ResERR_NoErr
+    manager.calibrate()
+    assert manager.failures == 0 and manager.failed is None
+
+
+def test_autocalibration_is_taken_over():
+    sim = CalibratingDLL()
+    sim.install()
+    manager = CalibrationManager(period=100.)
+    assert manager.auto_cal_settings() == {"mode": 1, "period": 2, "unit": wlmConst.cACHours, "seconds": 7200.}
+    manager.take_over()
+    assert manager.period == pytest.approx(7200.)
+    assert sim.auto_cal["mode"] == 0
+    manager.give_back()
+    assert sim.auto_cal["mode"] == 1
@@ -0,0 +1,19 @@
+from Config_methods import ORDER, WlmConfig
+
+
+def test_diff_order():
+    config = (WlmConfig().set_deviation_mode(True).set_pid(1, 1, 5, 0.5).set_exposure(1, 20)
+              .set_exposure_mode(1, False).set_averaging(1, 2, 4).set_interval(100).set_wide_mode(1))
+    changed = config.diff(WlmConfig())
+    assert [key[0] for key, _ in changed] == [kind for kind in ORDER if kind in
+                                               ("wide_mode", "interval", "averaging", "exposure_mode", "exposure",
+                                                "pid", "deviation_mode")]
+    assert changed[-2] == (("pid", 1, 1), (5, 0.5))
+
+
+def test_diff_only_changed():
+    config = WlmConfig().set_exposure(1, 20).set_exposure(2, 30).set_trigger_rate(100.).set_pid(1, 1, 5, 0.5)
+    current = WlmConfig({("exposure", 1, 1): 20, ("exposure", 2, 1): 10, ("trigger_rate",): 100. + 1e-12,
+                         ("pid", 1, 1): (5, 0.25)})
+    assert config.diff(current) == [(("exposure", 2, 1), 30), (("pid", 1, 1), (5, 0.5))]
+    assert config.diff(config) == []
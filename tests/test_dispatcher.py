@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import wlmData
+from Dispatcher_methods import DispatchedDLL, DllDispatcher, is_read
+from Simulator_methods import SimulatedDLL
+from WLM_methods import get_current_PID, set_PID_const
+
+
+class BlockingDLL(SimulatedDLL):
+    '''
+        SimulatedDLL with a call that holds the dispatcher thread until it's released
+    '''
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+        self.entered = threading.Event()
+
+    def Block(self):
+        self.entered.set()
+        self.release.wait(2)
+        return 0
+
+    def Fail(self):
+        raise OSError("access violation")
+
+
+@pytest.fixture
+def dispatcher():
+    dll = BlockingDLL()
+    dispatcher = DllDispatcher(dll)
+    yield dispatcher, dll
+    dll.release.set()
+    dispatcher.close()
+
+
+def test_is_read():
+    assert is_read("GetFrequencyNum", (1, 0.))
+    assert is_read("ConvertUnit", (400., 2, 3))
+    assert not is_read("SetDeviationSignalNum", (1, 2000.))
+    # an output pointer makes every call different
+    assert not is_read("GetPIDCourseNum", (1, object()))
+
+
+def test_batch_isnt_split(dispatcher):
+    dispatcher, dll = dispatcher
+    first = dispatcher.submit_batch([("SetDeviationSignalNum", (1, 1000.)), ("GetDeviationSignalNum", (1, 0.))])
+    second = dispatcher.submit_batch([("SetDeviationSignalNum", (1, 3000.)), ("GetDeviationSignalNum", (1, 0.))])
+    assert first[1].result(2) == 1000.
+    assert second[1].result(2) == 3000.
+    assert dll.PID == 3000.
+
+
+def test_equal_reads_are_shared_until_a_setting(dispatcher):
+    dispatcher, dll = dispatcher
+    blocked = dispatcher.submit("Block")
+    assert dll.entered.wait(2)
+    reads = [dispatcher.submit("GetDeviationSignalNum", 1, 0.) for _ in range(3)]
+    setting = dispatcher.submit("SetDeviationSignalNum", 1, 1000.)
+    after = dispatcher.submit("GetDeviationSignalNum", 1, 0.)
+    dll.release.set()
+    blocked.result(2)
+    assert [f.result(2) for f in reads] == [2048.] * 3
+    assert setting.result(2) == 0
+    assert after.result(2) == 1000.
+    assert dispatcher.shared == 2
+    assert dll.calls["GetDeviationSignalNum"] == 2
+
+
+def test_exception_goes_to_the_future(dispatcher):
+    dispatcher, dll = dispatcher
+    failed, read = dispatcher.submit_batch([("Fail", ()), ("GetDeviationSignalNum", (1, 0.))])
+    with pytest.raises(OSError):
+        failed.result(2)
+    assert read.result(2) == 2048.
+
+
+def test_install(dispatcher):
+    dispatcher, dll = dispatcher
+    wlmData.dll = dll
+    dispatcher.install()
+    assert isinstance(wlmData.dll, DispatchedDLL)
+    assert set_PID_const(1, 1500.) == 0
+    assert get_current_PID(1) == 1500.
+    assert dll.PID == 1500.
+    calls = dispatcher.calls
+    dispatcher.uninstall()
+    assert wlmData.dll is dll
+    assert calls >= 2
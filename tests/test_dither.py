@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from Dither_methods import RESONANCE_LOST, DitherLock
+from Simulator_methods import SimulatedDLL
+
+
+def resonator(PID, width = 40., height = 1.):
+    '''
+        :return: SimulatedDLL with one resonance at PID of width in mV, installed
+    '''
+    sim = SimulatedDLL()
+    sim.modes = [(sim.frequency + sim.koef * (PID - 2048.), abs(sim.koef) * width, height)]
+    sim.install()
+    return sim
+
+
+def stop_after(pairs, trace = None, action = None):
+    '''
+        :return: callback of DitherLock stopping it after the number of pairs, calling action(pair) before
+    '''
+    count = []
+
+    def callback(PID, power, frequency, locked):
+        count.append(locked)
+        if(trace is not None):
+            trace.append((PID, power, frequency, locked))
+        if(action is not None):
+            action(len(count))
+        return len(count) >= pairs
+    return callback
+
+
+def test_lock_climbs_to_the_top():
+    sim = resonator(2000.)
+    trace = []
+    lock = DitherLock(sim.power_meter(), amplitude=1., gain=20., callback=stop_after(200, trace))
+    assert lock.run(1985.) == 0
+    assert lock.PID == pytest.approx(2000., abs=0.5)
+    assert trace[-1][3]
+    # PID is left at the centre
+    assert sim.PID == lock._quantise(lock.PID)
+    assert lock.pairs == 200 and lock.rate > 0
+    assert lock.log and all(frequency > 0 for _, _, _, frequency in lock.log)
+
+
+def test_lock_follows_the_resonance():
+    sim = resonator(2000.)
+
+    def move(pair):
+        if(pair == 100):
+            centre, width, height = sim.modes[0]
+            sim.modes[0] = (centre + sim.koef * 10., width, height)
+    lock = DitherLock(sim.power_meter(), callback=stop_after(400, action=move))
+    lock.run(2000.)
+    assert lock.PID == pytest.approx(2010., abs=0.5)
+
+
+def test_lost_resonance():
+    sim = resonator(2000.)
+    lock = DitherLock(sim.power_meter(), min_power=0.5, lost_after=5)
+    sim.modes = []
+    assert lock.run(2000.) == RESONANCE_LOST
+    assert lock.pairs == 5
+    assert not lock.locked
+
+
+def test_PID_out_of_range():
+    sim = resonator(0.)
+    lock = DitherLock(sim.power_meter(), amplitude=1.)
+    assert lock.run(0.5) == -42
+    assert lock.pairs == 0
+
+
+def test_acquire_and_run_in_a_thread():
+    sim = resonator(3000.3)
+    lock = DitherLock(sim.power_meter(), min_power=0.5)
+    PID, power, frequency = lock.acquire(500, 3500, 16)
+    assert PID == pytest.approx(3000.3, abs=0.25)
+    lock.start()
+    start = time.perf_counter()
+    while(lock.pairs < 50):
+        assert time.perf_counter() - start < 2 and lock.running
+        time.sleep(0.001)
+    lock.stop(2)
+    assert not lock.running
+    assert lock.result == 0
+    assert lock.PID == pytest.approx(3000.3, abs=0.5)
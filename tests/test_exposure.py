@@ -0,0 +1,99 @@
+import wlmConst
+from Exposure_methods import ExposureOptimiser
+from Simulator_methods import SimulatedDLL
+
+
+class CCDSimulatedDLL(SimulatedDLL):
+    '''
+        SimulatedDLL with the interferogram of the arrays: its amplitude grows linearly with exposure
+        (gain per ms) up to the saturation of the CCD
+    '''
+    def __init__(self, gain = 100., exposure = 50, **kwargs):
+        super().__init__(**kwargs)
+        self.gain = gain
+        self.exposures = {1: exposure, 2: exposure}
+        self.mode = True
+        self.auto = {}
+
+    def GetExposureNumEx(self, chan, arr, value):
+        return self.exposures[arr]
+
+    def SetExposureNumEx(self, chan, arr, value):
+        self.exposures[arr] = value
+        return wlmConst.ResERR_NoErr
+
+    def GetExposureRangeEx(self, which):
+        return 1 if which in (wlmConst.cExpoMin, wlmConst.cExpo2Min) else 9999
+
+    def GetAmplitudeNum(self, chan, index, value):
+        arr = 1 if index in (wlmConst.cMin1, wlmConst.cMax1) else 2
+        if(index in (wlmConst.cMin1, wlmConst.cMin2)):
+            return 100
+        return min(100 + self.gain * self.exposures[arr], 4095)
+
+    def GetExposureModeNum(self, chan, value):
+        return self.mode
+
+    def SetExposureModeNum(self, chan, value):
+        self.mode = value
+        return wlmConst.ResERR_NoErr
+
+    def SetAutoExposureSetting(self, chan, setting, i, value):
+        self.auto[setting] = value
+        return wlmConst.ResERR_NoErr
+
+
+def test_saturated_exposure_is_halved():
+    sim = CCDSimulatedDLL(gain=100., exposure=80)
+    sim.install()
+    optimiser = ExposureOptimiser(1, low=1500, high=3000, aim=0.2)
+    assert not optimiser.step()
+    assert sim.exposures[1] == 40.
+    assert optimiser.optimise(time_pause=0) == {1: 20.}
+    assert optimiser.step()
+    assert sim.mode is False
+    optimiser.stop()
+    assert sim.mode is True
+
+
+def test_weak_signal_goes_to_the_target_at_once():
+    sim = CCDSimulatedDLL(gain=100., exposure=2)
+    sim.install()
+    optimiser = ExposureOptimiser(1, low=1500, high=3000, aim=0.2)
+    assert not optimiser.step()
+    # the target is 1800
+    assert sim.exposures[1] == 18.
+    assert optimiser.step()
+
+
+def test_exposure_inside_the_band_isnt_changed():
+    sim = CCDSimulatedDLL(gain=100., exposure=25)
+    sim.install()
+    optimiser = ExposureOptimiser(1, low=1500, high=3000, arrays=(1, 2))
+    assert optimiser.step()
+    assert optimiser.exposure == {1: 25, 2: 25}
+
+
+def test_next_exposure_is_limited():
+    sim = CCDSimulatedDLL()
+    sim.install()
+    optimiser = ExposureOptimiser(1, low=1500, high=3000)
+    assert optimiser.next_exposure(5000., 0., 100.) == 9999
+    assert optimiser.next_exposure(1., 3500., 3600.) == 1
+    assert optimiser.next_exposure(1000., 1., 101.) == 9999
+
+
+def test_amplitude_is_read_for_the_channel():
+    sim = CCDSimulatedDLL(gain=10., exposure=20)
+    sim.install()
+    assert ExposureOptimiser(2).amplitude(1) == (200, 300)
+    assert sim.calls["GetMinPeak"] == 0
+
+
+def test_auto_limits():
+    sim = CCDSimulatedDLL(gain=100., exposure=2)
+    sim.install()
+    optimiser = ExposureOptimiser(1, low=1500, high=3000)
+    optimiser.optimise(time_pause=0)
+    assert optimiser.set_auto_limits(margin=3.) == 0
+    assert sim.auto == {wlmConst.cmiAutoExpoMin: 18., wlmConst.cmiAutoExpoMax: 54.}
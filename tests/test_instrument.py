@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+
+from Instrument_methods import LatencyHistogram
+
+
+def test_bucket_bounds():
+    histogram = LatencyHistogram(sub_bits=4)
+    rng = random.Random(5)
+    values = list(range(2000)) + [rng.randrange(1, 10**12) for _ in range(2000)]
+    assert len(set(values)) > 3900
+    for value in values:
+        index = histogram._index(value)
+        upper = histogram._upper(index)
+        assert value <= upper
+        # the error of the bound is below 2**-sub_bits of the value
+        assert upper - value <= value / 2**histogram.sub_bits
+        # the next value after the bound is in the next bucket
+        assert histogram._index(upper) == index
+        assert histogram._index(upper + 1) == index + 1
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram(sub_bits=4)
+    for value in range(2**5):
+        assert histogram._upper(histogram._index(value)) == value
+
+
+def test_percentiles():
+    histogram = LatencyHistogram(sub_bits=4)
+    rng = random.Random(6)
+    # log-uniform over 6 decades so the percentiles fall into buckets of very different widths
+    values = [int(10**rng.uniform(3, 9)) for _ in range(10000)]
+    assert len(set(values)) > 9000
+    for value in values:
+        histogram.record(value)
+    for p in (1, 10, 50, 90, 99, 99.9, 100):
+        # the nearest rank, as the histogram counts it
+        exact = int(np.percentile(values, p, method="inverted_cdf"))
+        assert exact <= histogram.percentile(p) <= exact * (1 + 2**-4)
+    assert histogram.percentile(100) == max(values)
+    summary = histogram.summary()
+    assert summary["count"] == len(values)
+    assert summary["min_ns"] == min(values)
+    assert summary["total_ns"] == sum(values)
+
+
+def test_cumulative():
+    histogram = LatencyHistogram(sub_bits=4)
+    for value in (1, 2, 3, 10, 100, 1000):
+        histogram.record(value)
+    # 1000 is in the bucket 992 - 1023, so it counts only for the bounds from 1023
+    assert histogram.cumulative([0, 3, 10, 1000, 1023, 10**6]) == [0, 3, 4, 5, 6, 6]
+    assert LatencyHistogram().percentile(50) == 0
@@ -0,0 +1,54 @@
+from Lock_methods import LOCKED, OUT_OF_RANGE, SIGNAL_ERROR, UNLOCKED, LockMonitor
+
+
+def make_monitor(**kwargs):
+    reports = []
+    monitor = LockMonitor(lambda state, error: reports.append((state, error)), **kwargs)
+    return monitor, reports
+
+
+def test_locked_is_debounced():
+    monitor, reports = make_monitor(debounce=3, min_interval=0.)
+    assert not monitor.update(LOCKED, now=0.)
+    assert not monitor.update(LOCKED, now=0.1)
+    assert monitor.update(LOCKED, now=0.2)
+    assert not monitor.update(LOCKED, now=0.3)
+    assert reports == [(LOCKED, 0)]
+
+
+def test_loss_is_reported_at_once():
+    monitor, reports = make_monitor(debounce=3, min_interval=1.)
+    for i in range(3):
+        monitor.update(LOCKED, now=10. + i)
+    assert monitor.update(UNLOCKED, now=12.001)
+    assert monitor.update(SIGNAL_ERROR, -3, now=12.002)
+    assert monitor.update(SIGNAL_ERROR, -4, now=12.003)
+    assert monitor.update(OUT_OF_RANGE, now=12.004)
+    assert reports == [(LOCKED, 0), (UNLOCKED, 0), (SIGNAL_ERROR, -3), (SIGNAL_ERROR, -4), (OUT_OF_RANGE, 0)]
+
+
+def test_flapping_doesnt_report_locked():
+    monitor, reports = make_monitor(debounce=3, min_interval=0.)
+    monitor.update(UNLOCKED, now=0.)
+    for i in range(11):
+        monitor.update(LOCKED if i % 2 else UNLOCKED, now=i + 1.)
+    assert reports == [(UNLOCKED, 0)]
+    monitor.update(LOCKED, now=20.)
+    monitor.update(LOCKED, now=21.)
+    assert monitor.update(LOCKED, now=22.)
+    assert reports[-1] == (LOCKED, 0)
+
+
+def test_locked_waits_min_interval():
+    monitor, reports = make_monitor(debounce=1, min_interval=0.5)
+    assert monitor.update(UNLOCKED, now=0.)
+    assert not monitor.update(LOCKED, now=0.1)
+    assert monitor.update(LOCKED, now=0.6)
+    assert reports == [(UNLOCKED, 0), (LOCKED, 0)]
+
+
+def test_force():
+    monitor, reports = make_monitor()
+    monitor.force(UNLOCKED)
+    monitor.force(UNLOCKED)
+    assert reports == [(UNLOCKED, 0)]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from Lookup_methods import PIDLookup
+
+
+def fill(lookup, PIDs, frequencies):
+    for PID, frequency in zip(PIDs, frequencies):
+        lookup.add(PID, frequency)
+
+
+def test_PID_for_monotone():
+    for koef in (1e-4, -1e-4):
+        lookup = PIDLookup()
+        PIDs = np.arange(0, 4096, 64.)
+        fill(lookup, PIDs, 400. + koef * PIDs)
+        assert lookup.PID_for(400. + koef * 1000.) == pytest.approx(1000., abs=1e-6)
+        assert lookup.PID_for(400. + koef * 64.) == pytest.approx(64., abs=1e-6)
+        assert lookup.PID_for(400. - koef * 10.) is None
+        assert lookup.PID_for(400. + koef * 5000.) is None
+
+
+def test_PID_for_non_monotone_takes_the_nearest_segment():
+    lookup = PIDLookup()
+    # a mode hop at 2000 mV: the frequency falls back and meets the same values again
+    PIDs = np.arange(0, 4096, 32.)
+    frequencies = 400. + 1e-4 * (PIDs - np.where(PIDs >= 2000, 1500., 0.))
+    fill(lookup, PIDs, frequencies)
+    target = 400. + 1e-4 * 1000.
+    assert lookup.PID_for(target, near=900.) == pytest.approx(1000., abs=1e-6)
+    assert lookup.PID_for(target, near=3000.) == pytest.approx(2500., abs=1e-6)
+    assert lookup.PID_for(399.) is None
+
+
+def test_PID_for_small_tables():
+    lookup = PIDLookup()
+    assert lookup.PID_for(400.) is None
+    lookup.add(100., 400.)
+    lookup.add(200., -3)
+    assert len(lookup) == 1
+    assert lookup.PID_for(400.) is None
+    lookup.add(200., 400.01)
+    assert lookup.PID_for(400.005) == pytest.approx(150.)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "lookup.npz")
+    lookup = PIDLookup(path)
+    fill(lookup, [0., 100., 200.], [400., 400.01, 400.02])
+    assert lookup.autosave()
+    assert PIDLookup(path).PID_for(400.015) == pytest.approx(150.)
+
+
+def test_monotone_is_kept_by_add():
+    lookup = PIDLookup(resolution=1.)
+    rng = np.random.RandomState(8)
+    for i in range(3000):
+        lookup.add(rng.randint(0, 100), 400. + (1e-04 * rng.rand() if i % 3 else 1e-06 * rng.randint(0, 100)))
+        steps = np.diff(lookup.frequency)
+        assert lookup._monotone == bool(np.all(steps < 0) or np.all(steps > 0))
+    lookup.clear()
+    fill(lookup, np.arange(100.), 400. + 1e-06 * np.arange(100.))
+    assert lookup._monotone
+    lookup.add(50., 500.)
+    assert not lookup._monotone
+    lookup.add(50., 400. + 5e-05)
+    assert lookup._monotone
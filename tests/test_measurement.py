@@ -0,0 +1,150 @@
+import pytest
+
+import wlmConst
+from Dispatcher_methods import DllDispatcher
+from Event_methods import WAVELENGTH_MODES, EventPump
+from Measurement_methods import MeasurementMode, TriggeredMeasurement, iter_triggered_PID_bond, triggered_PID_bond
+from Simulator_methods import C, SimulatedDLL
+
+
+class ModesSimulatedDLL(SimulatedDLL):
+    '''
+        SimulatedDLL keeping the measurement modes of WLM. The settings are recorded in the order they are made
+    '''
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.modes_state = {"FastMode": False, "IntervalMode": False, "Interval": 1000, "InternalTriggerRate": 10.}
+        self.settings = []
+        self.errors = {}
+
+    def __getattr__(self, name):
+        kind = name[3:]
+        if(kind in self.__dict__.get("modes_state", ())):
+            if(name.startswith("Get")):
+                return lambda default: self.modes_state[kind]
+
+            def set_value(value):
+                self.settings.append((kind, value))
+                if(kind in self.errors):
+                    return self.errors[kind]
+                self.modes_state[kind] = value
+                return wlmConst.ResERR_NoErr
+            return set_value
+        return super().__getattr__(name)
+
+
+def test_modes_are_given_back():
+    sim = ModesSimulatedDLL()
+    sim.install()
+    with MeasurementMode(fast=True, interval=20, trigger_rate=100.) as fast:
+        assert sim.modes_state == {"FastMode": True, "IntervalMode": True, "Interval": 20,
+                                   "InternalTriggerRate": 100.}
+        assert fast.errors == {}
+    assert sim.modes_state == {"FastMode": False, "IntervalMode": False, "Interval": 1000,
+                               "InternalTriggerRate": 10.}
+    assert [kind for kind, _ in sim.settings[:4]] == ["FastMode", "IntervalMode", "Interval", "InternalTriggerRate"]
+
+
+def test_only_changed_modes_are_set():
+    sim = ModesSimulatedDLL()
+    sim.install()
+    with MeasurementMode(fast=False):
+        pass
+    assert sim.settings == []
+
+
+def test_failed_setting_is_reported():
+    sim = ModesSimulatedDLL()
+    sim.errors["InternalTriggerRate"] = wlmConst.ResERR_ParmOutOfRange
+    sim.install()
+    with MeasurementMode(trigger_rate=1e06) as fast:
+        assert fast.errors == {("trigger_rate",): wlmConst.ResERR_ParmOutOfRange}
+        assert sim.modes_state["FastMode"] is True
+    assert sim.modes_state["FastMode"] is False
+
+
+def test_settings_go_through_the_dispatcher():
+    sim = ModesSimulatedDLL()
+    dispatcher = DllDispatcher(sim)
+    try:
+        with MeasurementMode(fast=True, dispatcher=dispatcher):
+            assert sim.modes_state["FastMode"] is True
+        assert sim.modes_state["FastMode"] is False
+        assert dispatcher.calls == 4
+    finally:
+        dispatcher.close()
+
+
+def test_rate_counts_the_measurements_of_the_channel():
+    sim = ModesSimulatedDLL()
+    sim.install()
+    mode = MeasurementMode(chan=2)
+    assert mode.rate == 0.
+    with mode:
+        for _ in range(10):
+            mode.on_event(WAVELENGTH_MODES[2], 0, 400.)
+            mode.on_event(WAVELENGTH_MODES[1], 0, 400.)
+        mode.count(5)
+    assert mode.samples == 15
+    assert mode.elapsed > 0
+    assert mode.rate == mode.samples / mode.elapsed
+
+
+class TriggeredSimulatedDLL(SimulatedDLL):
+    '''
+        SimulatedDLL measuring once per TriggerMeasurement(cCtrlMeasurementTriggerSuccess) and passing
+        the result to the listeners of the pump as WLM passes the event
+    '''
+    def __init__(self, pump, deliver = True, **kwargs):
+        super().__init__(**kwargs)
+        self.pump = pump
+        self.deliver = deliver
+        self.triggers = []
+
+    def TriggerMeasurement(self, action):
+        self.triggers.append(action)
+        if(action == wlmConst.cCtrlMeasurementTriggerSuccess and self.deliver):
+            wave = C / self.laser_frequency()
+            for listener in self.pump.listeners:
+                listener(WAVELENGTH_MODES[1], 0, wave)
+        return wlmConst.ResERR_NoErr
+
+
+def test_one_measurement_per_step():
+    pump = EventPump()
+    sim = TriggeredSimulatedDLL(pump)
+    sim.install()
+    d = triggered_PID_bond(pump, 5, 10., 2000.)
+    assert [d[i][0] for i in range(5)] == [2000., 2010., 2020., 2030., 2040.]
+    for i in range(5):
+        assert d[i][1] == pytest.approx(C / (400. + sim.koef * (d[i][0] - 2048.)))
+    assert sim.triggers == ([wlmConst.cCtrlMeasurementInterrupt] + [wlmConst.cCtrlMeasurementTriggerSuccess] * 5
+                            + [wlmConst.cCtrlMeasurementContinue])
+    assert sim.PID == 2000.
+    assert pump.listeners == []
+
+
+def test_stopped_early_gives_back_PID_and_continuous_measurement():
+    pump = EventPump()
+    sim = TriggeredSimulatedDLL(pump)
+    sim.install()
+    points = iter_triggered_PID_bond(pump, 100, 1., 1000.)
+    for i, (PID, wave) in points:
+        if(i == 2):
+            break
+    points.close()
+    assert sim.PID == 1000.
+    assert sim.triggers[-1] == wlmConst.cCtrlMeasurementContinue
+    assert sim.triggers.count(wlmConst.cCtrlMeasurementTriggerSuccess) == 3
+    assert pump.listeners == []
+
+
+def test_missing_result_times_out():
+    pump = EventPump()
+    sim = TriggeredSimulatedDLL(pump, deliver=False)
+    sim.install()
+    with TriggeredMeasurement(pump, timeout=10) as trigger:
+        assert trigger.measure() == -44
+        # a late result of the other channel isn't taken
+        trigger.on_event(WAVELENGTH_MODES[2], 0, 700.)
+        assert trigger.measure() == -44
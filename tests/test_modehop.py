@@ -0,0 +1,82 @@
+import pytest
+
+from Modehop_methods import ModeHopDetector
+from Simulator_methods import SimulatedDLL
+from Stabiliser_methods import Stabiliser
+from WLM_methods import cDependFrequencyPID, reference_const_PID_stabilisator
+
+
+class ChannelSimulatedDLL(SimulatedDLL):
+    '''
+        SimulatedDLL remembering the channels the wavelength is read from
+    '''
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.channels = set()
+
+    def GetWavelengthNum(self, chan, value):
+        self.channels.add(chan)
+        return super().GetWavelengthNum(chan, value)
+
+
+def test_step_explains_the_change():
+    detector = ModeHopDetector(threshold=5e-04, koef_error=0.3)
+    assert not detector.update(0, 400.)
+    # 100 mV give koef * 100 THz, also if koef is 30 % wrong
+    assert not detector.update(100., 400. + 1.3 * cDependFrequencyPID * 100.)
+    assert detector.update(0, 400.01)
+    assert detector.hops == 1 and detector.last_hop is not None
+    # an error of WLM is neither a hop nor the frequency to compare with
+    assert not detector.update(0, -3)
+    assert not detector.update(0, 400.02)
+
+
+def test_recover_waits_until_the_laser_settles():
+    sim = ChannelSimulatedDLL()
+    sim.install()
+    detector = ModeHopDetector(settle_pause=0, max_step=10., limit_iterations=3, chan=2)
+    assert detector.recover() == pytest.approx(400.)
+    assert sim.measurements == 2
+    assert sim.channels == {2}
+    assert [detector.limit(100.) for _ in range(4)] == [10., 10., 10., 100.]
+    assert detector.limit(-100.) == -100.
+
+
+def test_recover_is_stopped_by_the_callback():
+    sim = SimulatedDLL(noise=1e-05, seed=3)
+    sim.install()
+    detector = ModeHopDetector(settle_pause=0, tolerance=1e-12)
+    frequencies = []
+    assert detector.recover(lambda frequency: frequencies.append(frequency) or len(frequencies) == 3) is None
+    assert len(frequencies) == 3
+
+
+def test_stabiliser_limits_the_steps_after_a_hop():
+    sim = ChannelSimulatedDLL()
+    sim.install()
+    detector = ModeHopDetector(settle_pause=0, max_step=15.625, limit_iterations=20)
+    steps = []
+
+    def callback(PID_current, frequency, delta, stabilised):
+        steps.append((PID_current, frequency, stabilised))
+        if(len(steps) == 5):
+            sim.frequency += 8e-04
+        return len(steps) >= 60
+    reference_const_PID_stabilisator(True, 400., sim.koef, 4096, 0, 2048, 3, callback=callback, detector=detector)
+    assert detector.hops == 1
+    assert detector.chan == 3 and sim.channels == {3}
+    PIDs = [PID for PID, _, _ in steps[5:26]]
+    assert max(abs(b - a) for a, b in zip(PIDs, PIDs[1:])) <= 15.625
+    assert steps[-1][1] == pytest.approx(400., abs=1e-06)
+    assert steps[-1][2]
+
+
+def test_detector_follows_the_channel_of_the_stabiliser():
+    sim = ChannelSimulatedDLL()
+    sim.install()
+    detector = ModeHopDetector(settle_pause=0)
+    stabiliser = Stabiliser(time_pause=0, chan=2, detector=detector,
+                            callback=lambda PID, frequency, delta, stabilised: stabilised)
+    stabiliser.set_reference(400., True, 2048)
+    assert stabiliser.wait(2)
+    assert detector.chan == 2 and sim.channels == {2}
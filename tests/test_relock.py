@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from Lookup_methods import PIDLookup
+from Relock_methods import RelockSupervisor
+from Simulator_methods import SimulatedDLL
+from Stabiliser_methods import Stabiliser
+
+
+def frequency_of(sim, PID):
+    return sim.frequency + sim.koef * (PID - 2048.)
+
+
+def test_full_scan_finds_the_reference():
+    sim = SimulatedDLL()
+    sim.install()
+    supervisor = RelockSupervisor(Stabiliser(time_pause=0), coarse_step=64., fine_step=2.)
+    PID = supervisor.find_PID(frequency_of(sim, 1000.))
+    assert PID == pytest.approx(1000., abs=2.)
+    # the samples of the scan are kept
+    assert supervisor.lookup.PID_for(frequency_of(sim, 1000.)) == pytest.approx(1000.)
+
+
+def test_scan_starts_around_the_lookup():
+    sim = SimulatedDLL()
+    sim.install()
+    lookup = PIDLookup(resolution=2.)
+    for PID in range(0, 4097, 256):
+        lookup.add(PID, frequency_of(sim, PID))
+    supervisor = RelockSupervisor(Stabiliser(time_pause=0), lookup=lookup, span=256., tolerance=1e-05)
+    reference = frequency_of(sim, 3000.)
+    assert supervisor.find_PID(reference) == pytest.approx(3000., abs=0.2)
+    assert sim.measurements == 1
+    # the laser drifted by 100 mV since the table was made: a scan of the span and not of the whole range
+    sim.frequency += sim.koef * 100.
+    sim.measurements = 0
+    assert supervisor.find_PID(reference) == pytest.approx(2900., abs=2.)
+    assert sim.measurements < 4096 / 64
+
+
+def test_failed_relock_backs_off_and_gives_up():
+    sim = SimulatedDLL()
+    sim.install()
+    stabiliser = Stabiliser(time_pause=0)
+    # far out of the range of PID
+    stabiliser.reference = 401.
+    supervisor = RelockSupervisor(stabiliser, retry=10., max_retry=15., max_failures=3)
+    assert supervisor.due()
+    assert not supervisor.relock()
+    assert supervisor.failures == 1 and not supervisor.due()
+    supervisor._failed -= 10.
+    assert supervisor.due()
+    assert not supervisor.relock()
+    supervisor._failed -= 15.
+    # 20 s after 2 failures, but max_retry is 15 s
+    assert supervisor.due()
+    assert not supervisor.relock()
+    assert supervisor.gave_up and not supervisor.due()
+    assert not stabiliser.running
+
+
+def test_stabiliser_is_locked_again_after_PID_out_of_range():
+    sim = SimulatedDLL()
+    sim.install()
+    reference = frequency_of(sim, 3500.)
+    samples = []
+    disturbed = []
+
+    def callback(PID_current, frequency, delta, stabilised):
+        samples.append(stabilised)
+        if(len(samples) == 10):
+            # the laser needs PID 4676 mV now: the stabiliser gives up
+            sim.frequency -= sim.koef * 1176.
+            disturbed.append(True)
+        return False
+
+    def on_finish(result):
+        if(disturbed and result == -42):
+            # the disturbance is gone, the laser can be locked again
+            sim.frequency += sim.koef * 1176.
+            disturbed.pop()
+    stabiliser = Stabiliser(time_pause=0, callback=callback, on_finish=on_finish, lookup=PIDLookup())
+    relocks = []
+    supervisor = RelockSupervisor(stabiliser, period=0.01, on_relock=relocks.append)
+    supervisor.start()
+    assert stabiliser.callback == supervisor._record
+    stabiliser.set_reference(reference, True, 3500.)
+    start = time.perf_counter()
+    while(not relocks):
+        assert time.perf_counter() - start < 5
+        time.sleep(0.01)
+    stabiliser.stop()
+    supervisor.stop()
+    assert stabiliser.callback is callback
+    assert supervisor.relock_times == relocks
+    assert stabiliser.PID == pytest.approx(3500., abs=0.2)
+    assert supervisor.failures == 0
@@ -0,0 +1,57 @@
+import pytest
+
+import wlmData
+from Calibration_methods import CalibrationManager
+from Replay_methods import ReplayDLL, ReplayEnd, ReplayMismatch, SessionRecorder, read_log
+from Simulator_methods import SimulatedDLL
+from WLM_methods import reference_const_PID_stabilisator
+
+
+def session(iterations = 200):
+    '''
+        :return: list of the callback arguments of a short stabilisation and the autocalibration settings
+    '''
+    samples = []
+
+    def callback(PID_current, frequency, delta, stabilised):
+        samples.append((PID_current, frequency, delta, stabilised))
+        return len(samples) >= iterations
+    result = reference_const_PID_stabilisator(True, 400.00001, SimulatedDLL().koef, 4096, 0, 2048, callback=callback)
+    return result, samples, CalibrationManager().auto_cal_settings()
+
+
+def test_strict_round_trip(tmp_path):
+    path = str(tmp_path / "session.wlmr")
+    sim = SimulatedDLL(noise=1e-09, seed=7)
+    sim.install()
+    recorder = SessionRecorder(path)
+    recorder.install()
+    recorded = session()
+    recorder.uninstall()
+    sim.uninstall()
+    calls = read_log(path)
+    assert len(calls) == recorder.calls
+    assert calls[0].time >= 0
+
+    replay = ReplayDLL(path, speed=None, strict=True)
+    replay.install()
+    assert session() == recorded
+    assert replay.position == len(calls)
+    with pytest.raises(ReplayEnd):
+        wlmData.dll.GetFrequencyNum(1, 0)
+    replay.uninstall()
+
+
+def test_strict_mismatch(tmp_path):
+    path = str(tmp_path / "session.wlmr")
+    sim = SimulatedDLL()
+    recorder = SessionRecorder(path, sim)
+    recorder.install()
+    wlmData.dll.SetDeviationSignalNum(1, 1000.)
+    wlmData.dll.GetFrequencyNum(1, 0)
+    recorder.uninstall()
+
+    replay = ReplayDLL(path, speed=None, strict=True)
+    replay.install()
+    with pytest.raises(ReplayMismatch):
+        wlmData.dll.SetDeviationSignalNum(1, 1001.)
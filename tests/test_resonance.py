@@ -0,0 +1,53 @@
+import pytest
+
+from Resonance_methods import ResonanceSearch, find_resonance
+from Simulator_methods import SimulatedDLL
+
+
+def resonator(*modes):
+    '''
+        :param modes: (PID of the centre, width in mV, height) of the resonances
+        :return: SimulatedDLL with the resonances, installed
+    '''
+    sim = SimulatedDLL()
+    sim.modes = [(sim.frequency + sim.koef * (PID - 2048.), abs(sim.koef) * width, height)
+                 for PID, width, height in modes]
+    sim.install()
+    return sim
+
+
+def test_resonance_is_found_with_few_points():
+    sim = resonator((3000.3, 40., 1.))
+    PID, power, frequency, evaluations = find_resonance(sim.power_meter(), 500, 3500, 16, resolution=0.25,
+                                                        min_power=0.5)
+    assert PID == pytest.approx(3000.3, abs=0.25)
+    assert power == pytest.approx(1., abs=1e-03)
+    assert frequency == pytest.approx(sim.modes[0][0], abs=abs(sim.koef))
+    # the laser is left at the top
+    assert sim.PID == PID
+    # the coarse sweep stops after the peak: far less than 3000 / 0.25 fine points
+    assert evaluations < (3000.3 - 500) / 16 + 40
+
+
+def test_higher_resonance_wins_without_min_power():
+    sim = resonator((1000., 40., 0.5), (2500., 40., 0.9))
+    search = ResonanceSearch(sim.power_meter())
+    PID, power, frequency = search.find(0, 4000, 16, resolution=0.25)
+    assert PID == pytest.approx(2500., abs=0.25)
+    # the coarse sweep goes to the end
+    assert max(search.samples) == 4000
+
+
+def test_points_are_measured_once():
+    sim = resonator((2000., 40., 1.))
+    search = ResonanceSearch(sim.power_meter())
+    search.power(2000.01)
+    search.power(2000.)
+    assert search.evaluations == 1
+    assert list(search.samples) == [2000.]
+    assert search.power(-10.) == search.samples[0.]
+
+
+def test_nothing_measured():
+    sim = resonator((2000., 40., 1.))
+    assert ResonanceSearch(sim.power_meter()).find(100, 50, 16) is None
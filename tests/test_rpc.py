@@ -0,0 +1,82 @@
+import itertools
+import time
+
+import msgpack
+import pytest
+
+from Rpc_methods import RpcClient, RpcError, RpcServer
+from Simulator_methods import SimulatedDLL
+from Stabiliser_methods import Stabiliser
+
+_addresses = itertools.count()
+
+
+@pytest.fixture
+def rpc():
+    '''
+        :return: (server, client, sim) talking in the process, the server runs in its thread
+    '''
+    sim = SimulatedDLL()
+    sim.install()
+    address = "inproc://rpc-test-%d" % next(_addresses)
+    server = RpcServer(address, stabiliser=Stabiliser(time_pause=0))
+    thread = server.start()
+    client = RpcClient(address)
+    yield server, client, sim
+    client.close()
+    server.close()
+    thread.join(2)
+
+
+def test_batch_keeps_the_order(rpc):
+    server, client, sim = rpc
+    with client.batch() as b:
+        first = b.call("set_PID_const", 1, 1000.)
+        PID = b.call("get_current_PID", 1)
+        missing = b.call("no_such_method")
+        second = b.call("set_PID_const", 1, 3000.)
+    assert first.result(1000) == 0
+    assert PID.result(1000) == 1000.
+    with pytest.raises(RpcError, match="KeyError"):
+        missing.result(1000)
+    assert second.result(1000) == 0
+    assert sim.PID == 3000.
+
+
+def test_set_PID_const_is_refused_while_stabilising(rpc):
+    server, client, sim = rpc
+    assert client.call("set_reference", 400., True, 2048, timeout=1000) == 0
+    start = time.perf_counter()
+    while(server.stabiliser.PID is None or not server.stabiliser.running):
+        assert time.perf_counter() - start < 2
+        time.sleep(0.01)
+    assert client.call("set_PID_const", 1, 500., timeout=1000) == -43
+    assert client.call("start_sweep", 10, 1., 2048., 0., timeout=1000) == -43
+    assert sim.PID != 500.
+    assert client.call("stop_stabiliser", timeout=2000) == 0
+    assert client.call("stabiliser_state", timeout=1000)["running"] is False
+    assert client.call("set_PID_const", 1, 500., timeout=1000) == 0
+    assert sim.PID == 500.
+
+
+def test_done_takes_the_answer_without_result(rpc):
+    server, client, sim = rpc
+    future = client.call_async("get_frequency", 1)
+    start = time.perf_counter()
+    while(not future.done()):
+        assert time.perf_counter() - start < 2
+        time.sleep(0.01)
+    assert future.result(0) == pytest.approx(400.)
+    assert client._answers == {} and client._waiting == {}
+
+
+def test_bad_request_is_answered():
+    server = RpcServer("inproc://rpc-test-%d" % next(_addresses), stabiliser=Stabiliser())
+    try:
+        request_id, answers = msgpack.unpackb(server.handle(b"\xc1"))
+        assert request_id is None and len(answers) == 1 and answers[0][0] is False
+        request_id, answers = msgpack.unpackb(server.handle(msgpack.packb([5, [["get_frequency", 1]]])))
+        assert request_id == 5
+        assert answers[0][0] is False and answers[0][1].startswith("TypeError")
+    finally:
+        server.socket.close()
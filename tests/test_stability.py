@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+import wlmConst
+from Stability_methods import C, AllanDeviation, StabilityMonitor
+
+
+def overlapping_differences(x, m):
+    '''
+        Brute force: the differences of the means of all the pairs of adjacent blocks of m samples
+    '''
+    sums = np.concatenate(([0.], np.cumsum(x)))
+    means = (sums[m:] - sums[:-m]) / m
+    return means[m:] - means[:-m]
+
+
+def oadev(segments, m):
+    differences = np.concatenate([overlapping_differences(x, m) for x in segments])
+    return np.sqrt(np.mean(differences**2) / 2), len(differences)
+
+
+def test_allan_deviation_overlapping():
+    x = np.random.RandomState(1).randn(4096).cumsum()
+    allan = AllanDeviation(overlap_bits=16, max_octaves=8)
+    for value in x:
+        allan.update(value)
+    deviations = allan.deviations(0.01)
+    assert len(deviations) == 8
+    for k, (tau, sigma, n) in enumerate(deviations):
+        expected, count = oadev([x], 2**k)
+        assert tau == pytest.approx(0.01 * 2**k)
+        assert n == count
+        assert sigma == pytest.approx(expected, rel=1e-9)
+
+
+def test_allan_deviation_classic():
+    x = np.random.RandomState(2).randn(4096)
+    allan = AllanDeviation(overlap_bits=0, max_octaves=6)
+    for value in x:
+        allan.update(value)
+    for k, (tau, sigma, n) in enumerate(allan.deviations(1.)):
+        means = x[:len(x) // 2**k * 2**k].reshape(-1, 2**k).mean(axis=1)
+        differences = np.diff(means)
+        assert n == len(differences)
+        assert sigma == pytest.approx(np.sqrt(np.mean(differences**2) / 2), rel=1e-9)
+
+
+def test_allan_deviation_restart():
+    x = np.random.RandomState(3).randn(3000)
+    allan = AllanDeviation(overlap_bits=16, max_octaves=6)
+    for value in x[:1000]:
+        allan.update(value)
+    allan.restart()
+    for value in x[1000:] + 1e3:
+        allan.update(value)
+    # the jump at the gap doesn't get into the differences
+    for k, (tau, sigma, n) in enumerate(allan.deviations(1.)):
+        expected, count = oadev([x[:1000], x[1000:]], 2**k)
+        assert n == count
+        assert sigma == pytest.approx(expected, rel=1e-9)
+
+
+def test_monitor_takes_one_sample_per_event():
+    monitor = StabilityMonitor(chan=1, locked_only=True)
+    callback = monitor.stabiliser_callback()
+    frequencies = 400. + 1e-9 * np.random.RandomState(4).randn(100)
+    # before the lock the events are skipped
+    monitor.on_event(wlmConst.cmiWavelength1, 0, C / 400.)
+    callback(2048., 400., 0., True)
+    for i, frequency in enumerate(frequencies):
+        # the stabiliser calls back many times per measurement, only the events make samples
+        for _ in range(5):
+            callback(2048., frequency, 0., True)
+        monitor.on_event(wlmConst.cmiWavelength1, 1000 + 5 * i, C / frequency)
+        monitor.on_event(wlmConst.cmiWavelength2, 1000 + 5 * i, C / frequency)
+    assert monitor.count == 100
+    assert monitor.tau0 == pytest.approx(0.005)
+    assert monitor.restarts == 0
+
+
+def test_monitor_callback_drops_repeated_values():
+    monitor = StabilityMonitor()
+    callback = monitor.stabiliser_callback()
+    for i in range(50):
+        for _ in range(10):
+            callback(2048., 400. + i * 1e-9, 0., True)
+    callback(2048., 400.1, 0., False)
+    assert monitor.count == 50
+
+
+def test_monitor_restarts_after_unlock_and_gaps():
+    monitor = StabilityMonitor(chan=1, gap=5.)
+    callback = monitor.stabiliser_callback()
+    callback(2048., 400., 0., True)
+    t = 0
+    for _ in range(20):
+        t += 10
+        monitor.on_event(wlmConst.cmiWavelength1, t, C / 400.)
+    callback(2048., 400.1, 0.1, False)
+    t += 1000
+    monitor.on_event(wlmConst.cmiWavelength1, t, C / 400.1)
+    callback(2048., 400., 0., True)
+    for _ in range(20):
+        t += 10
+        monitor.on_event(wlmConst.cmiWavelength1, t, C / 400.)
+    # a gap without losing the lock
+    t += 1000
+    for _ in range(20):
+        monitor.on_event(wlmConst.cmiWavelength1, t, C / 400.)
+        t += 10
+    assert monitor.count == 60
+    assert monitor.restarts == 2
+    assert monitor.tau0 == pytest.approx(0.01)
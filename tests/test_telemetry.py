@@ -0,0 +1,89 @@
+import itertools
+import time
+
+import pytest
+
+from Simulator_methods import SimulatedDLL
+from Telemetry_methods import (EVENT_FORMAT, STATUS_FORMAT, TOPIC_EVENT, TOPIC_STATUS, StabiliserStatus,
+                               TelemetryClient, TelemetryServer, WlmEvent, decode)
+from WLM_methods import reference_const_PID_stabilisator
+
+_addresses = itertools.count()
+
+
+@pytest.fixture
+def telemetry():
+    '''
+        :return: (server, function making a client with the given topics) talking in the process
+    '''
+    address = "inproc://telemetry-test-%d" % next(_addresses)
+    server = TelemetryServer(address)
+    clients = []
+
+    def client(topics = (TOPIC_EVENT, TOPIC_STATUS)):
+        clients.append(TelemetryClient(address, topics))
+        return clients[-1]
+    yield server, client
+    for c in clients:
+        c.close()
+    server.close()
+
+
+def subscribe(server, client):
+    '''
+        Publishes events until the client gets one: a subscriber loses the messages sent before it connected
+    '''
+    start = time.perf_counter()
+    while(client.receive(10) is None):
+        assert time.perf_counter() - start < 2
+        server.publish_event(-1, 0, 0.)
+    while(client.receive(10) is not None):
+        pass
+
+
+def test_decode():
+    event = decode(TOPIC_EVENT, EVENT_FORMAT.pack(1.5, 3, 4, 5.5))
+    assert event == WlmEvent(1.5, 3, 4, 5.5)
+    status = decode(TOPIC_STATUS, STATUS_FORMAT.pack(2., 1, 2048., 400., 1e-07, True))
+    assert status == StabiliserStatus(2., 1, 2048., 400., 1e-07, True)
+    assert STATUS_FORMAT.size == 37
+    with pytest.raises(ValueError):
+        decode(b"other", b"")
+
+
+def test_stabiliser_status_is_published(telemetry):
+    server, make_client = telemetry
+    client = make_client()
+    subscribe(server, client)
+    events = make_client((TOPIC_EVENT,))
+    subscribe(server, events)
+    sim = SimulatedDLL()
+    sim.install()
+    samples = []
+
+    def count(PID_current, frequency, delta, stabilised):
+        samples.append((PID_current, frequency, delta, stabilised))
+        return len(samples) >= 20
+    reference_const_PID_stabilisator(True, 400., sim.koef, 4096, 0, 2048, 2,
+                                     callback=server.stabiliser_callback(2, count))
+    server.on_event(7, 8, 9.5)
+    received = []
+    while(True):
+        message = client.receive(100)
+        if(message is None):
+            break
+        received.append(message)
+    statuses = [m for m in received if isinstance(m, StabiliserStatus)]
+    assert [(s.PID, s.frequency, s.delta, s.stabilised) for s in statuses] == samples
+    assert all(s.chan == 2 for s in statuses)
+    assert isinstance(received[-1], WlmEvent) and received[-1][1:] == (7, 8, 9.5)
+    # the client subscribed to the events only doesn't get the status
+    assert events.receive(100)[1:] == (7, 8, 9.5)
+    assert events.receive(10) is None
+
+
+def test_closed_server_drops_the_messages(telemetry):
+    server, make_client = telemetry
+    server.close()
+    server.publish_status(1, 2048., 400., 0., True)
+    server.publish_event(1, 2, 3.)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from Simulator_methods import SimulatedDLL
+from Tuning_methods import (LADDER_EDGES, LADDER_STEPS, PlantModel, ladder_surface, max_dev_surface,
+                            simulate_ladder)
+from WLM_methods import reference_const_PID_stabilisator
+
+OFFSETS = (3e-04, -7e-05, 2e-06, -4e-05, 9e-04)
+
+
+def run_stabiliser(offset, iterations, tolerance):
+    '''
+        :return: (settle iteration, rms error of the second half) of reference_const_PID_stabilisator on SimulatedDLL
+    '''
+    sim = SimulatedDLL()
+    sim.install()
+    errors = []
+
+    def callback(PID_current, frequency, delta, stabilised):
+        errors.append(400. + offset - sim.laser_frequency())
+        return len(errors) >= iterations
+    assert reference_const_PID_stabilisator(True, 400. + offset, sim.koef, 4096, 0, 2048, callback=callback) is None
+    sim.uninstall()
+    errors = np.array(errors)
+    outside = np.nonzero(np.abs(errors) >= tolerance)[0]
+    return (outside[-1] + 1 if len(outside) else 0), np.sqrt(np.mean(errors[iterations // 2:]**2))
+
+
+def test_ladder_simulation_follows_the_stabiliser():
+    iterations = 300
+    settle, rms, failed = simulate_ladder(PlantModel(), [LADDER_STEPS] * len(OFFSETS), [LADDER_EDGES] * len(OFFSETS),
+                                          OFFSETS, iterations=iterations, tolerance=1e-06)
+    assert not failed.any()
+    for i, offset in enumerate(OFFSETS):
+        real_settle, real_rms = run_stabiliser(offset, iterations, 1e-06)
+        assert settle[i] == real_settle
+        assert rms[i] == pytest.approx(real_rms, rel=1e-06, abs=1e-12)
+
+
+def test_PID_out_of_range_fails():
+    settle, rms, failed = simulate_ladder(PlantModel(), [LADDER_STEPS] * 2, [LADDER_EDGES] * 2, [1e-06, 1e-02],
+                                          iterations=50)
+    assert failed.tolist() == [False, True]
+    assert settle[1] == 50
+
+
+def test_surfaces_dont_depend_on_the_processes():
+    plant = PlantModel(noise=1e-07)
+    # 320 runs: more than one chunk
+    serial = ladder_surface(plant, [0.5, 1.], [1., 2.], trials=80, iterations=100, processes=1, seed=3)
+    parallel = ladder_surface(plant, [0.5, 1.], [1., 2.], trials=80, iterations=100, processes=2, seed=3)
+    for a, b in zip(serial, parallel):
+        assert a.shape == (2, 2)
+        np.testing.assert_array_equal(a, b)
+
+
+def test_max_dev_surface():
+    settle, rms, unsettled = max_dev_surface(PlantModel(), [50., 1000.], [0.8, 1.2], trials=4, iterations=200,
+                                             processes=1)
+    assert settle.shape == rms.shape == unsettled.shape == (2, 2)
+    # a max_dev over the first step lets the controller jump to the reference
+    assert (unsettled[1] == 0).all()
+    assert (settle[1] < settle[0]).all()
+    assert ((0 <= unsettled) & (unsettled <= 1)).all()
@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    '''
+        Columnar ring buffer of the measurements. One writer (the acquisition loop) appends rows,
+        any number of readers take the rows that appeared since their last read.
+        When the buffer is full the oldest rows are overwritten, so the writer never waits for readers
+
+        Comment: the lock is held only while a row is copied, that's why readers can't slow down the acquisition
+    '''
+    def __init__(self, columns, capacity = 2**20):
+        '''
+            :param columns: names of the columns e.g. ('time', 'frequency', 'power', 'PID')
+            :param capacity: max number of rows kept
+        '''
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self._data = np.zeros((len(self.columns), capacity))
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def count(self) -> int:
+        '''
+            Total number of rows written since creation (including overwritten ones)
+        '''
+        return self._count
+
+    def index(self, column: str) -> int:
+        return self.columns.index(column)
+
+    def append(self, *row):
+        '''
+            Adds one row. The values go in the order of columns
+        '''
+        with self._lock:
+            self._data[:, self._count % self.capacity] = row
+            self._count += 1
+
+    def read_since(self, count: int):
+        '''
+            Returns the rows written after the row number count
+
+            :param count: the value of self.count at the previous read (0 for everything kept)
+            :return: (array of shape (columns, rows), new count) - tuple pack. If some rows were overwritten
+                     since the previous read they're skipped
+        '''
+        with self._lock:
+            end = self._count
+            start = max(count, end - self.capacity)
+            i1 = start % self.capacity
+            i2 = end % self.capacity
+            if(start == end):
+                rows = self._data[:, :0].copy()
+            elif(i1 < i2):
+                rows = self._data[:, i1:i2].copy()
+            else:
+                rows = np.concatenate((self._data[:, i1:], self._data[:, :i2]), axis=1)
+        return rows, end
+
+    def snapshot(self):
+        '''
+            :return: all the rows kept as a dictionary column -> array, the oldest row first
+        '''
+        rows, _ = self.read_since(0)
+        return dict(zip(self.columns, rows))
+
+
+class MinMaxDecimator:
+    '''
+        Keeps a curve of any length in not more than 2*max_points points for plotting.
+        The samples are grouped into buckets and only min and max of every bucket are kept, so peaks aren't lost.
+        When there are too many buckets the neighbouring ones are merged and the bucket size doubles.
+        Every sample is processed once, so the cost doesn't depend on the length of the history
+    '''
+    def __init__(self, max_points = 2000):
+        '''
+            :param max_points: max number of buckets
+        '''
+        self.max_points = max_points
+        self.clear()
+
+    def clear(self):
+        self.block = 1
+        self._x = np.zeros(0)
+        self._min = np.zeros(0)
+        self._max = np.zeros(0)
+        self._pending_x = np.zeros(0)
+        self._pending_y = np.zeros(0)
+
+    def add(self, x, y):
+        '''
+            Adds new samples of the curve
+
+            :param x: abscissas (must grow)
+            :param y: ordinates
+        '''
+        px = np.concatenate((self._pending_x, x))
+        py = np.concatenate((self._pending_y, y))
+        full = len(px) // self.block * self.block
+        if(full > 0):
+            bx = px[:full].reshape(-1, self.block)
+            by = py[:full].reshape(-1, self.block)
+            self._x = np.concatenate((self._x, bx[:, 0]))
+            self._min = np.concatenate((self._min, by.min(axis=1)))
+            self._max = np.concatenate((self._max, by.max(axis=1)))
+        self._pending_x = px[full:]
+        self._pending_y = py[full:]
+        while(len(self._x) > self.max_points):
+            self._merge()
+
+    def _merge(self):
+        '''
+            Merges pairs of neighbouring buckets. An odd bucket at the end is kept as it is
+        '''
+        m = len(self._x) // 2 * 2
+        self._x = np.concatenate((self._x[0:m:2], self._x[m:]))
+        self._min = np.concatenate((np.minimum(self._min[0:m:2], self._min[1:m:2]), self._min[m:]))
+        self._max = np.concatenate((np.maximum(self._max[0:m:2], self._max[1:m:2]), self._max[m:]))
+        self.block *= 2
+
+    def curve(self):
+        '''
+            :return: (x, y) - arrays to plot. Every bucket gives its min and max, the samples
+                     that haven't filled a bucket yet are given as they are
+        '''
+        x = np.concatenate((np.repeat(self._x, 2), self._pending_x))
+        y = np.concatenate((np.column_stack((self._min, self._max)).ravel(), self._pending_y))
+        return x, y
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import wlmData
+import wlmConst
+
+# reads served from the cache. The values change only with a new measurement
+CACHED = frozenset(("GetWavelengthNum", "GetFrequencyNum", "GetPowerNum", "GetExposureNum",
+                    "GetDeviationSignalNum"))
+
+
+class ReadCache:
+    '''
+        Keeps the values of the reads in CACHED stamped with the measurement tick and gives them back
+        without a foreign call until the next measurement. Every WLM event (pump.add_listener(cache.on_event))
+        moves the tick on: cmiNowTick gives the tick of WLM itself, the other events (new wavelength,
+        exposure etc.) just invalidate. Any other call through the cache (a setting) invalidates too.
+        max_age limits how old a value can be in case the events don't come.
+        A thread reading again a value it has already got of this measurement waits for the next measurement
+        (not longer than max_age) instead of getting the same value at once, so the loops polling WLM
+        (the locked stabiliser, the acquisition) go at the rate of the measurements and don't spin
+
+        Example:
+            cache = ReadCache()
+            pump.add_listener(cache.on_event)
+            cache.install()  # wlmData.dll reads through the cache from now on
+    '''
+    def __init__(self, dll = None, max_age = 0.05, wait = True):
+        '''
+            :param dll: the DLL or its proxy (wlmData.dll if None)
+            :param max_age: max age of a value in s
+            :param wait: a thread reading the same value twice in one measurement waits for the next one
+        '''
+        self.dll = wlmData.dll if dll is None else dll
+        self.max_age = max_age
+        self.wait = wait
+        self.tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self._values = {}
+        self._condition = threading.Condition()
+        # key -> tick of the value the thread got last
+        self._seen = threading.local()
+        self._installed = None
+
+    def invalidate(self, tick = None):
+        '''
+            Forgets all the values
+
+            :param tick: new tick of WLM or None to count the ticks here
+        '''
+        with self._condition:
+            self.tick = self.tick + 1 if tick is None else tick
+            self._values.clear()
+            self._condition.notify_all()
+
+    def on_event(self, mode: int, int_val: int, dbl_val: float):
+        '''
+            Listener for EventPump
+        '''
+        self.invalidate(int_val if mode == wlmConst.cmiNowTick else None)
+
+    def read(self, name: str, *args):
+        '''
+            Gives the value of the read from the cache or from the DLL
+
+            :param name: one of CACHED
+            :return: the value
+        '''
+        key = (name, args)
+        seen = getattr(self._seen, "ticks", None)
+        if(seen is None):
+            seen = self._seen.ticks = {}
+        with self._condition:
+            if(self.wait and seen.get(key) == self.tick):
+                self.waits += 1
+                self._condition.wait(self.max_age)
+            tick = self.tick
+            cached = self._values.get(key)
+        now = time.perf_counter()
+        seen[key] = tick
+        if(cached is not None and now - cached[1] < self.max_age):
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        value = getattr(self.dll, name)(*args)
+        with self._condition:
+            # the value isn't kept if a new measurement came while it was read
+            if(tick == self.tick):
+                self._values[key] = (value, now)
+        return value
+
+    def install(self):
+        '''
+            Replaces wlmData.dll with a proxy reading through the cache
+        '''
+        if(self._installed is None):
+            self._installed = wlmData.dll
+            wlmData.dll = CachedDLL(self)
+
+    def uninstall(self):
+        if(self._installed is not None):
+            wlmData.dll = self._installed
+            self._installed = None
+
+
+class CachedDLL:
+    '''
+        Looks like the ctypes handle of the DLL. The reads in CACHED go through the cache,
+        the other calls go to the DLL and invalidate the cache
+    '''
+    def __init__(self, cache: ReadCache):
+        self._cache = cache
+
+    def __getattr__(self, name):
+        cache = self._cache
+        if(name in CACHED):
+            def call(*args):
+                return cache.read(name, *args)
+        elif(name.startswith(("Get", "Convert", "WaitFor"))):
+            call = getattr(cache.dll, name)
+        else:
+            def call(*args):
+                answer = getattr(cache.dll, name)(*args)
+                cache.invalidate()
+                return answer
+        return call
@@ -0,0 +1,237 @@
+import collections
+import contextlib
+import ctypes
+import threading
+import time
+
+import wlmData
+import wlmConst
+
+# seconds in the units of the period of the autocalibration of WLM
+AUTO_CAL_UNITS = {wlmConst.cACDays: 86400., wlmConst.cACHours: 3600., wlmConst.cACMinutes: 60.}
+
+# one calibration: when it started, the answer of Calibration, the calibration effect and the calibration
+# wavelength WLM reports after it, the time the stabilisers were paused in s
+CalibrationRecord = collections.namedtuple("CalibrationRecord", "time result effect wavelength downtime")
+
+
+class CalibrationManager:
+    '''
+        Calibrates WLM with the reference laser every period in the idle gaps of the measurements.
+        The measurements (sweeps) mark themselves busy, a calibration is made only when nothing has been busy
+        for min_idle s, and a measurement that wants to start waits until the calibration is over.
+        The running stabilisers are held (Stabiliser.pause: PID isn't changed, their threads and callbacks are
+        kept) right before Calibration and resumed right after it, so the downtime is about the time of
+        the calibration itself.
+        The WLM autocalibration (which would calibrate in the middle of a sweep) can be taken over:
+        its period is used and it's switched off until give_back()
+
+        Example:
+            manager = CalibrationManager(wlmConst.cHeNe633, wlmConst.cReturnWavelengthVac, 632.991,
+                                         chan=8, stabilisers=[stabiliser])
+            manager.take_over()
+            manager.start()
+            for i, sample in manager.guard(iter_wavelength_PID_bond(None, 1, 0, 100)):
+                ...
+            manager.stop()
+            manager.give_back()
+    '''
+    def __init__(self, source_type = wlmConst.cHeNe633, unit = wlmConst.cReturnWavelengthVac, value = 632.991,
+                 chan = 1, period = 3600., min_idle = 1., stabilisers = (), history_size = 1000,
+                 retry = 60.):
+        '''
+            :param source_type: type of the reference laser (cHeNe633, cNeL, cOther, cFreeHeNe, cSLR1530)
+            :param unit: unit of value (cReturnWavelengthVac, cReturnFrequency...)
+            :param value: wavelength (frequency...) of the reference laser
+            :param chan: channel of the switch the reference laser is on
+            :param period: time between calibrations in s
+            :param min_idle: time in s nothing must be busy before a calibration
+            :param stabilisers: Stabiliser objects to pause while calibrating
+            :param history_size: number of the last calibrations kept in history
+            :param retry: time in s after a failed calibration to try again, doubled after every failure in a row
+                          up to period
+        '''
+        self.source_type = source_type
+        self.unit = unit
+        self.value = value
+        self.chan = chan
+        self.period = period
+        self.min_idle = min_idle
+        self.retry = retry
+        self.stabilisers = list(stabilisers)
+        self.history = collections.deque(maxlen=history_size)
+        self.last = None
+        self.failed = None
+        self.failures = 0
+        self._busy = 0
+        self._idle_since = time.time()
+        self._calibrating = False
+        self._condition = threading.Condition()
+        self._auto_cal = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def due(self) -> bool:
+        '''
+            :return: True if the period has passed since the last calibration (or there was none) and the retry
+                     time since the last failure
+        '''
+        now = time.time()
+        if(self.failed is not None and now - self.failed < min(self.retry * 2**(self.failures - 1), self.period)):
+            return False
+        return self.last is None or now - self.last >= self.period
+
+    @property
+    def idle(self) -> bool:
+        '''
+            :return: True if nothing has been busy for min_idle s
+        '''
+        with self._condition:
+            return self._busy == 0 and time.time() - self._idle_since >= self.min_idle
+
+    @contextlib.contextmanager
+    def busy(self):
+        '''
+            Marks a measurement that mustn't be interrupted by a calibration. Waits if a calibration is going on
+        '''
+        with self._condition:
+            while(self._calibrating):
+                self._condition.wait()
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._busy -= 1
+                if(self._busy == 0):
+                    self._idle_since = time.time()
+
+    def guard(self, samples):
+        '''
+            Keeps a sweep busy from its first sample to its end
+
+            :param samples: generator of samples (e.g. iter_wavelength_PID_bond)
+            :return: generator of the same samples
+        '''
+        with self.busy():
+            yield from samples
+
+    def auto_cal_settings(self) -> dict:
+        '''
+            :return: the autocalibration of WLM: {"mode": on/off, "period": number of units, "unit": cAC* constant,
+                     "seconds": period in s or None if the unit isn't a time}
+        '''
+        settings = {"mode": wlmData.dll.GetAutoCalMode(0)}
+        for key, setting in (("period", wlmConst.cmiAutoCalPeriod), ("unit", wlmConst.cmiAutoCalUnit)):
+            value = ctypes.c_int32()
+            reserved = ctypes.c_int32()
+            wlmData.dll.GetAutoCalSetting(setting, ctypes.byref(value), 0, ctypes.byref(reserved))
+            settings[key] = value.value
+        seconds = AUTO_CAL_UNITS.get(settings["unit"])
+        settings["seconds"] = settings["period"] * seconds if seconds is not None else None
+        return settings
+
+    def take_over(self):
+        '''
+            Switches the autocalibration of WLM off and calibrates with its period instead (if it's a time)
+        '''
+        if(self._auto_cal is None):
+            self._auto_cal = self.auto_cal_settings()
+            if(self._auto_cal["mode"] and self._auto_cal["seconds"]):
+                self.period = self._auto_cal["seconds"]
+            wlmData.dll.SetAutoCalMode(0)
+
+    def give_back(self):
+        '''
+            Switches the autocalibration of WLM back to the mode it had before take_over()
+        '''
+        if(self._auto_cal is not None):
+            wlmData.dll.SetAutoCalMode(self._auto_cal["mode"])
+            self._auto_cal = None
+
+    def _pause(self):
+        '''
+            :return: list of the stabilisers which were running and are held now
+        '''
+        return [stabiliser for stabiliser in self.stabilisers if stabiliser.pause()]
+
+    def calibrate(self) -> int:
+        '''
+            Calibrates at once: waits until nothing is busy, pauses the stabilisers, calibrates
+            and resumes them
+
+            :return: the answer of Calibration (ResERR_NoErr or an error code)
+        '''
+        with self._condition:
+            while(self._busy > 0 or self._calibrating):
+                self._condition.wait(0.1)
+            self._calibrating = True
+        try:
+            start = time.time()
+            paused = self._pause()
+            pause = time.perf_counter()
+            try:
+                result = wlmData.dll.Calibration(self.source_type, self.unit, self.value, self.chan)
+            finally:
+                for stabiliser in paused:
+                    stabiliser.resume()
+            downtime = time.perf_counter() - pause if paused else 0.
+            effect = wlmData.dll.GetCalibrationEffect(0)
+            wavelength = wlmData.dll.GetCalWavelength(0, 0)
+            self.history.append(CalibrationRecord(start, result, effect, wavelength, downtime))
+            if(result == wlmConst.ResERR_NoErr):
+                self.last = start
+                self.failed = None
+                self.failures = 0
+            else:
+                # the stabilisers mustn't be paused every check while it keeps failing
+                self.failed = start
+                self.failures += 1
+            return result
+        finally:
+            with self._condition:
+                self._calibrating = False
+                self._idle_since = time.time()
+                self._condition.notify_all()
+
+    def step(self) -> bool:
+        '''
+            Calibrates if it's due and WLM is idle
+
+            :return: True if calibrated
+        '''
+        if(not self.due or not self.idle):
+            return False
+        self.calibrate()
+        return True
+
+    def start(self, check_period = 1.) -> threading.Thread:
+        '''
+            Checks in a daemon thread whether to calibrate
+
+            :param check_period: time between the checks in s
+            :return: the thread
+        '''
+        self._stop.clear()
+
+        def run():
+            while(not self._stop.is_set()):
+                self.step()
+                self._stop.wait(check_period)
+        self._thread = threading.Thread(target=run, name="calibration", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if(self._thread is not None):
+            self._thread.join()
+            self._thread = None
+
+    def effects(self):
+        '''
+            :return: (times, calibration effects) - tuple pack of lists of the successful calibrations
+        '''
+        records = [r for r in self.history if r.result == wlmConst.ResERR_NoErr]
+        return [r.time for r in records], [r.effect for r in records]
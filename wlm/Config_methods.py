@@ -0,0 +1,183 @@
+import ctypes
+import math
+
+import wlmData
+import wlmConst
+
+# order of applying the settings: the modes of measurement first, then what depends on them.
+# The exposure mode goes before the exposure (manual exposure isn't taken in auto mode),
+# the PID settings before the regulation is switched on
+ORDER = ("wide_mode", "fast_mode", "interval_mode", "interval", "trigger_rate", "switcher_signal", "averaging",
+         "exposure_mode", "exposure", "pid", "deviation_mode")
+
+
+def _plain(name, *args):
+    return name, args, lambda answer: answer
+
+
+def _pointers(name, args, types):
+    '''
+        Read with output pointers: the values are taken from the pointers after the call
+    '''
+    values = [t() for t in types]
+    return name, tuple(args) + tuple(ctypes.byref(v) for v in values), lambda answer: tuple(v.value for v in values)
+
+
+# kind of the setting -> (read(*key args), write(*key args, value)). read gives (DLL function, arguments, function
+# taking the answer and giving the value), write gives (DLL function, arguments)
+SETTINGS = {
+    "wide_mode": (lambda: _plain("GetWideMode", 0),
+                  lambda value: ("SetWideMode", (value,))),
+    "fast_mode": (lambda: _plain("GetFastMode", False),
+                  lambda value: ("SetFastMode", (value,))),
+    "interval_mode": (lambda: _plain("GetIntervalMode", False),
+                      lambda value: ("SetIntervalMode", (value,))),
+    "interval": (lambda: _plain("GetInterval", 0),
+                 lambda value: ("SetInterval", (value,))),
+    "trigger_rate": (lambda: _plain("GetInternalTriggerRate", 0.),
+                     lambda value: ("SetInternalTriggerRate", (value,))),
+    "switcher_signal": (lambda signal: _pointers("GetSwitcherSignalStates", (signal,), (ctypes.c_int32, ctypes.c_int32)),
+                        lambda signal, value: ("SetSwitcherSignalStates", (signal, value[0], value[1]))),
+    "averaging": (lambda chan, setting: _plain("GetAveragingSettingNum", chan, setting, 0),
+                  lambda chan, setting, value: ("SetAveragingSettingNum", (chan, setting, value))),
+    "exposure_mode": (lambda chan: _plain("GetExposureModeNum", chan, False),
+                      lambda chan, value: ("SetExposureModeNum", (chan, value))),
+    "exposure": (lambda chan, arr: _plain("GetExposureNum", chan, arr, 0),
+                 lambda chan, arr, value: ("SetExposureNum", (chan, arr, value))),
+    "pid": (lambda setting, port: _pointers("GetPIDSetting", (setting, port), (ctypes.c_int32, ctypes.c_double)),
+            lambda setting, port, value: ("SetPIDSetting", (setting, port, value[0], value[1]))),
+    "deviation_mode": (lambda: _plain("GetDeviationMode", False),
+                       lambda value: ("SetDeviationMode", (value,))),
+}
+
+
+def _same(a, b) -> bool:
+    if(isinstance(a, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if(isinstance(a, float) or isinstance(b, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    return a == b
+
+
+def _call_all(calls, dispatcher):
+    '''
+        Makes the calls one after another, in one batch of the dispatcher if it's given
+
+        :param calls: list of (DLL function, arguments)
+        :param dispatcher: DllDispatcher or None
+        :return: list of the answers
+    '''
+    if(dispatcher is not None):
+        return [future.result() for future in dispatcher.submit_batch(calls)]
+    return [getattr(wlmData.dll, name)(*args) for name, args in calls]
+
+
+class WlmConfig:
+    '''
+        Declarative set of WLM settings (a preset of an experiment).
+        A setting is identified by a key: (kind, *arguments) where kind is one of SETTINGS, e.g.
+        ("exposure", chan, arr) or ("pid", wlmConst.cmiPID_P, port).
+        apply() reads the state of all the settings of the config in one batch and changes only
+        the ones that differ, in the order of ORDER
+
+        Example:
+            config = WlmConfig().set_exposure_mode(1, False).set_exposure(1, 5).set_deviation_mode(True)
+            errors = config.apply(dispatcher)
+    '''
+    def __init__(self, settings = None):
+        '''
+            :param settings: dictionary key -> value
+        '''
+        self.settings = dict(settings) if settings is not None else {}
+
+    def set(self, kind: str, *args):
+        '''
+            Adds a setting. The last argument is the value, the others make the key
+
+            :return: self
+        '''
+        assert kind in SETTINGS, "Error: unknown setting %s" % kind
+        self.settings[(kind,) + tuple(args[:-1])] = args[-1]
+        return self
+
+    def set_wide_mode(self, value: int):
+        return self.set("wide_mode", value)
+
+    def set_fast_mode(self, value: bool):
+        return self.set("fast_mode", value)
+
+    def set_interval_mode(self, value: bool):
+        return self.set("interval_mode", value)
+
+    def set_interval(self, value: int):
+        return self.set("interval", value)
+
+    def set_trigger_rate(self, value: float):
+        return self.set("trigger_rate", value)
+
+    def set_switcher_signal(self, signal: int, use: int, show: int):
+        return self.set("switcher_signal", signal, (use, show))
+
+    def set_averaging(self, chan: int, setting: int, value: int):
+        return self.set("averaging", chan, setting, value)
+
+    def set_exposure_mode(self, chan: int, auto: bool):
+        return self.set("exposure_mode", chan, auto)
+
+    def set_exposure(self, chan: int, value: int, arr = 1):
+        return self.set("exposure", chan, arr, value)
+
+    def set_pid(self, setting: int, port: int, i_value: int, d_value: float):
+        return self.set("pid", setting, port, (i_value, d_value))
+
+    def set_deviation_mode(self, value: bool):
+        return self.set("deviation_mode", value)
+
+    @staticmethod
+    def read(keys, dispatcher = None):
+        '''
+            Reads the current values of the settings in one batch
+
+            :param keys: keys of the settings
+            :param dispatcher: DllDispatcher to use or None to call wlmData.dll directly
+            :return: WlmConfig with the current values
+        '''
+        keys = list(keys)
+        reads = [SETTINGS[key[0]][0](*key[1:]) for key in keys]
+        answers = _call_all([(name, args) for name, args, _ in reads], dispatcher)
+        return WlmConfig({key: take(answer) for key, (_, _, take), answer in zip(keys, reads, answers)})
+
+    def diff(self, current):
+        '''
+            Finds the settings that differ from the current ones
+
+            :param current: WlmConfig with the current values
+            :return: list of (key, value) in the order to apply
+        '''
+        changed = [(key, value) for key, value in self.settings.items()
+                   if key not in current.settings or not _same(value, current.settings[key])]
+        changed.sort(key=lambda item: ORDER.index(item[0][0]))
+        return changed
+
+    def apply(self, dispatcher = None, current = None):
+        '''
+            Reads the current state and sets only the changed settings
+
+            :param dispatcher: DllDispatcher to use or None to call wlmData.dll directly
+            :param current: WlmConfig with the current values if they were just read, None - read them
+            :return: dictionary key -> error code of the setter for the settings that were set
+                     (see return_set_errors; wlmConst.ResERR_NoErr if ok)
+        '''
+        if(current is None):
+            current = WlmConfig.read(self.settings, dispatcher)
+        changed = self.diff(current)
+        writes = [SETTINGS[key[0]][1](*(key[1:] + (value,))) for key, value in changed]
+        answers = _call_all(writes, dispatcher)
+        return {key: answer for (key, _), answer in zip(changed, answers)}
+
+    def failed(self, answers) -> dict:
+        '''
+            :param answers: the result of apply()
+            :return: only the settings that weren't set
+        '''
+        return {key: answer for key, answer in answers.items() if answer != wlmConst.ResERR_NoErr}
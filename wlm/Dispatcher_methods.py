@@ -0,0 +1,152 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+import wlmData
+
+# calls that only wait for WLM events. They may block for long and the DLL allows them from any thread,
+# so they go straight to the DLL and don't hold the dispatcher
+PASSTHROUGH = frozenset(("WaitForWLMEvent", "WaitForWLMEventEx", "WaitForNextWLMEvent", "WaitForNextWLMEventEx"))
+
+# calls that don't change the state of WLM. Equal reads waiting in the queue at the same time are made once
+READ_PREFIXES = ("Get", "ConvertUnit", "ConvertDeltaUnit")
+
+
+def is_read(name: str, args) -> bool:
+    '''
+        Tells whether the call only reads a value and its result can be shared between clients
+
+        :param name: name of the DLL function
+        :param args: arguments of the call
+        :return: True for Get... and ConvertUnit calls with plain number arguments (no output pointers)
+    '''
+    return name.startswith(READ_PREFIXES) and all(isinstance(a, (int, float, bool)) for a in args)
+
+
+class DllDispatcher:
+    '''
+        Owns the WLM DLL: all the calls are made by one thread in the order they were submitted.
+        A batch (list of calls) is executed as a whole, so e.g. SetDeviationSignalNum and the following
+        GetDeviationSignalNum of one client can't be split by a call of another one.
+        Equal reads from different clients that wait in the queue together are made once; any other call
+        between them (a setting) breaks the sharing, so the order of reads and settings is kept
+
+        Example:
+            dispatcher = DllDispatcher()
+            dispatcher.install()  # wlmData.dll goes through the dispatcher from now on
+            set_f, get_f = dispatcher.submit_batch([("SetDeviationSignalNum", (1, 2000.)),
+                                                    ("GetDeviationSignalNum", (1, 0.))])
+            PID = get_f.result()
+    '''
+    def __init__(self, dll = None):
+        '''
+            :param dll: the ctypes handle (wlmData.dll if None)
+        '''
+        self.dll = wlmData.dll if dll is None else dll
+        self.calls = 0  # foreign calls made
+        self.shared = 0  # reads answered without a foreign call
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="wlm dispatcher", daemon=True)
+        self._thread.start()
+        self._installed = None
+
+    def submit(self, name: str, *args) -> Future:
+        '''
+            Queues one call
+
+            :param name: name of the DLL function
+            :return: future of the value the function returns
+        '''
+        return self.submit_batch([(name, args)])[0]
+
+    def submit_batch(self, calls):
+        '''
+            Queues calls that have to be made one after another without calls of other clients between them
+
+            :param calls: list of (name, args) pairs
+            :return: list of futures in the same order
+        '''
+        batch = [(name, tuple(args), Future()) for name, args in calls]
+        self._queue.put(batch)
+        return [future for _, _, future in batch]
+
+    def call(self, name: str, *args):
+        '''
+            Makes the call through the dispatcher and waits for the result
+        '''
+        if(name in PASSTHROUGH):
+            return getattr(self.dll, name)(*args)
+        if(threading.current_thread() is self._thread):
+            self.calls += 1
+            return getattr(self.dll, name)(*args)
+        return self.submit(name, *args).result()
+
+    def close(self):
+        '''
+            Stops the dispatcher thread after the queued calls are made and puts the DLL back to wlmData
+        '''
+        self.uninstall()
+        self._queue.put(None)
+        self._thread.join()
+
+    def install(self):
+        '''
+            Replaces wlmData.dll with a proxy, so all the existing code calls the DLL through the dispatcher
+        '''
+        if(self._installed is None):
+            self._installed = wlmData.dll
+            wlmData.dll = DispatchedDLL(self)
+
+    def uninstall(self):
+        if(self._installed is not None):
+            wlmData.dll = self._installed
+            self._installed = None
+
+    def _run(self):
+        while(True):
+            batches = [self._queue.get()]
+            # everything that came meanwhile is executed in the same round and may share reads
+            while(True):
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            reads = {}
+            for batch in batches:
+                if(batch is None):
+                    return
+                for name, args, future in batch:
+                    if(not future.set_running_or_notify_cancel()):
+                        continue
+                    read = is_read(name, args)
+                    key = (name, args)
+                    if(read and key in reads):
+                        self.shared += 1
+                        future.set_result(reads[key])
+                        continue
+                    if(not read):
+                        reads.clear()
+                    try:
+                        result = getattr(self.dll, name)(*args)
+                    except Exception as e:
+                        future.set_exception(e)
+                        continue
+                    finally:
+                        self.calls += 1
+                    if(read):
+                        reads[key] = result
+                    future.set_result(result)
+
+
+class DispatchedDLL:
+    '''
+        Looks like the ctypes handle of the DLL but sends every call to the dispatcher
+    '''
+    def __init__(self, dispatcher: DllDispatcher):
+        self._dispatcher = dispatcher
+
+    def __getattr__(self, name):
+        def call(*args):
+            return self._dispatcher.call(name, *args)
+        call.__name__ = name
+        return call
@@ -0,0 +1,174 @@
+import collections
+import threading
+import time
+
+import wlmData
+from Resonance_methods import ResonanceSearch
+
+RESONANCE_LOST = -45
+
+
+class DitherLock:
+    '''
+        Keeps the laser on the maximum of the power after a resonator (extremum seeking): PID is dithered
+        by +-amplitude around the centre with a square wave, the power meter reads both sides and the centre
+        moves by gain * amplitude * (P+ - P-) / (P+ + P-) after every pair, i.e. up the slope of the resonance.
+        The loop runs as fast as the power meter reads, WLM isn't waited for: its frequency is read every
+        iteration (it's the last measurement) and logged when it's new, so both instruments work at their
+        own rate.
+
+        Example:
+            lock = DitherLock(power_meter, amplitude=2, gain=20, min_power=1e-06)
+            lock.acquire(500, 3500, 64)
+            lock.start()
+            ...
+            lock.stop()
+            print(lock.log[-1])
+    '''
+    def __init__(self, power_meter, amplitude = 1., gain = 20., max_step = 2., settle_time = 0, min_power = 0.,
+                 lost_after = 20, tolerance = 0.05, chan = 1, max_PID_val = 4096, callback = None, log_size = 100000):
+        '''
+            :param power_meter: object with the property read (ThorlabsPM100)
+            :param amplitude: amplitude of the dither in mV (not less than the PID resolution 0.125 mV)
+            :param gain: step of the centre in amplitudes for the full asymmetry of the power
+            :param max_step: max step of the centre in mV per pair of reads
+            :param settle_time: time in ms to wait after setting PID before reading the power
+            :param min_power: power below which the laser is taken for being off the resonance
+            :param lost_after: number of pairs below min_power to give up the lock
+            :param tolerance: max asymmetry (P+ - P-) / (P+ + P-) of a locked laser
+            :param chan: channel of WLM
+            :param max_PID_val: max val in mV for PID
+            :param callback: function called as callback(PID, power, frequency, locked) after every pair.
+                             If it returns True the lock stops
+            :param log_size: number of the last WLM measurements kept in log
+        '''
+        self.power_meter = power_meter
+        self.amplitude = amplitude
+        self.gain = gain
+        self.max_step = max_step
+        self.settle_time = settle_time
+        self.min_power = min_power
+        self.lost_after = lost_after
+        self.tolerance = tolerance
+        self.chan = chan
+        self.max_PID_val = max_PID_val
+        self.callback = callback
+        # (time, PID of the centre, power, frequency in THz) per new measurement of WLM
+        self.log = collections.deque(maxlen=log_size)
+        self.PID = None
+        self.power = 0.
+        self.frequency = 0.
+        self.locked = False
+        self.pairs = 0
+        self.result = None
+        self._elapsed = 0.
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def rate(self) -> float:
+        '''
+            :return: pairs of reads per s of the last run
+        '''
+        if(self.pairs == 0 or self._elapsed <= 0):
+            return 0.
+        return self.pairs / self._elapsed
+
+    def acquire(self, PID_start, PID_stop, PID_step, resolution = 0.25):
+        '''
+            Finds the resonance with ResonanceSearch and takes its PID for the centre
+
+            :return: (PID, power, frequency in THz) - tuple pack or None
+        '''
+        search = ResonanceSearch(self.power_meter, self.settle_time, chan=self.chan, max_PID_val=self.max_PID_val)
+        found = search.find(PID_start, PID_stop, PID_step, resolution, self.min_power if self.min_power > 0 else None)
+        if(found is not None):
+            self.PID = found[0]
+        return found
+
+    def _read(self, PID: float) -> float:
+        wlmData.dll.SetDeviationSignalNum(self.chan, self._quantise(PID))
+        if(self.settle_time > 0):
+            time.sleep(self.settle_time / 1000)
+        return self.power_meter.read
+
+    def _quantise(self, PID: float) -> float:
+        # the PID output has the resolution of 0.125 mV
+        return min(max(round(PID * 8) / 8, 0.), self.max_PID_val)
+
+    def _log_frequency(self, now: float):
+        frequency = wlmData.dll.GetFrequencyNum(self.chan, 0)
+        if(frequency != self.frequency):
+            self.frequency = frequency
+            if(frequency > 0):
+                self.log.append((now, self.PID, self.power, frequency))
+
+    def run(self, start_PID_point = None) -> int:
+        '''
+            Runs the lock in this thread until stop() or the callback stops it
+
+            :param start_PID_point: PID in mV of the resonance, None - the one from acquire() or the current PID
+            :return: 0 if stopped, -42 if PID went out of range, RESONANCE_LOST if the power stayed below min_power
+        '''
+        if(start_PID_point is not None):
+            self.PID = start_PID_point
+        elif(self.PID is None):
+            self.PID = wlmData.dll.GetDeviationSignalNum(self.chan, 0)
+        self.pairs = 0
+        self._elapsed = 0.
+        lost = 0
+        result = 0
+        begin = time.perf_counter()
+        try:
+            while(not self._stop.is_set()):
+                if(self.PID - self.amplitude < 0 or self.PID + self.amplitude > self.max_PID_val):
+                    result = -42
+                    break
+                upper = self._read(self.PID + self.amplitude)
+                lower = self._read(self.PID - self.amplitude)
+                self.power = (upper + lower) / 2
+                asymmetry = (upper - lower) / (upper + lower) if upper + lower > 0 else 0.
+                step = min(max(self.gain * self.amplitude * asymmetry, -self.max_step), self.max_step)
+                self.PID += step
+                self.pairs += 1
+                now = time.time()
+                self._log_frequency(now)
+                lost = lost + 1 if self.power < self.min_power else 0
+                self.locked = lost == 0 and abs(asymmetry) <= self.tolerance
+                if(self.callback is not None and self.callback(self.PID, self.power, self.frequency, self.locked)):
+                    break
+                if(lost >= self.lost_after):
+                    result = RESONANCE_LOST
+                    break
+        finally:
+            self._elapsed = time.perf_counter() - begin
+            self.locked = False
+            wlmData.dll.SetDeviationSignalNum(self.chan, self._quantise(self.PID))
+        self.result = result
+        return result
+
+    def start(self, start_PID_point = None) -> threading.Thread:
+        '''
+            Runs the lock in a daemon thread
+
+            :return: the thread
+        '''
+        self._stop.clear()
+        self.result = None
+        self._thread = threading.Thread(target=self.run, args=(start_PID_point,), name="dither lock", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout = None):
+        '''
+            Stops the lock and leaves PID at the centre
+
+            :param timeout: time to wait in s, None - until it stops
+        '''
+        self._stop.set()
+        if(self._thread is not None):
+            self._thread.join(timeout)
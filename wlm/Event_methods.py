@@ -0,0 +1,66 @@
+import ctypes
+import threading
+
+import wlmData
+import wlmConst
+
+# mode of the event that brings a new wavelength of the channel
+WAVELENGTH_MODES = {1: wlmConst.cmiWavelength1, 2: wlmConst.cmiWavelength2, 3: wlmConst.cmiWavelength3,
+                    4: wlmConst.cmiWavelength4, 5: wlmConst.cmiWavelength5, 6: wlmConst.cmiWavelength6,
+                    7: wlmConst.cmiWavelength7, 8: wlmConst.cmiWavelength8, 9: wlmConst.cmiWavelength9,
+                    10: wlmConst.cmiWavelength10, 11: wlmConst.cmiWavelength11, 12: wlmConst.cmiWavelength12,
+                    13: wlmConst.cmiWavelength13, 14: wlmConst.cmiWavelength14, 15: wlmConst.cmiWavelength15,
+                    16: wlmConst.cmiWavelength16, 17: wlmConst.cmiWavelength17}
+
+
+class EventPump:
+    '''
+        The only consumer of WaitForWLMEvent in the process. It passes every event to the listeners,
+        so the telemetry, the caches and the triggered measurements don't steal the events from each other.
+        A listener is called as listener(mode, int_val, dbl_val) from the thread of the pump and must be fast
+    '''
+    def __init__(self, timeout = 200):
+        '''
+            :param timeout: time in ms to wait for an event before checking whether the pump is stopped
+        '''
+        self.timeout = timeout
+        self.listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, listener):
+        self.listeners = self.listeners + [listener]
+
+    def remove_listener(self, listener):
+        # == and not is: every self.on_event is a new bound method, equal to the one added
+        self.listeners = [l for l in self.listeners if l != listener]
+
+    def start(self) -> threading.Thread:
+        '''
+            Starts waiting for the events in a daemon thread
+
+            :return: the thread
+        '''
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wlm events", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if(self._thread is not None):
+            self._thread.join()
+
+    def _run(self):
+        mode = ctypes.c_int32()
+        int_val = ctypes.c_int32()
+        dbl_val = ctypes.c_double()
+        wlmData.dll.Instantiate(wlmConst.cInstNotification, wlmConst.cNotifyInstallWaitEvent, self.timeout, 0)
+        try:
+            while(not self._stop.is_set()):
+                if(wlmData.dll.WaitForWLMEvent(ctypes.byref(mode), ctypes.byref(int_val), ctypes.byref(dbl_val)) > 0):
+                    # the list is replaced, not changed, so it can be iterated without a lock
+                    for listener in self.listeners:
+                        listener(mode.value, int_val.value, dbl_val.value)
+        finally:
+            wlmData.dll.Instantiate(wlmConst.cInstNotification, wlmConst.cNotifyRemoveWaitEvent, 0, 0)
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import wlmData
+import wlmConst
+
+# (index of min amplitude, index of max amplitude, min exposure, max exposure) for the CCD arrays
+ARRAYS = {1: (wlmConst.cMin1, wlmConst.cMax1, wlmConst.cExpoMin, wlmConst.cExpoMax),
+          2: (wlmConst.cMin2, wlmConst.cMax2, wlmConst.cExpo2Min, wlmConst.cExpo2Max)}
+
+
+class ExposureOptimiser:
+    '''
+        Keeps the exposure as short as possible while the interferogram amplitude (max - min of the array)
+        stays in the band [low, high]. The amplitude grows linearly with exposure, so one measurement is
+        enough to find the new exposure. Inside the band nothing is changed, so the exposure doesn't jitter.
+        The shorter the exposure the faster the WLM measures and the faster the stabiliser can step
+
+        Example:
+            optimiser = ExposureOptimiser(1, low=1500, high=3000)
+            optimiser.optimise()   # once
+            optimiser.start()      # follow the changes of the laser power
+    '''
+    def __init__(self, chan = 1, low = 1500, high = 3000, saturation = 3900, aim = 0.2, arrays = (1,)):
+        '''
+            :param chan: channel to use
+            :param low: min amplitude of the band
+            :param high: max amplitude of the band
+            :param saturation: max level of the array when the signal is cut. Exposure is halved then
+            :param aim: where to put the amplitude in the band: 0 - low edge (shortest exposure), 1 - high edge
+            :param arrays: CCD arrays to optimise (1, 2)
+        '''
+        assert 0 < low < high, "Error: wrong band of amplitude"
+        self.chan = chan
+        self.low = low
+        self.high = high
+        self.saturation = saturation
+        self.aim = aim
+        self.arrays = tuple(arrays)
+        self.exposure = {}
+        self._previous_mode = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def target(self) -> float:
+        return self.low + self.aim * (self.high - self.low)
+
+    def amplitude(self, arr = 1):
+        '''
+            Reads the levels by GetAmplitudeNum(chan, cMin1/cMax1...): it gives the same min and max of
+            the array as GetMinPeak/GetMaxPeak (GetMinPeak2/GetMaxPeak2 for the array 2), but of the channel
+            asked, while those have no channel and give the last measured one, i.e. another channel
+            of the switch in multichannel mode
+
+            :return: (max - min of the interferogram, max level) - tuple pack
+        '''
+        i_min, i_max, _, _ = ARRAYS[arr]
+        level_min = wlmData.dll.GetAmplitudeNum(self.chan, i_min, 0)
+        level_max = wlmData.dll.GetAmplitudeNum(self.chan, i_max, 0)
+        return level_max - level_min, level_max
+
+    def next_exposure(self, exposure: float, amplitude: float, level_max: float, arr = 1) -> float:
+        '''
+            Finds the exposure for the next measurement
+
+            :param exposure: current exposure in ms
+            :param amplitude: max - min of the interferogram
+            :param level_max: max level of the interferogram
+            :param arr: CCD array
+            :return: new exposure in ms (the same if the amplitude is in the band)
+        '''
+        _, _, r_min, r_max = ARRAYS[arr]
+        expo_min = wlmData.dll.GetExposureRangeEx(r_min)
+        expo_max = wlmData.dll.GetExposureRangeEx(r_max)
+        if(level_max >= self.saturation):
+            new = exposure / 2
+        elif(amplitude <= 0):
+            new = exposure * 2
+        elif(self.low <= amplitude <= self.high):
+            return exposure
+        else:
+            new = exposure * self.target / amplitude
+        return min(max(new, expo_min), expo_max)
+
+    def step(self) -> bool:
+        '''
+            One adaptation of the exposure of every array
+
+            :return: True if all the amplitudes are in the band
+        '''
+        in_band = True
+        for arr in self.arrays:
+            exposure = wlmData.dll.GetExposureNumEx(self.chan, arr, 0)
+            amplitude, level_max = self.amplitude(arr)
+            new = self.next_exposure(exposure, amplitude, level_max, arr)
+            self.exposure[arr] = new
+            if(new != exposure):
+                in_band = False
+                wlmData.dll.SetExposureNumEx(self.chan, arr, new)
+        return in_band
+
+    def optimise(self, max_steps = 10, time_pause = None) -> dict:
+        '''
+            Switches to manual exposure and adapts it until the amplitudes are in the band
+
+            :param max_steps: max number of adaptations
+            :param time_pause: pause in ms after a change (two exposures if None)
+            :return: dictionary array -> exposure in ms
+        '''
+        if(self._previous_mode is None):
+            self._previous_mode = wlmData.dll.GetExposureModeNum(self.chan, False)
+        wlmData.dll.SetExposureModeNum(self.chan, False)
+        for _ in range(max_steps):
+            if(self.step()):
+                break
+            pause = 2 * max(self.exposure.values()) if time_pause is None else time_pause
+            time.sleep(pause / 1000)
+        return dict(self.exposure)
+
+    def set_auto_limits(self, margin = 2.):
+        '''
+            Passes the found exposure to the built-in autoexposure as its limits, so if it's switched on
+            (autoexposure(chan, True)) it stays near the optimum
+
+            :param margin: the max limit is exposure * margin
+            :return: 0 or set error of SetAutoExposureSetting
+        '''
+        exposure = self.exposure.get(1, wlmData.dll.GetExposureNumEx(self.chan, 1, 0))
+        answer = wlmData.dll.SetAutoExposureSetting(self.chan, wlmConst.cmiAutoExpoMin, 0, exposure)
+        if(answer != wlmConst.ResERR_NoErr):
+            return answer
+        return wlmData.dll.SetAutoExposureSetting(self.chan, wlmConst.cmiAutoExpoMax, 0, exposure * margin)
+
+    def start(self, period = None) -> threading.Thread:
+        '''
+            Adapts the exposure continuously in a daemon thread
+
+            :param period: time between adaptations in ms (two exposures if None)
+            :return: the thread
+        '''
+        self.optimise()
+        self._stop.clear()
+
+        def run():
+            while(not self._stop.is_set()):
+                self.step()
+                pause = 2 * max(self.exposure.values()) if period is None else period
+                self._stop.wait(pause / 1000)
+        self._thread = threading.Thread(target=run, name="exposure", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, restore = True):
+        '''
+            Stops the adaptation
+
+            :param restore: give back the exposure mode that was before
+        '''
+        self._stop.set()
+        if(self._thread is not None):
+            self._thread.join()
+            self._thread = None
+        if(restore and self._previous_mode is not None):
+            wlmData.dll.SetExposureModeNum(self.chan, self._previous_mode)
+            self._previous_mode = None
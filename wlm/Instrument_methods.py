@@ -0,0 +1,254 @@
+import json
+import threading
+import time
+
+import wlmData
+
+# upper bounds in s of the latency buckets exported to Prometheus
+PROMETHEUS_BUCKETS = (1e-06, 5e-06, 1e-05, 5e-05, 1e-04, 5e-04, 1e-03, 5e-03, 1e-02, 5e-02, 0.1, 0.5, 1., 5.)
+
+
+class LatencyHistogram:
+    '''
+        Histogram of latencies in ns with buckets of constant relative width (as HdrHistogram):
+        values below 2**(sub_bits + 1) are kept exactly, larger ones in 2**sub_bits buckets per power of 2,
+        so the error of a percentile is below 2**-sub_bits of the value
+    '''
+    def __init__(self, sub_bits = 4):
+        '''
+            :param sub_bits: number of significant bits kept
+        '''
+        self.sub_bits = sub_bits
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.sub_bits - 1
+        if(shift <= 0):
+            return value
+        return (shift << self.sub_bits) + (value >> shift)
+
+    def _upper(self, index: int) -> int:
+        '''
+            :return: the greatest value of the bucket
+        '''
+        shift = (index >> self.sub_bits) - 1
+        if(shift <= 0):
+            return index
+        mantissa = index - (shift << self.sub_bits)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int):
+        '''
+            :param value: latency in ns
+        '''
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if(self.min is None or value < self.min):
+            self.min = value
+        if(self.max is None or value > self.max):
+            self.max = value
+
+    def percentile(self, p: float) -> int:
+        '''
+            :param p: percentile 0 - 100
+            :return: latency in ns (the upper bound of its bucket) or 0 if nothing was recorded
+        '''
+        if(self.count == 0):
+            return 0
+        rank = max(1, round(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if(seen >= rank):
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        '''
+            :param bounds: upper bounds in ns, ascending
+            :return: list of the numbers of values not greater than every bound (by the buckets)
+        '''
+        counts = [0] * len(bounds)
+        for index, n in self.buckets.items():
+            upper = self._upper(index)
+            for i, bound in enumerate(bounds):
+                if(upper <= bound):
+                    counts[i] += n
+        return counts
+
+    def summary(self) -> dict:
+        return {"count": self.count, "total_ns": self.total, "min_ns": self.min, "max_ns": self.max,
+                "p50_ns": self.percentile(50), "p90_ns": self.percentile(90), "p99_ns": self.percentile(99),
+                "p999_ns": self.percentile(99.9)}
+
+
+def is_error(name: str, answer) -> bool:
+    '''
+        :param name: name of the DLL function
+        :param answer: what it returned
+        :return: True if the answer is an error code: not ResERR_NoErr for Set... functions,
+                 negative for the others (the Get... errors as ErrNoSignal are negative)
+    '''
+    if(not isinstance(answer, (int, float)) or isinstance(answer, bool)):
+        return False
+    if(name.startswith("Set")):
+        return answer != 0
+    return answer < 0
+
+
+class DllInstrument:
+    '''
+        Opt-in statistics of the foreign calls: number of calls, latency histogram and error codes for every
+        DLL function. While it isn't installed there is no cost at all, when disabled a call costs one
+        attribute lookup more.
+        scope() names the code the calls are made from, so the time of every loop is seen separately
+
+        Example:
+            instrument = DllInstrument()
+            instrument.install()
+            with instrument.scope("stabiliser"):
+                reference_const_PID_stabilisator(...)
+            print(instrument.to_prometheus())
+    '''
+    def __init__(self, dll = None, sub_bits = 4):
+        '''
+            :param dll: the handle to instrument (wlmData.dll if None)
+            :param sub_bits: precision of the histograms (see LatencyHistogram)
+        '''
+        self.dll = wlmData.dll if dll is None else dll
+        self.sub_bits = sub_bits
+        self.enabled = True
+        self.latency = {}
+        self.errors = {}
+        self.scopes = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._installed = None
+
+    def install(self):
+        '''
+            Replaces wlmData.dll with the instrumented proxy
+        '''
+        if(self._installed is None):
+            self._installed = wlmData.dll
+            self.dll = wlmData.dll
+            wlmData.dll = InstrumentedDLL(self)
+
+    def uninstall(self):
+        if(self._installed is not None):
+            wlmData.dll = self._installed
+            self._installed = None
+
+    def reset(self):
+        with self._lock:
+            self.latency = {}
+            self.errors = {}
+            self.scopes = {}
+
+    def scope(self, name: str):
+        '''
+            :param name: name of the code making the calls
+            :return: context manager adding the calls inside it (in this thread) to the scope
+        '''
+        return _Scope(self, name)
+
+    def record(self, name: str, elapsed: int, answer):
+        '''
+            :param name: name of the DLL function
+            :param elapsed: latency in ns
+            :param answer: what the function returned
+        '''
+        scope = getattr(self._local, "scope", None)
+        with self._lock:
+            histogram = self.latency.get(name)
+            if(histogram is None):
+                histogram = self.latency[name] = LatencyHistogram(self.sub_bits)
+            histogram.record(elapsed)
+            if(is_error(name, answer)):
+                key = (name, int(answer))
+                self.errors[key] = self.errors.get(key, 0) + 1
+            if(scope is not None):
+                calls, total = self.scopes.get(scope, (0, 0))
+                self.scopes[scope] = (calls + 1, total + elapsed)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "functions": {name: h.summary() for name, h in self.latency.items()},
+                "errors": [{"function": name, "code": code, "count": n} for (name, code), n in self.errors.items()],
+                "scopes": {scope: {"calls": calls, "total_ns": total} for scope, (calls, total) in self.scopes.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        '''
+            :return: the statistics in the Prometheus text format
+        '''
+        bounds = [int(b * 1e9) for b in PROMETHEUS_BUCKETS]
+        lines = ["# TYPE wlm_dll_calls_total counter"]
+        with self._lock:
+            latency = list(self.latency.items())
+            errors = list(self.errors.items())
+            scopes = list(self.scopes.items())
+        for name, h in latency:
+            lines.append('wlm_dll_calls_total{function="%s"} %d' % (name, h.count))
+        lines.append("# TYPE wlm_dll_latency_seconds histogram")
+        for name, h in latency:
+            for bound, n in zip(PROMETHEUS_BUCKETS, h.cumulative(bounds)):
+                lines.append('wlm_dll_latency_seconds_bucket{function="%s",le="%g"} %d' % (name, bound, n))
+            lines.append('wlm_dll_latency_seconds_bucket{function="%s",le="+Inf"} %d' % (name, h.count))
+            lines.append('wlm_dll_latency_seconds_sum{function="%s"} %.9f' % (name, h.total / 1e9))
+            lines.append('wlm_dll_latency_seconds_count{function="%s"} %d' % (name, h.count))
+        lines.append("# TYPE wlm_dll_errors_total counter")
+        for (name, code), n in errors:
+            lines.append('wlm_dll_errors_total{function="%s",code="%d"} %d' % (name, code, n))
+        lines.append("# TYPE wlm_dll_scope_seconds_total counter")
+        for scope, (calls, total) in scopes:
+            lines.append('wlm_dll_scope_seconds_total{scope="%s"} %.9f' % (scope, total / 1e9))
+        return "\n".join(lines) + "\n"
+
+
+class _Scope:
+    def __init__(self, instrument: DllInstrument, name: str):
+        self.instrument = instrument
+        self.name = name
+        self._previous = None
+
+    def __enter__(self):
+        local = self.instrument._local
+        self._previous = getattr(local, "scope", None)
+        local.scope = self.name
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.instrument._local.scope = self._previous
+
+
+class InstrumentedDLL:
+    '''
+        Looks like the ctypes handle of the DLL and times every call while the instrument is enabled
+    '''
+    def __init__(self, instrument: DllInstrument):
+        self._instrument = instrument
+
+    def __getattr__(self, name):
+        instrument = self._instrument
+        function = getattr(instrument.dll, name)
+        if(not instrument.enabled):
+            return function
+
+        def call(*args):
+            start = time.perf_counter_ns()
+            answer = function(*args)
+            instrument.record(name, time.perf_counter_ns() - start, answer)
+            return answer
+        call.__name__ = name
+        return call
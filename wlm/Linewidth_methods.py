@@ -0,0 +1,146 @@
+import ctypes
+import threading
+import time
+
+import numpy as np
+
+import wlmData
+from Buffer_methods import RingBuffer
+from Event_methods import WAVELENGTH_MODES
+
+# type argument of GetMultimodeInfo: wavelength of the line and its relative level.
+# wlmConst has no names for them, the values follow the WLM manual
+MMI_WAVELENGTH = 0
+MMI_LEVEL = 1
+
+
+def get_multimode_lines(chan: int, max_lines = 8):
+    '''
+        Reads the lines of the multimode analysis of the last measurement
+
+        :param chan: channel to use
+        :param max_lines: max number of lines to read
+        :return: list of (wavelength, level) tuples. Empty if multimode evaluation isn't available
+    '''
+    lines = []
+    value = ctypes.c_double()
+    for mode in range(max_lines):
+        # errors of GetMultimodeInfo are ErrMMI... (<= -1000), the end of the list among them
+        if(wlmData.dll.GetMultimodeInfo(chan, MMI_WAVELENGTH, mode, ctypes.byref(value)) < 0 or value.value <= 0):
+            break
+        wave = value.value
+        if(wlmData.dll.GetMultimodeInfo(chan, MMI_LEVEL, mode, ctypes.byref(value)) < 0):
+            break
+        lines.append((wave, value.value))
+    return lines
+
+
+def linewidth_columns(max_lines = 8):
+    '''
+        :return: columns of the RingBuffer for LinewidthStream
+    '''
+    return (('time', 'wavelength', 'linewidth', 'lines') + tuple('line%d' % i for i in range(1, max_lines + 1))
+            + tuple('level%d' % i for i in range(1, max_lines + 1)))
+
+
+class LinewidthStream:
+    '''
+        Records linewidth and multimode lines of every exposure of the channel into a columnar RingBuffer.
+        The rows are written on the wavelength event of the channel (from an EventPump), so there's one row per
+        exposure. The listener only passes the event on, the DLL is read in the thread of the stream, so the pump
+        isn't held (the reads may wait in a DllDispatcher). If the reads are slower than the exposures, the rows
+        are written for the latest event only, the DLL gives the lines of the last measurement anyway.
+        Absent lines are NaN. A mode hop shows itself as a change of the number of lines or a jump
+        of the main line without any sweep
+
+        Example:
+            stream = LinewidthStream(pump, chan=1)
+            stream.start()
+            ...
+            rows = stream.buffer.snapshot()
+            stream.stop()
+    '''
+    def __init__(self, pump, chan = 1, max_lines = 8, buffer = None):
+        '''
+            :param pump: EventPump of the process
+            :param chan: channel to record
+            :param max_lines: max number of multimode lines per exposure
+            :param buffer: RingBuffer with the columns of linewidth_columns(max_lines) or None for a new one
+        '''
+        self.pump = pump
+        self.chan = chan
+        self.max_lines = max_lines
+        self.buffer = RingBuffer(linewidth_columns(max_lines)) if buffer is None else buffer
+        self.lines = []
+        self.skipped = 0
+        self._previous_mode = None
+        self._pending = None
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def on_event(self, mode: int, int_val: int, dbl_val: float):
+        if(mode != WAVELENGTH_MODES[self.chan]):
+            return
+        with self._condition:
+            if(self._pending is not None):
+                self.skipped += 1
+            self._pending = (time.time(), dbl_val)
+            self._condition.notify()
+
+    def _record(self, t: float, wavelength: float):
+        linewidth = wlmData.dll.GetLinewidthNum(self.chan, 0)
+        self.lines = get_multimode_lines(self.chan, self.max_lines)
+        waves = np.full(self.max_lines, np.nan)
+        levels = np.full(self.max_lines, np.nan)
+        for i, (wave, level) in enumerate(self.lines):
+            waves[i] = wave
+            levels[i] = level
+        self.buffer.append(t, wavelength, linewidth, len(self.lines), *waves, *levels)
+
+    def _run(self):
+        while(True):
+            with self._condition:
+                while(self._pending is None and not self._stop):
+                    self._condition.wait()
+                if(self._stop):
+                    return
+                t, wavelength = self._pending
+                self._pending = None
+            self._record(t, wavelength)
+
+    @property
+    def multimode(self) -> bool:
+        '''
+            :return: True if the last exposure had more than one line
+        '''
+        return len(self.lines) > 1
+
+    def start(self):
+        '''
+            Switches the linewidth evaluation on and starts recording
+        '''
+        if(self._previous_mode is None):
+            self._previous_mode = wlmData.dll.GetLinewidthMode(False)
+        wlmData.dll.SetLinewidthMode(True)
+        if(self._thread is None):
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="linewidth", daemon=True)
+            self._thread.start()
+        self.pump.add_listener(self.on_event)
+
+    def stop(self):
+        '''
+            Stops recording and gives back the previous linewidth mode
+        '''
+        self.pump.remove_listener(self.on_event)
+        if(self._thread is not None):
+            with self._condition:
+                self._stop = True
+                self._condition.notify()
+            self._thread.join()
+            self._thread = None
+            self._pending = None
+        if(self._previous_mode is not None):
+            wlmData.dll.SetLinewidthMode(self._previous_mode)
+            self._previous_mode = None
@@ -0,0 +1,85 @@
+import time
+
+# states of the stabiliser shown to the user
+UNLOCKED = 0
+LOCKED = 1
+SIGNAL_ERROR = 2
+OUT_OF_RANGE = -42  # the same code reference_const_PID_stabilisator returns
+
+
+def classify_lock(frequency, stabilised: bool) -> int:
+    '''
+        Gets the lock state from the values the stabiliser passes to its callback
+
+        :param frequency: measured frequency in THz. Values <= 0 are WLM error codes
+                          (ConvertUnit passes them unchanged)
+        :param stabilised: stabilised flag of the stabiliser
+        :return: LOCKED, UNLOCKED or SIGNAL_ERROR
+    '''
+    if(frequency <= 0):
+        return SIGNAL_ERROR
+    return LOCKED if stabilised else UNLOCKED
+
+
+class LockMonitor:
+    '''
+        Debounces the lock state of the stabiliser and reports only its changes.
+        The loss of the lock, signal errors and PID out of range are reported at once: the stabiliser
+        says unlocked only when delta has left the band, so it's confirmed already. LOCKED is reported when it
+        holds for debounce iterations in a row and not closer than min_interval seconds to the previous report,
+        so the indicator doesn't blink while the stabiliser hovers on the edge of the precision
+
+        Comment: the latency of the loss is one iteration, i.e. the time between two callbacks
+    '''
+    def __init__(self, on_change, debounce = 3, min_interval = 0.02):
+        '''
+            :param on_change: function called as on_change(state, error) when the reported state changes.
+                              error is the WLM error code for SIGNAL_ERROR and 0 otherwise
+            :param debounce: number of iterations in a row LOCKED has to hold to be reported
+            :param min_interval: min time in s between a report and the LOCKED report after it
+        '''
+        self.on_change = on_change
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.state = None
+        self.error = 0
+        self._candidate = None
+        self._count = 0
+        self._last_report = -min_interval
+
+    def update(self, state: int, error = 0, now = None) -> bool:
+        '''
+            Takes the state of one iteration of the stabiliser
+
+            :param state: LOCKED, UNLOCKED, SIGNAL_ERROR or OUT_OF_RANGE
+            :param error: WLM error code for SIGNAL_ERROR
+            :param now: time in s (time.perf_counter() if None)
+            :return: True if the state was reported
+        '''
+        if(now is None):
+            now = time.perf_counter()
+        if(state != self._candidate):
+            self._candidate = state
+            self._count = 0
+        self._count += 1
+        if(state == self.state and error == self.error):
+            return False
+        if(state == LOCKED and (self._count < self.debounce or now - self._last_report < self.min_interval)):
+            return False
+        self._report(state, error, now)
+        return True
+
+    def force(self, state: int, error = 0):
+        '''
+            Reports the state at once, e.g. when the stabiliser has finished
+        '''
+        self._candidate = state
+        self._count = 0
+        if(state != self.state or error != self.error):
+            self._report(state, error, time.perf_counter())
+
+    def _report(self, state, error, now):
+        self.state = state
+        self.error = error
+        self._last_report = now
+        self.on_change(state, error)
@@ -0,0 +1,192 @@
+import os
+import threading
+
+import numpy as np
+
+import wlmData
+import wlmConst
+
+
+class PIDLookup:
+    '''
+        Table of the PID - frequency dependency of the laser kept as two arrays sorted by PID.
+        It's filled incrementally by sweeps (add_sweep) and by the samples of the stabiliser (add), a new sample
+        replaces the old one of the same PID bin so the table follows the drift of the laser.
+        PID_for() gives the PID of a frequency by binary search and linear interpolation between the neighbours
+        (the interpolation of a monotone table is monotone). If mode hops made the table non monotone, the
+        segment nearest to the given PID is taken.
+        The table is kept in a .npz file if the path is given: it's saved after every sweep and when
+        the Stabiliser feeding it stops
+
+        Example:
+            lookup = PIDLookup("pid_lookup.npz")
+            lookup.add_sweep(wavelength_PID_bond(points, PID_step, PID_start, expo_time))
+            PID = lookup.PID_for(reference)
+    '''
+    def __init__(self, path = None, resolution = 0.125):
+        '''
+            :param path: .npz file to load the table from and save it to, or None
+            :param resolution: width of the PID bin in mV (one sample per bin)
+        '''
+        self.path = path
+        self.resolution = resolution
+        self.PID = np.empty(0)
+        self.frequency = np.empty(0)
+        self._monotone = True
+        # numbers of the rising and falling steps between the neighbours, kept by add() without going
+        # through the table
+        self._rising = 0
+        self._falling = 0
+        self._lock = threading.Lock()
+        if(path is not None and os.path.exists(path)):
+            self.load()
+
+    def __len__(self):
+        return len(self.PID)
+
+    def _check(self):
+        steps = np.diff(self.frequency)
+        self._rising = int(np.count_nonzero(steps > 0))
+        self._falling = int(np.count_nonzero(steps < 0))
+        self._monotone = self._rising == len(steps) or self._falling == len(steps)
+
+    def _count(self, j: int, sign: int):
+        '''
+            Adds (sign = 1) or removes (sign = -1) the step between the samples j and j + 1 in the counts
+        '''
+        if(0 <= j < len(self.frequency) - 1):
+            step = self.frequency[j + 1] - self.frequency[j]
+            if(step > 0):
+                self._rising += sign
+            elif(step < 0):
+                self._falling += sign
+
+    def add(self, PID: float, frequency: float):
+        '''
+            Adds a sample. Frequencies <= 0 (WLM errors) are skipped
+
+            :param PID: PID in mV
+            :param frequency: frequency in THz measured at PID
+        '''
+        if(frequency <= 0):
+            return
+        PID = round(PID / self.resolution) * self.resolution
+        with self._lock:
+            i = int(np.searchsorted(self.PID, PID))
+            if(i < len(self.PID) and self.PID[i] == PID):
+                # the stabiliser gives the same sample many times per measurement
+                if(self.frequency[i] == frequency):
+                    return
+                self._count(i - 1, -1)
+                self._count(i, -1)
+                self.frequency[i] = frequency
+                self._count(i - 1, 1)
+                self._count(i, 1)
+            else:
+                # the number of the bins is limited by the range of PID, only a new bin is inserted
+                self._count(i - 1, -1)
+                self.PID = np.insert(self.PID, i, PID)
+                self.frequency = np.insert(self.frequency, i, frequency)
+                self._count(i - 1, 1)
+                self._count(i, 1)
+            steps = len(self.frequency) - 1
+            self._monotone = self._rising == steps or self._falling == steps
+
+    def add_sweep(self, d: dict):
+        '''
+            Adds the result of wavelength_PID_bond (or triggered_PID_bond)
+
+            :param d: dictionary of (PID, wavelength) tuples, wavelength in nm
+        '''
+        for PID, wave in d.values():
+            if(wave > 0):
+                self.add(PID, wlmData.dll.ConvertUnit(wave, wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency))
+        self.autosave()
+
+    def frequency_at(self, PID: float):
+        '''
+            :param PID: PID in mV
+            :return: interpolated frequency in THz or None if PID is out of the table
+        '''
+        with self._lock:
+            if(len(self.PID) < 2 or PID < self.PID[0] or PID > self.PID[-1]):
+                return None
+            return float(np.interp(PID, self.PID, self.frequency))
+
+    def PID_for(self, frequency: float, near = None):
+        '''
+            Finds the PID of the frequency
+
+            :param frequency: frequency in THz
+            :param near: PID in mV to prefer if the frequency is met several times (non monotone table), None -
+                         the middle of the table
+            :return: PID in mV or None if the frequency is out of the table
+        '''
+        with self._lock:
+            PIDs = self.PID
+            frequencies = self.frequency
+            monotone = self._monotone
+        if(len(PIDs) < 2):
+            return None
+        if(monotone):
+            if(frequencies[0] > frequencies[-1]):
+                PIDs = PIDs[::-1]
+                frequencies = frequencies[::-1]
+            if(frequency < frequencies[0] or frequency > frequencies[-1]):
+                return None
+            i = max(1, int(np.searchsorted(frequencies, frequency)))
+        else:
+            # segments whose ends are on different sides of the frequency
+            segments = np.nonzero((frequencies[:-1] - frequency) * (frequencies[1:] - frequency) <= 0)[0]
+            if(len(segments) == 0):
+                return None
+            if(near is None):
+                near = (PIDs[0] + PIDs[-1]) / 2
+            i = segments[np.argmin(np.abs(PIDs[segments] - near))] + 1
+        f0, f1 = frequencies[i - 1], frequencies[i]
+        if(f1 == f0):
+            return float(PIDs[i - 1])
+        return float(PIDs[i - 1] + (frequency - f0) * (PIDs[i] - PIDs[i - 1]) / (f1 - f0))
+
+    def clear(self):
+        with self._lock:
+            self.PID = np.empty(0)
+            self.frequency = np.empty(0)
+            self._check()
+
+    def save(self, path = None):
+        '''
+            :param path: file to save to, None - the path of the table
+        '''
+        path = self.path if path is None else path
+        with self._lock:
+            PIDs = self.PID.copy()
+            frequencies = self.frequency.copy()
+        # np.savez adds .npz to a name without it, so write through the file object to keep the name.
+        # The old table is replaced only by a complete new one
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, PID=PIDs, frequency=frequencies, resolution=self.resolution)
+        os.replace(path + ".tmp", path)
+
+    def autosave(self) -> bool:
+        '''
+            Saves the table if it has a path
+
+            :return: True if saved
+        '''
+        if(self.path is None):
+            return False
+        self.save()
+        return True
+
+    def load(self, path = None):
+        '''
+            :param path: file to load from, None - the path of the table
+        '''
+        path = self.path if path is None else path
+        with np.load(path) as data:
+            with self._lock:
+                self.PID = data["PID"]
+                self.frequency = data["frequency"]
+                self.resolution = float(data["resolution"])
+                self._check()
@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+
+import wlmData
+import wlmConst
+from Config_methods import WlmConfig
+from Event_methods import WAVELENGTH_MODES
+
+
+class MeasurementMode:
+    '''
+        Context manager switching WLM into its fastest measurement for a sweep and giving back
+        the previous settings afterwards. Inside it counts the measurements of the channel,
+        so the rate WLM really delivers is known (the events come from an EventPump)
+
+        Example:
+            with MeasurementMode(pump=pump) as fast:
+                d = wavelength_PID_bond(points, PID_step, PID_start, expo_time)
+            print(fast.rate)
+    '''
+    def __init__(self, fast = True, interval = None, trigger_rate = None, chan = 1, pump = None, dispatcher = None):
+        '''
+            :param fast: fast mode (the results aren't shown by the WLM application)
+            :param interval: interval between measurements in ms for interval mode. None - continuous measurement
+                             without interval mode (the fastest)
+            :param trigger_rate: internal trigger rate in Hz or None to leave it as it is
+            :param chan: channel whose measurements are counted
+            :param pump: EventPump to count the measurements or None
+            :param dispatcher: DllDispatcher to apply the settings in one batch or None
+        '''
+        self.config = WlmConfig().set_fast_mode(fast).set_interval_mode(interval is not None)
+        if(interval is not None):
+            self.config.set_interval(interval)
+        if(trigger_rate is not None):
+            self.config.set_trigger_rate(trigger_rate)
+        self.chan = chan
+        self.pump = pump
+        self.dispatcher = dispatcher
+        self.previous = None
+        self.errors = {}
+        self.samples = 0
+        self._start = None
+        self._end = None
+        self._lock = threading.Lock()
+
+    def count(self, n = 1):
+        '''
+            Counts measurements by hand when there is no EventPump
+        '''
+        with self._lock:
+            self.samples += n
+
+    def on_event(self, mode: int, int_val: int, dbl_val: float):
+        if(mode == WAVELENGTH_MODES[self.chan]):
+            self.count()
+
+    @property
+    def elapsed(self) -> float:
+        '''
+            :return: time in s spent inside the context
+        '''
+        if(self._start is None):
+            return 0.
+        return (time.perf_counter() if self._end is None else self._end) - self._start
+
+    @property
+    def rate(self) -> float:
+        '''
+            :return: measurements per second delivered inside the context
+        '''
+        elapsed = self.elapsed
+        return self.samples / elapsed if elapsed > 0 else 0.
+
+    def __enter__(self):
+        self.previous = WlmConfig.read(self.config.settings, self.dispatcher)
+        self.errors = self.config.failed(self.config.apply(self.dispatcher, self.previous))
+        self.samples = 0
+        self._end = None
+        self._start = time.perf_counter()
+        if(self.pump is not None):
+            self.pump.add_listener(self.on_event)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._end = time.perf_counter()
+        if(self.pump is not None):
+            self.pump.remove_listener(self.on_event)
+        self.previous.apply(self.dispatcher, self.config)
+
+
+class TriggeredMeasurement:
+    '''
+        Context manager for measurements made one by one on demand: inside it WLM doesn't measure
+        continuously, every measure() triggers exactly one measurement and waits for its result event.
+        So there are neither repeated values of one exposure nor exposures nobody reads
+
+        Example:
+            with TriggeredMeasurement(pump) as trigger:
+                wlmData.dll.SetDeviationSignalNum(1, PID)
+                wave = trigger.measure()
+    '''
+    def __init__(self, pump, chan = 1, timeout = 1000):
+        '''
+            :param pump: EventPump of the process
+            :param chan: channel whose result is waited for
+            :param timeout: max time in ms to wait for the result
+        '''
+        self.pump = pump
+        self.chan = chan
+        self.timeout = timeout
+        self._results = queue.Queue()
+
+    def on_event(self, mode: int, int_val: int, dbl_val: float):
+        if(mode == WAVELENGTH_MODES[self.chan]):
+            self._results.put(dbl_val)
+
+    def measure(self):
+        '''
+            Triggers one measurement and waits for it
+
+            :return: wavelength in nm (or WLM error code), -44 if the result didn't come in time or
+                     the error of TriggerMeasurement
+        '''
+        # results of earlier measurements must not be taken for this one
+        while(not self._results.empty()):
+            self._results.get_nowait()
+        answer = wlmData.dll.TriggerMeasurement(wlmConst.cCtrlMeasurementTriggerSuccess)
+        if(answer != wlmConst.ResERR_NoErr):
+            return answer
+        try:
+            return self._results.get(timeout=self.timeout / 1000)
+        except queue.Empty:
+            return -44
+
+    def __enter__(self):
+        self.pump.add_listener(self.on_event)
+        wlmData.dll.TriggerMeasurement(wlmConst.cCtrlMeasurementInterrupt)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wlmData.dll.TriggerMeasurement(wlmConst.cCtrlMeasurementContinue)
+        self.pump.remove_listener(self.on_event)
+
+
+def triggered_PID_bond(pump, points, PID_step, PID_start, settle_time = 0, chan = 1):
+    '''
+        The same as wavelength_PID_bond but exactly one measurement is made after every PID step
+
+        :param pump: EventPump of the process
+        :param points: the number of PID points
+        :param PID_step: step per each PID point
+        :param PID_start: the start
+        :param settle_time: time in ms to let the laser settle after setting PID before the measurement
+        :param chan: channel (and PID port) to use
+        :return: the dictionary of (PID, wavelength) tuples
+
+        Comment: here wavelength is in [nm]
+    '''
+    return dict(iter_triggered_PID_bond(pump, points, PID_step, PID_start, settle_time, chan))
+
+
+def iter_triggered_PID_bond(pump, points, PID_step, PID_start, settle_time = 0, chan = 1):
+    '''
+        The same as triggered_PID_bond but yields every point as soon as it's measured.
+        WLM goes back to continuous measurement and PID to PID_start also when the consumer stops early
+
+        :return: generator of (i, (PID, wavelength)) tuples
+    '''
+    try:
+        with TriggeredMeasurement(pump, chan) as trigger:
+            for i in range(points):
+                PID = PID_start + i*PID_step
+                wlmData.dll.SetDeviationSignalNum(chan, PID)
+                if(settle_time > 0):
+                    time.sleep(settle_time / 1000)
+                yield i, (PID, trigger.measure())
+    finally:
+        wlmData.dll.SetDeviationSignalNum(chan, PID_start)
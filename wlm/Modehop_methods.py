@@ -0,0 +1,115 @@
+import time
+
+import wlmData
+import wlmConst
+from WLM_methods import cDependFrequencyPID
+
+
+class ModeHopDetector:
+    '''
+        Recognises a mode hop of the laser inside the stabiliser loop: the frequency changes much more
+        than the last PID step explains (threshold plus koef_error of the change the step should give, as koef
+        is known roughly and delta / koef steps are big), or the multimode analysis sees more than one line.
+        After a hop the stabiliser doesn't step (the integrator is frozen) while recover() waits until
+        the laser settles, and then the steps are limited for a while, so the stabiliser doesn't take
+        PID_step = delta / koef from the jump and drive PID out of range
+
+        Example:
+            detector = ModeHopDetector(linewidth=stream)
+            reference_const_PID_stabilisator(True, reference, koef, 4096, time_pause, detector=detector)
+    '''
+    def __init__(self, koef = cDependFrequencyPID, threshold = 5e-04, tolerance = 1e-06, settle_pause = 100,
+                 max_settle = 50, max_step = 15.625, limit_iterations = 20, linewidth = None, chan = 1,
+                 koef_error = 0.3):
+        '''
+            :param koef: koef of dependency between PID mV and frequency
+            :param threshold: unexplained change of frequency in THz taken for a hop
+            :param tolerance: max change of frequency in THz between two measurements of a settled laser
+            :param settle_pause: pause between measurements in recover() in ms
+            :param max_settle: max number of measurements in recover()
+            :param max_step: max PID step in mV after a hop
+            :param limit_iterations: number of iterations after a hop the step is limited
+            :param linewidth: LinewidthStream of the channel to use the multimode info or None
+            :param chan: channel to use (reference_const_PID_stabilisator sets it to its own channel)
+            :param koef_error: relative error of koef: the part of the change of frequency the step should give
+                               which is added to threshold
+        '''
+        self.koef = koef
+        self.koef_error = koef_error
+        self.threshold = threshold
+        self.tolerance = tolerance
+        self.settle_pause = settle_pause
+        self.max_settle = max_settle
+        self.max_step = max_step
+        self.limit_iterations = limit_iterations
+        self.linewidth = linewidth
+        self.chan = chan
+        self.hops = 0
+        self.last_hop = None
+        self._frequency = None
+        self._limited = 0
+
+    def reset(self):
+        self._frequency = None
+        self._limited = 0
+
+    def update(self, PID_step: float, frequency: float) -> bool:
+        '''
+            Checks the new measurement
+
+            :param PID_step: PID step in mV made before the measurement (0 if none)
+            :param frequency: measured frequency in THz
+            :return: True if it's a mode hop
+        '''
+        previous = self._frequency
+        self._frequency = frequency
+        if(frequency <= 0):
+            return False
+        multimode = self.linewidth is not None and self.linewidth.multimode
+        if(previous is None or previous <= 0):
+            return multimode
+        expected = self.koef * PID_step
+        unexplained = abs(frequency - previous - expected)
+        if(unexplained > self.threshold + self.koef_error * abs(expected) or multimode):
+            self.hops += 1
+            self.last_hop = time.time()
+            return True
+        return False
+
+    def recover(self, stop = None):
+        '''
+            Holds PID and waits until the laser settles in one mode (two close single mode measurements)
+
+            :param stop: function called as stop(frequency) after every measurement, True - stop waiting.
+                         The stabiliser passes its callback through it, so it can be stopped while waiting
+            :return: the frequency the laser settled at in THz (the last one measured if it didn't settle)
+                     or None if stopped
+        '''
+        previous = None
+        frequency = 0.
+        for _ in range(self.max_settle):
+            time.sleep(self.settle_pause / 1000)
+            frequency = wlmData.dll.ConvertUnit(wlmData.dll.GetWavelengthNum(self.chan, 0),
+                                                wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency)
+            if(stop is not None and stop(frequency)):
+                self._frequency = None
+                return None
+            multimode = self.linewidth is not None and self.linewidth.multimode
+            if(previous is not None and frequency > 0 and not multimode and abs(frequency - previous) < self.tolerance):
+                break
+            previous = frequency
+        self._frequency = frequency
+        self._limited = self.limit_iterations
+        return frequency
+
+    def limit(self, PID_step: float) -> float:
+        '''
+            Limits the step during limit_iterations after a hop
+
+            :param PID_step: step the stabiliser wants to make in mV
+            :return: the step to make
+        '''
+        if(self._limited <= 0):
+            return PID_step
+        self._limited -= 1
+        return max(-self.max_step, min(self.max_step, PID_step))
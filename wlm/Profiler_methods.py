@@ -0,0 +1,125 @@
+import collections
+import math
+import time
+
+# phases of an iteration of a control loop in their order
+PHASES = ("set", "wait", "read", "convert", "compute", "callback")
+
+
+def _stats(values) -> dict:
+    '''
+        :param values: durations in ns
+        :return: mean, standard deviation, median, 99th percentile and max in us
+    '''
+    if(not values):
+        return {"mean_us": 0., "std_us": 0., "p50_us": 0., "p99_us": 0., "max_us": 0.}
+    ordered = sorted(values)
+    n = len(ordered)
+    mean = sum(ordered) / n
+    std = math.sqrt(sum((v - mean)**2 for v in ordered) / n)
+    return {"mean_us": mean / 1000, "std_us": std / 1000, "p50_us": ordered[n // 2] / 1000,
+            "p99_us": ordered[min(n - 1, int(n * 0.99))] / 1000, "max_us": ordered[-1] / 1000}
+
+
+class LoopProfiler:
+    '''
+        Times the phases of the iterations of a control loop with perf_counter_ns.
+        The loop calls begin() at the start of every iteration and mark(phase) after every phase; the time
+        since the previous mark goes to the phase (a phase may be marked several times per iteration).
+        The statistics are over the last window iterations: time of every phase and its share of the loop,
+        period of the loop, its jitter (standard deviation of the period) and the achieved rate
+
+        Example:
+            profiler = LoopProfiler()
+            reference_const_PID_stabilisator(True, reference, koef, 4096, time_pause, profiler=profiler)
+            print(profiler.report())
+    '''
+    def __init__(self, window = 1000):
+        '''
+            :param window: number of the last iterations kept
+        '''
+        self.window = window
+        self.iterations = 0
+        self.phases = {}
+        self.periods = collections.deque(maxlen=window)
+        self._begin = None
+        self._last = None
+        self._current = {}
+
+    def reset(self):
+        self.iterations = 0
+        self.phases = {}
+        self.periods.clear()
+        self._begin = None
+        self._last = None
+        self._current = {}
+
+    def begin(self):
+        '''
+            Starts an iteration (and ends the previous one)
+        '''
+        now = time.perf_counter_ns()
+        if(self._begin is not None):
+            self.periods.append(now - self._begin)
+            for phase, elapsed in self._current.items():
+                durations = self.phases.get(phase)
+                if(durations is None):
+                    durations = self.phases[phase] = collections.deque(maxlen=self.window)
+                durations.append(elapsed)
+            self.iterations += 1
+        self._current = {}
+        self._begin = now
+        self._last = now
+
+    def mark(self, phase: str):
+        '''
+            Ends a phase of the iteration
+
+            :param phase: name of the phase, one of PHASES as a rule
+        '''
+        now = time.perf_counter_ns()
+        self._current[phase] = self._current.get(phase, 0) + now - self._last
+        self._last = now
+
+    @property
+    def rate(self) -> float:
+        '''
+            :return: achieved loop rate in Hz over the window
+        '''
+        total = sum(self.periods)
+        return len(self.periods) * 1e9 / total if total > 0 else 0.
+
+    @property
+    def jitter(self) -> float:
+        '''
+            :return: standard deviation of the loop period in us
+        '''
+        return _stats(list(self.periods))["std_us"]
+
+    def stats(self) -> dict:
+        '''
+            :return: dictionary with "period" and every phase -> statistics in us (phases also with "share" of
+                     the loop time), "rate_hz", "jitter_us" and "iterations"
+        '''
+        periods = list(self.periods)
+        total = sum(periods)
+        result = {"iterations": self.iterations, "rate_hz": self.rate, "period": _stats(periods)}
+        result["jitter_us"] = result["period"]["std_us"]
+        for phase in sorted(self.phases, key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES)):
+            durations = list(self.phases[phase])
+            result[phase] = _stats(durations)
+            result[phase]["share"] = sum(durations) / total if total > 0 else 0.
+        return result
+
+    def report(self) -> str:
+        '''
+            :return: the statistics as a table
+        '''
+        stats = self.stats()
+        lines = ["%d iterations, %.1f Hz, jitter %.1f us" % (stats["iterations"], stats["rate_hz"], stats["jitter_us"]),
+                 "%-10s %10s %10s %10s %10s %7s" % ("phase", "mean us", "std us", "p99 us", "max us", "share")]
+        for phase, s in stats.items():
+            if(isinstance(s, dict)):
+                lines.append("%-10s %10.1f %10.1f %10.1f %10.1f %6.1f%%" % (phase, s["mean_us"], s["std_us"], s["p99_us"],
+                                                                         s["max_us"], 100 * s.get("share", 1.)))
+        return "\n".join(lines)
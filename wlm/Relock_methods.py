@@ -0,0 +1,217 @@
+import threading
+import time
+
+import wlmData
+import wlmConst
+from Lookup_methods import PIDLookup
+
+
+def measure_frequency(chan: int, PID: float, time_pause: float) -> float:
+    '''
+        Sets PID and measures the frequency after the pause
+
+        :param chan: channel (and PID port) to use
+        :param PID: PID in mV
+        :param time_pause: pause after setting PID in ms
+        :return: frequency in THz or WLM error code
+    '''
+    wlmData.dll.SetDeviationSignalNum(chan, PID)
+    time.sleep(time_pause / 1000)
+    return wlmData.dll.ConvertUnit(wlmData.dll.GetWavelengthNum(chan, 0), wlmConst.cReturnWavelengthVac,
+                                   wlmConst.cReturnFrequency)
+
+
+class RelockSupervisor:
+    '''
+        Watches a Stabiliser and locks the laser again when the stabiliser gives up (PID out of range, -42).
+        The PID of the reference is taken from the PIDLookup of the PID - frequency pairs the stabiliser went
+        through; if it doesn't give it (or it's wrong now because of drift) PID space is scanned: coarse until the reference is
+        between two points, then fine between them. The scan goes first within span around the PID of the
+        lookup and over the whole range only if the reference isn't there. A failed relock is tried again
+        after retry s, doubled after every failure in a row up to max_retry, and after max_failures in a row
+        the supervisor gives up until the stabiliser runs again. The time from the loss of lock to the next
+        lock is kept in relock_times
+
+        Example:
+            supervisor = RelockSupervisor(stabiliser)
+            stabiliser.set_reference(reference)
+            supervisor.start()
+    '''
+    def __init__(self, stabiliser, coarse_step = 64., fine_step = 2., tolerance = 1e-03, period = 0.1,
+                 lookup = None, on_relock = None, span = 512., retry = 1., max_retry = 60., max_failures = 10):
+        '''
+            :param stabiliser: Stabiliser to watch
+            :param coarse_step: step of the coarse scan in mV
+            :param fine_step: step of the fine scan in mV
+            :param tolerance: max distance in THz from the reference to hand the laser back to the stabiliser
+            :param period: time between checks of the stabiliser in s
+            :param lookup: PIDLookup to use, None - the lookup of the stabiliser or a new one
+            :param on_relock: function called as on_relock(seconds) after every relock or None
+            :param span: half width in mV of the scan around the PID of the lookup
+            :param retry: time in s after a failed relock to try again, doubled after every failure in a row
+            :param max_retry: max time in s between two tries
+            :param max_failures: number of failures in a row to give up after
+        '''
+        self.stabiliser = stabiliser
+        self.coarse_step = coarse_step
+        self.fine_step = fine_step
+        self.tolerance = tolerance
+        self.period = period
+        self.on_relock = on_relock
+        self.span = span
+        self.retry = retry
+        self.max_retry = max_retry
+        self.max_failures = max_failures
+        if(lookup is None):
+            lookup = stabiliser.lookup if stabiliser.lookup is not None else PIDLookup(resolution=fine_step)
+        self.lookup = lookup
+        self.relock_times = []
+        # failures in a row
+        self.failures = 0
+        self._failed = None
+        self._lost = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._callback = None
+
+    def _record(self, PID_current, frequency, delta, stabilised):
+        # the stabiliser fills its own lookup
+        if(self.lookup is not self.stabiliser.lookup):
+            self.lookup.add(PID_current, frequency)
+        if(stabilised and self._lost is not None):
+            seconds = time.perf_counter() - self._lost
+            self._lost = None
+            self.relock_times.append(seconds)
+            if(self.on_relock is not None):
+                self.on_relock(seconds)
+        if(self._callback is not None):
+            return self._callback(PID_current, frequency, delta, stabilised)
+        return False
+
+    def _measure(self, PID):
+        frequency = measure_frequency(self.stabiliser.chan, PID, self.stabiliser.time_pause)
+        self.lookup.add(PID, frequency)
+        return frequency
+
+    def scan(self, reference: float, start: float, stop: float, step: float):
+        '''
+            Goes through PID from start to stop until the reference is between two measured frequencies
+
+            :return: ((PID, frequency) before, (PID, frequency) after) of the bracket or None if the reference
+                     wasn't met
+        '''
+        previous_PID = None
+        previous = None
+        count = int(abs(stop - start) / step) + 1
+        direction = 1 if stop >= start else -1
+        for i in range(count):
+            PID = start + direction * i * step
+            frequency = self._measure(PID)
+            if(frequency <= 0):
+                continue
+            if(previous is not None and (previous - reference) * (frequency - reference) <= 0):
+                return (previous_PID, previous), (PID, frequency)
+            previous_PID = PID
+            previous = frequency
+        return None
+
+    def find_PID(self, reference: float):
+        '''
+            Finds the PID of the reference frequency
+
+            :param reference: frequency in THz
+            :return: PID in mV or None if the reference is out of reach
+        '''
+        max_PID = self.stabiliser.max_PID_val
+        PID = self.lookup.PID_for(reference, self.stabiliser.PID)
+        if(PID is not None):
+            if(abs(self._measure(PID) - reference) < self.tolerance):
+                return PID
+            # the table is only a little off because of drift: the reference is near
+            found = self._search(reference, max(PID - self.span, 0.), min(PID + self.span, max_PID))
+            if(found is not None):
+                return found
+        return self._search(reference, 0., max_PID)
+
+    def _search(self, reference: float, start: float, stop: float):
+        '''
+            Coarse scan from start to stop, then fine scan of the bracket
+
+            :return: PID in mV or None if the reference wasn't met
+        '''
+        bracket = self.scan(reference, start, stop, self.coarse_step)
+        if(bracket is None):
+            return None
+        bracket = self.scan(reference, bracket[0][0], bracket[1][0], self.fine_step)
+        if(bracket is None):
+            return None
+        return min(bracket, key=lambda item: abs(item[1] - reference))[0]
+
+    @property
+    def gave_up(self) -> bool:
+        return self.failures >= self.max_failures
+
+    def due(self) -> bool:
+        '''
+            :return: True if the retry time since the last failure has passed and it hasn't given up
+        '''
+        if(self.gave_up):
+            return False
+        return self._failed is None or time.perf_counter() - self._failed >= min(self.retry * 2**(self.failures - 1),
+                                                                                  self.max_retry)
+
+    def relock(self) -> bool:
+        '''
+            Brings the laser back to the reference and restarts the stabiliser
+
+            :return: True if the stabiliser was restarted
+        '''
+        if(self._lost is None):
+            self._lost = time.perf_counter()
+        reference = self.stabiliser.reference
+        if(not self.stabiliser.mode):
+            reference = wlmData.dll.ConvertUnit(reference, wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency)
+        PID = self.find_PID(reference)
+        if(PID is None):
+            # an unreachable reference mustn't sweep the laser over the whole range every period
+            self.failures += 1
+            self._failed = time.perf_counter()
+            return False
+        self.failures = 0
+        self._failed = None
+        self.stabiliser.set_reference(self.stabiliser.reference, self.stabiliser.mode, PID)
+        return True
+
+    def start(self) -> threading.Thread:
+        '''
+            Starts watching the stabiliser in a daemon thread. Its callback is chained after the one of the supervisor
+
+            :return: the thread
+        '''
+        self._stop.clear()
+        if(self.stabiliser.callback != self._record):
+            self._callback = self.stabiliser.callback
+            self.stabiliser.callback = self._record
+
+        def run():
+            while(not self._stop.wait(self.period)):
+                if(self.stabiliser.running):
+                    # locked by someone else after the supervisor gave up
+                    self.failures = 0
+                    self._failed = None
+                elif(self.stabiliser.result == -42 and self.due()):
+                    self.relock()
+        self._thread = threading.Thread(target=run, name="relock", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        '''
+            Stops watching and gives the stabiliser back its callback
+        '''
+        self._stop.set()
+        if(self._thread is not None):
+            self._thread.join()
+            self._thread = None
+        if(self.stabiliser.callback == self._record):
+            self.stabiliser.callback = self._callback
@@ -0,0 +1,362 @@
+import collections
+import ctypes
+import struct
+import threading
+import time
+
+import wlmData
+import wlmConst
+
+# speed of light in nm*THz
+C = 299792.458
+
+MAGIC = b"WLMR\x01"
+
+# records of the log: a name of a DLL function gets a number the first time it's called,
+# a call is (number of the name, time in ns from the start, arguments, result)
+REC_NAME = 0
+REC_CALL = 1
+_NAME = struct.Struct("<BHB")
+_CALL = struct.Struct("<BHqB")
+
+# tags of the values
+TAG_NONE = 0
+TAG_INT = 1
+TAG_FLOAT = 2
+TAG_BOOL = 3
+TAG_BYTES = 4
+TAG_POINTER = 5  # output pointer (ctypes.byref), the value it points to after the call follows
+TAG_BUFFER = 6  # ctypes string buffer, its contents after the call follow
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+_LENGTH = struct.Struct("<I")
+
+# an output pointer or a string buffer in the arguments of a logged call: the value after the call
+Output = collections.namedtuple("Output", "value")
+Buffer = collections.namedtuple("Buffer", "value")
+
+Call = collections.namedtuple("Call", "time name args result")
+
+
+class ReplayEnd(Exception):
+    '''
+        Raised by ReplayDLL when the log has no more calls of the function
+    '''
+    pass
+
+
+class ReplayMismatch(Exception):
+    '''
+        Raised by a strict ReplayDLL when the call differs from the logged one
+    '''
+    pass
+
+
+def _encode(value, out: list):
+    if(value is None):
+        out.append(bytes((TAG_NONE,)))
+    elif(isinstance(value, bool)):
+        out.append(bytes((TAG_BOOL, value)))
+    elif(isinstance(value, int)):
+        out.append(bytes((TAG_INT,)) + _INT.pack(value))
+    elif(isinstance(value, float)):
+        out.append(bytes((TAG_FLOAT,)) + _FLOAT.pack(value))
+    elif(isinstance(value, (bytes, str))):
+        data = value.encode() if isinstance(value, str) else value
+        out.append(bytes((TAG_BYTES,)) + _LENGTH.pack(len(data)) + data)
+    elif(hasattr(value, "_obj")):
+        out.append(bytes((TAG_POINTER,)))
+        _encode(value._obj.value, out)
+    elif(isinstance(value, ctypes.Array)):
+        data = value.value if isinstance(value.value, bytes) else bytes(value)
+        out.append(bytes((TAG_BUFFER,)) + _LENGTH.pack(len(data)) + data)
+    elif(isinstance(value, ctypes._SimpleCData)):
+        _encode(value.value, out)
+    else:
+        _encode(repr(value), out)
+
+
+def _decode(data: bytes, offset: int):
+    '''
+        :return: (value, offset after it) - tuple pack
+    '''
+    tag = data[offset]
+    offset += 1
+    if(tag == TAG_NONE):
+        return None, offset
+    if(tag == TAG_BOOL):
+        return bool(data[offset]), offset + 1
+    if(tag == TAG_INT):
+        return _INT.unpack_from(data, offset)[0], offset + _INT.size
+    if(tag == TAG_FLOAT):
+        return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+    if(tag == TAG_POINTER):
+        value, offset = _decode(data, offset)
+        return Output(value), offset
+    length = _LENGTH.unpack_from(data, offset)[0]
+    offset += _LENGTH.size
+    value = bytes(data[offset:offset + length])
+    return (Buffer(value) if tag == TAG_BUFFER else value), offset + length
+
+
+def read_log(path: str):
+    '''
+        Reads a log written by SessionRecorder
+
+        :param path: file of the log
+        :return: list of Call(time in ns from the start, name, args, result). Output pointers and string buffers
+                 in args are Output and Buffer with their values after the call
+    '''
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data.startswith(MAGIC), "Error: %s isn't a log of SessionRecorder" % path
+    names = {}
+    calls = []
+    offset = len(MAGIC)
+    while(offset < len(data)):
+        if(data[offset] == REC_NAME):
+            _, number, length = _NAME.unpack_from(data, offset)
+            offset += _NAME.size
+            names[number] = data[offset:offset + length].decode()
+            offset += length
+            continue
+        _, number, moment, count = _CALL.unpack_from(data, offset)
+        offset += _CALL.size
+        args = []
+        for _ in range(count):
+            value, offset = _decode(data, offset)
+            args.append(value)
+        result, offset = _decode(data, offset)
+        calls.append(Call(moment, names[number], tuple(args), result))
+    return calls
+
+
+class SessionRecorder:
+    '''
+        Writes every DLL call of a live session with its arguments, result and time into a compact
+        binary log (about 40 bytes per call) to be replayed by ReplayDLL.
+        The values of the output pointers are written as they are after the call
+
+        Example:
+            recorder = SessionRecorder("session.wlmr")
+            recorder.install()
+            ...
+            recorder.uninstall()
+    '''
+    def __init__(self, path: str, dll = None):
+        '''
+            :param path: file of the log (rewritten)
+            :param dll: the handle to record (wlmData.dll if None)
+        '''
+        self.path = path
+        self._dll = dll
+        self.dll = wlmData.dll if dll is None else dll
+        self.calls = 0
+        self._names = {}
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._start = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._installed = None
+
+    def install(self):
+        '''
+            Replaces wlmData.dll with the recording proxy (recording the handle given or the one installed now)
+        '''
+        if(self._installed is None):
+            self._installed = wlmData.dll
+            if(self._dll is None):
+                self.dll = wlmData.dll
+            wlmData.dll = RecordingDLL(self)
+
+    def uninstall(self):
+        '''
+            Gives back wlmData.dll and closes the log
+        '''
+        if(self._installed is not None):
+            wlmData.dll = self._installed
+            self._installed = None
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if(not self._file.closed):
+                self._file.close()
+
+    def record(self, name: str, moment: int, args, result):
+        '''
+            :param name: name of the DLL function
+            :param moment: time of the call in ns (perf_counter_ns)
+            :param args: arguments of the call
+            :param result: what the function returned
+        '''
+        out = []
+        for arg in args:
+            _encode(arg, out)
+        _encode(result, out)
+        with self._lock:
+            if(self._file.closed):
+                return
+            number = self._names.get(name)
+            if(number is None):
+                number = self._names[name] = len(self._names)
+                encoded = name.encode()
+                self._file.write(_NAME.pack(REC_NAME, number, len(encoded)) + encoded)
+            self._file.write(_CALL.pack(REC_CALL, number, moment - self._start, len(args)))
+            self._file.write(b"".join(out))
+            self.calls += 1
+
+
+class RecordingDLL:
+    '''
+        Looks like the ctypes handle of the DLL and logs every call
+    '''
+    def __init__(self, recorder: SessionRecorder):
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        recorder = self._recorder
+        function = getattr(recorder.dll, name)
+
+        def call(*args):
+            moment = time.perf_counter_ns()
+            result = function(*args)
+            recorder.record(name, moment, args, result)
+            return result
+        call.__name__ = name
+        return call
+
+
+class ReplayDLL:
+    '''
+        Plays a log of SessionRecorder back in place of wlmData.dll. Every function answers with its own
+        logged results in their order, output pointers and string buffers get the logged values.
+        The answers are given not earlier than they were recorded (divided by speed), speed None -
+        at once. The replay is the same every time. Settings beyond the log are answered with ResERR_NoErr,
+        ConvertUnit is computed (unless strict).
+        If koef is given the measured frequencies (wavelengths) follow the PID of the algorithm being run:
+        the logged value is shifted by koef * (PID now - PID at the recording), so another algorithm
+        is run against the drift of the real laser
+
+        Example:
+            replay = ReplayDLL("session.wlmr", speed=10, koef=cDependFrequencyPID)
+            replay.install()
+            reference_const_PID_stabilisator(True, reference, koef, 4096, time_pause, callback=callback)
+    '''
+    def __init__(self, path: str, speed = 1., koef = None, strict = False):
+        '''
+            :param path: file of the log
+            :param speed: acceleration of the replay, None - no waiting
+            :param koef: koef of dependency between PID mV and frequency or None not to shift the measurements
+            :param strict: the calls must be the same as the logged ones (name and plain arguments, in the same
+                           order), else ReplayMismatch is raised
+        '''
+        self.calls = read_log(path)
+        self.speed = speed
+        self.koef = koef
+        self.strict = strict
+        self.position = 0
+        self._queues = {}
+        self._recorded_PID = {}
+        self._PID = {}
+        self._start = None
+        self._lock = threading.Lock()
+        self._installed = None
+        # the PID of the channel at every logged measurement
+        PID = {}
+        for i, call in enumerate(self.calls):
+            if(call.name == "SetDeviationSignalNum" and call.result == wlmConst.ResERR_NoErr):
+                PID[call.args[0]] = call.args[1]
+            elif(call.name in ("GetFrequencyNum", "GetWavelengthNum") and call.args[0] in PID):
+                self._recorded_PID[i] = PID[call.args[0]]
+            self._queues.setdefault(call.name, collections.deque()).append(i)
+
+    def install(self):
+        '''
+            Replaces wlmData.dll with the replay
+        '''
+        if(self._installed is None):
+            self._installed = wlmData.dll
+            wlmData.dll = self
+
+    def uninstall(self):
+        if(self._installed is not None):
+            wlmData.dll = self._installed
+            self._installed = None
+
+    def _next(self, name: str, args):
+        with self._lock:
+            if(self._start is None):
+                self._start = time.perf_counter_ns()
+            if(self.strict):
+                if(self.position >= len(self.calls)):
+                    raise ReplayEnd(name)
+                i = self.position
+                call = self.calls[i]
+                plain = [(a, b) for a, b in zip(args, call.args) if not isinstance(b, (Output, Buffer))]
+                if(call.name != name or len(args) != len(call.args) or any(a != b for a, b in plain)):
+                    raise ReplayMismatch("%s%s instead of %s%s" % (name, args, call.name, call.args))
+                self._queues[name].popleft()
+            else:
+                queue = self._queues.get(name)
+                if(not queue):
+                    # a setting has nothing recorded to give back
+                    if(name.startswith("Set")):
+                        return None
+                    raise ReplayEnd(name)
+                i = queue.popleft()
+            self.position = max(self.position, i + 1)
+        if(self.speed is not None):
+            wait = self.calls[i].time / self.speed - (time.perf_counter_ns() - self._start)
+            if(wait > 0):
+                time.sleep(wait / 1e9)
+        return i
+
+    def _shift(self, i: int, chan) -> float:
+        '''
+            :return: the change of frequency in THz the PID of the run gives against the recording
+        '''
+        if(self.koef is None or i not in self._recorded_PID or chan not in self._PID):
+            return 0.
+        return self.koef * (self._PID[chan] - self._recorded_PID[i])
+
+    def _convert(self, value, unit_from, unit_to):
+        '''
+            ConvertUnit is computed, not replayed: the logged answers don't fit the shifted measurements
+        '''
+        if(value <= 0 or unit_from == unit_to):
+            return value
+        units = (unit_from, unit_to)
+        if(units == (wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency)
+                or units == (wlmConst.cReturnFrequency, wlmConst.cReturnWavelengthVac)):
+            return C / value
+        return wlmConst.ErrUnitNotAvailable
+
+    def __getattr__(self, name):
+        if(name.startswith("_")):
+            raise AttributeError(name)
+
+        def call(*args):
+            if(name == "ConvertUnit" and not self.strict):
+                return self._convert(*args)
+            i = self._next(name, args)
+            if(i is None):
+                if(name == "SetDeviationSignalNum"):
+                    self._PID[args[0]] = args[1]
+                return wlmConst.ResERR_NoErr
+            logged = self.calls[i]
+            for arg, value in zip(args, logged.args):
+                if(isinstance(value, Output) and hasattr(arg, "_obj")):
+                    arg._obj.value = value.value
+                elif(isinstance(value, Buffer) and isinstance(arg, ctypes.Array)):
+                    arg.value = value.value
+            result = logged.result
+            if(name == "SetDeviationSignalNum"):
+                self._PID[args[0]] = args[1]
+            elif(name in ("GetFrequencyNum", "GetWavelengthNum") and result > 0):
+                shift = self._shift(i, args[0])
+                if(shift != 0.):
+                    result = result + shift if name == "GetFrequencyNum" else C / (C / result + shift)
+            return result
+        call.__name__ = name
+        return call
@@ -0,0 +1,192 @@
+import math
+import time
+
+import wlmData
+import wlmConst
+
+# 2 - golden ratio: the part of the bracket the golden section step takes
+GOLDEN = 0.3819660
+
+
+class ResonanceSearch:
+    '''
+        Finds the PID of the maximum of the power after a resonator: a coarse sweep of PID until the peak is
+        passed, then Brent's search (parabolic steps, golden section when they don't converge) inside the
+        coarse points around the maximum until it's located to the resolution. Every measured power is
+        kept, the PID being quantised, a point is measured only once.
+        It needs some tens of exposures instead of the hundreds of a uniform sweep with the fine step
+        (stepping_PID_course + find_max_mod)
+
+        Example:
+            search = ResonanceSearch(power_meter, settle_time=wlmData.dll.GetExposureNum(1, 1, 0) * 1.2)
+            PID, power, frequency = search.find(500, 3500, 64, resolution=0.25, min_power=1e-06)
+            print(search.evaluations)
+    '''
+    def __init__(self, power_meter, settle_time = 0, averages = 1, quantum = 0.125, chan = 1, max_PID_val = 4096):
+        '''
+            :param power_meter: object with the property read (ThorlabsPM100)
+            :param settle_time: time in ms to wait after setting PID before reading the power
+            :param averages: number of power reads averaged per point
+            :param quantum: resolution of the PID output in mV
+            :param chan: channel of WLM
+            :param max_PID_val: max val in mV for PID
+        '''
+        self.power_meter = power_meter
+        self.settle_time = settle_time
+        self.averages = averages
+        self.quantum = quantum
+        self.chan = chan
+        self.max_PID_val = max_PID_val
+        self.samples = {}
+        self.evaluations = 0
+
+    def power(self, PID: float) -> float:
+        '''
+            :param PID: PID in mV (rounded to the quantum)
+            :return: power at the PID, measured once per point
+        '''
+        PID = self._quantise(PID)
+        if(PID not in self.samples):
+            wlmData.dll.SetDeviationSignalNum(self.chan, PID)
+            if(self.settle_time > 0):
+                time.sleep(self.settle_time / 1000)
+            self.samples[PID] = sum(self.power_meter.read for _ in range(self.averages)) / self.averages
+            self.evaluations += 1
+        return self.samples[PID]
+
+    def iter_coarse(self, PID_start, PID_stop, PID_step, min_power = None):
+        '''
+            Coarse sweep from PID_start to PID_stop
+
+            :param min_power: if given the sweep stops when a peak higher than it is passed (the power fell
+                              below the half of the peak), else it goes to PID_stop
+            :return: generator of (i, (PID, power)) tuples
+        '''
+        assert PID_step != 0, "Error: PID_step must not be 0"
+        peak = 0.
+        count = int(math.floor((PID_stop - PID_start) / PID_step + 1e-09)) + 1
+        for i in range(max(count, 0)):
+            PID = PID_start + i*PID_step
+            power = self.power(PID)
+            peak = max(peak, power)
+            yield i, (PID, power)
+            if(min_power is not None and peak >= min_power and power < peak / 2):
+                break
+
+    def coarse(self, PID_start, PID_stop, PID_step, min_power = None):
+        '''
+            :return: (lower PID, PID of the max, upper PID) - tuple pack, the coarse points around the maximum,
+                     or None if no power was measured
+        '''
+        points = [sample for _, sample in self.iter_coarse(PID_start, PID_stop, PID_step, min_power)]
+        if(not points):
+            return None
+        points.sort()
+        k = max(range(len(points)), key=lambda j: points[j][1])
+        return points[max(k - 1, 0)][0], points[k][0], points[min(k + 1, len(points) - 1)][0]
+
+    def refine(self, low: float, high: float, resolution = 0.25, start = None) -> float:
+        '''
+            Brent's search of the maximum of the power in [low, high]
+
+            :param low: lower PID of the bracket
+            :param high: upper PID of the bracket
+            :param resolution: PID in mV to locate the maximum to (not below the quantum)
+            :param start: PID of the best known point inside the bracket or None
+            :return: PID of the maximum
+        '''
+        tol = max(resolution, self.quantum) / 2
+        a, b = min(low, high), max(low, high)
+        x = a + GOLDEN * (b - a) if start is None else start
+        w = v = x
+        fx = fw = fv = -self.power(x)
+        d = e = 0.
+        while(True):
+            xm = (a + b) / 2
+            if(abs(x - xm) <= 2 * tol - (b - a) / 2):
+                break
+            parabolic = False
+            if(abs(e) > tol):
+                # parabola through x, w, v
+                r = (x - w) * (fx - fv)
+                q = (x - v) * (fx - fw)
+                p = (x - v) * q - (x - w) * r
+                q = 2 * (q - r)
+                if(q > 0):
+                    p = -p
+                q = abs(q)
+                e_old = e
+                e = d
+                if(abs(p) < abs(q * e_old / 2) and q * (a - x) < p < q * (b - x)):
+                    parabolic = True
+                    d = p / q
+                    u = x + d
+                    if(u - a < 2 * tol or b - u < 2 * tol):
+                        d = tol if xm >= x else -tol
+            if(not parabolic):
+                e = (a - x) if x >= xm else (b - x)
+                d = GOLDEN * e
+            u = x + (d if abs(d) >= tol else math.copysign(tol, d))
+            fu = -self.power(u)
+            if(fu <= fx):
+                if(u >= x):
+                    a = x
+                else:
+                    b = x
+                v, w, x = w, x, u
+                fv, fw, fx = fw, fx, fu
+            else:
+                if(u < x):
+                    a = u
+                else:
+                    b = u
+                if(fu <= fw or w == x):
+                    v, w = w, u
+                    fv, fw = fw, fu
+                elif(fu <= fv or v == x or v == w):
+                    v, fv = u, fu
+        return x
+
+    def find(self, PID_start, PID_stop, PID_step, resolution = 0.25, min_power = None):
+        '''
+            Coarse sweep and refinement. The laser is left at the found PID
+
+            :param PID_start: PID in mV to start the coarse sweep from
+            :param PID_stop: PID in mV to end the coarse sweep at
+            :param PID_step: step of the coarse sweep in mV (less than the width of the resonance)
+            :param resolution: PID in mV to locate the maximum to
+            :param min_power: power of a peak for the coarse sweep to stop after it or None
+            :return: (PID, power, frequency in THz) - tuple pack or None if nothing was measured
+        '''
+        bracket = self.coarse(PID_start, PID_stop, PID_step, min_power)
+        if(bracket is None):
+            return None
+        low, best, high = bracket
+        PID = self._quantise(self.refine(low, high, resolution, best))
+        # the noise of the power can leave the search beside a better point measured already
+        measured_best = max(self.samples, key=self.samples.get)
+        if(self.samples[measured_best] > self.samples[PID]):
+            PID = measured_best
+        wlmData.dll.SetDeviationSignalNum(self.chan, PID)
+        if(self.settle_time > 0):
+            time.sleep(self.settle_time / 1000)
+        frequency = wlmData.dll.ConvertUnit(wlmData.dll.GetWavelengthNum(self.chan, 0), wlmConst.cReturnWavelengthVac,
+                                            wlmConst.cReturnFrequency)
+        return PID, self.samples[PID], frequency
+
+    def _quantise(self, PID: float) -> float:
+        return min(max(round(PID / self.quantum) * self.quantum, 0.), self.max_PID_val)
+
+
+def find_resonance(power_meter, PID_start, PID_stop, PID_step, resolution = 0.25, settle_time = 0, min_power = None,
+                   chan = 1):
+    '''
+        Finds the resonance with ResonanceSearch. See ResonanceSearch.find
+
+        :return: (PID, power, frequency in THz, number of the points measured) - tuple pack or None
+    '''
+    search = ResonanceSearch(power_meter, settle_time, chan=chan)
+    found = search.find(PID_start, PID_stop, PID_step, resolution, min_power)
+    if(found is None):
+        return None
+    return found + (search.evaluations,)
@@ -0,0 +1,323 @@
+import itertools
+import threading
+
+import msgpack
+import zmq
+
+from Stabiliser_methods import Stabiliser
+from WLM_methods import (autoexposure, get_current_PID, get_frequency, get_wavelength, set_exposure1, set_PID_const,
+                         wavelength_PID_bond)
+
+# address the server binds by default. Experiment computers use the IP of the WLM host instead of 127.0.0.1
+DEFAULT_ADDRESS = "tcp://127.0.0.1:5557"
+
+# Protocol: the client sends msgpack [request id, [[method, [args]], ...]] - a batch of calls,
+# the server answers [request id, [[True, result] or [False, error string], ...]] in the same order.
+# The calls of a batch and the batches themselves are executed one by one in the order they came,
+# so a client may send many batches without waiting (pipelining) and still knows the order of the settings
+# A request the server can't read is answered [request id or None, [[False, error string]]]
+
+
+class RpcServer:
+    '''
+        Executes the commands of remote clients on the WLM host.
+        Sweeps run in their own thread so the server answers while a sweep is going on
+    '''
+    def __init__(self, address = DEFAULT_ADDRESS, stabiliser = None):
+        '''
+            :param address: ZeroMQ address to bind
+            :param stabiliser: Stabiliser to control (a new one on channel 1 if None)
+        '''
+        self.stabiliser = Stabiliser() if stabiliser is None else stabiliser
+        self.context = zmq.Context.instance()
+        self.socket = self.context.socket(zmq.ROUTER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind(address)
+        self._stop = threading.Event()
+        self._sweep = None
+        self._sweep_result = None
+        self.commands = {
+            "set_PID_const": self.set_PID_const,
+            "set_exposure1": set_exposure1,
+            "autoexposure": autoexposure,
+            "get_frequency": get_frequency,
+            "get_wavelength": get_wavelength,
+            "get_current_PID": get_current_PID,
+            "set_reference": self.set_reference,
+            "stop_stabiliser": self.stop_stabiliser,
+            "stabiliser_state": self.stabiliser.state,
+            "start_sweep": self.start_sweep,
+            "sweep_result": self.sweep_result,
+        }
+
+    def set_reference(self, reference_wl: float, mode = True, start_PID_point = None):
+        '''
+            Starts stabilisation on reference_wl (see Stabiliser.set_reference)
+
+            :return: 0 or -43 if a sweep is running
+        '''
+        if(self.sweep_running()):
+            return -43
+        self.stabiliser.set_reference(reference_wl, mode, start_PID_point)
+        return 0
+
+    def stop_stabiliser(self):
+        self.stabiliser.stop()
+        return 0
+
+    def set_PID_const(self, chan: int, value: float):
+        '''
+            Sets PID by hand (see WLM_methods.set_PID_const)
+
+            :return: the answer of the DLL or -43 if the stabiliser or a sweep is running (they set PID themselves)
+        '''
+        if(self.sweep_running() or self.stabiliser.running):
+            return -43
+        return set_PID_const(chan, value)
+
+    def sweep_running(self) -> bool:
+        return self._sweep is not None and self._sweep.is_alive()
+
+    def start_sweep(self, points: int, PID_step: float, PID_start: float, expo_time: float):
+        '''
+            Starts wavelength_PID_bond in a separate thread. The result is taken by sweep_result and added
+            to the lookup of the stabiliser if it has one
+
+            :return: 0 or -43 if the stabiliser or another sweep is running
+        '''
+        if(self.sweep_running() or self.stabiliser.running):
+            return -43
+        self._sweep_result = None
+
+        def sweep():
+            d = wavelength_PID_bond(points, PID_step, PID_start, expo_time)
+            if(self.stabiliser.lookup is not None):
+                self.stabiliser.lookup.add_sweep(d)
+            self._sweep_result = [list(d[i]) for i in range(len(d))]
+        self._sweep = threading.Thread(target=sweep, name="sweep", daemon=True)
+        self._sweep.start()
+        return 0
+
+    def sweep_result(self):
+        '''
+            :return: list of [PID, wavelength] of the last sweep or None while it's running
+        '''
+        if(self.sweep_running()):
+            return None
+        return self._sweep_result
+
+    def execute(self, calls):
+        '''
+            Executes a batch of calls
+
+            :param calls: list of [method, args]
+            :return: list of [True, result] or [False, error]
+        '''
+        answers = []
+        for call in calls:
+            try:
+                method, args = call
+                if(not isinstance(args, (list, tuple))):
+                    raise TypeError("args of %r must be a list" % (method,))
+                answers.append([True, self.commands[method](*args)])
+            except Exception as e:
+                answers.append([False, "%s: %s" % (type(e).__name__, e)])
+        return answers
+
+    def handle(self, message: bytes) -> bytes:
+        '''
+            Decodes the request, executes it and packs the answer. A request that can't be decoded is answered
+            with request id None and one error
+
+            :param message: msgpack [request id, calls]
+            :return: msgpack [request id, answers]
+        '''
+        request_id = None
+        try:
+            request_id, calls = msgpack.unpackb(message)
+            if(not isinstance(calls, (list, tuple))):
+                raise TypeError("calls must be a list of [method, args]")
+            answers = self.execute(calls)
+        except Exception as e:
+            answers = [[False, "%s: %s" % (type(e).__name__, e)]]
+        try:
+            return msgpack.packb([request_id, answers])
+        except Exception as e:
+            # a result msgpack can't pack
+            return msgpack.packb([request_id, [[False, "%s: %s" % (type(e).__name__, e)]]])
+
+    def serve(self, timeout = 200):
+        '''
+            Answers the requests until close() is called
+
+            :param timeout: time in ms to wait for a request before checking whether the server is closed
+        '''
+        while(not self._stop.is_set()):
+            if(not self.socket.poll(timeout)):
+                continue
+            frames = self.socket.recv_multipart()
+            # a bad request is answered with an error, the server keeps serving
+            if(len(frames) != 2):
+                answer = msgpack.packb([None, [[False, "ValueError: expected one frame, got %d" % (len(frames) - 1)]]])
+            else:
+                answer = self.handle(frames[1])
+            self.socket.send_multipart((frames[0], answer))
+        self.socket.close()
+
+    def start(self) -> threading.Thread:
+        '''
+            Starts serve in a daemon thread
+
+            :return: the thread
+        '''
+        thread = threading.Thread(target=self.serve, name="rpc", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._stop.set()
+        self.stabiliser.stop()
+
+
+class RpcError(Exception):
+    '''
+        Exception raised on the server by a remote call
+    '''
+
+
+class RpcFuture:
+    '''
+        Result of a remote call that may not have come yet
+    '''
+    def __init__(self, client, request_id, index):
+        self._client = client
+        self._request_id = request_id
+        self._index = index
+        self._answer = None
+
+    def done(self) -> bool:
+        '''
+            :return: True if the answer has come (the answers waiting in the socket are taken without blocking)
+        '''
+        if(self._answer is not None):
+            return True
+        self._client._drain()
+        return self._request_id in self._client._answers
+
+    def result(self, timeout = None):
+        '''
+            Waits for the answer
+
+            :param timeout: time to wait in ms, None - wait forever
+            :return: the value the method returned on the server
+        '''
+        if(self._answer is None):
+            self._answer = self._client._take(self._request_id, self._index, timeout)
+        ok, value = self._answer
+        if(not ok):
+            raise RpcError(value)
+        return value
+
+
+class RpcBatch:
+    '''
+        Collects calls to send them in one message. Use as a context manager or call send()
+    '''
+    def __init__(self, client):
+        self._client = client
+        self._request_id = next(client._ids)
+        self._calls = []
+
+    def call(self, method: str, *args) -> RpcFuture:
+        self._calls.append([method, list(args)])
+        return RpcFuture(self._client, self._request_id, len(self._calls) - 1)
+
+    def send(self):
+        if(self._calls):
+            self._client._send(self._request_id, self._calls)
+            self._request_id = next(self._client._ids)
+            self._calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if(exc_type is None):
+            self.send()
+
+
+class RpcClient:
+    '''
+        Client of RpcServer. Not thread safe: use one client per thread
+
+        Example:
+            client = RpcClient("tcp://192.168.13.183:5557")
+            with client.batch() as b:
+                b.call("set_exposure1", 1, 5)
+                state = b.call("stabiliser_state")
+            print(state.result())
+    '''
+    def __init__(self, address = DEFAULT_ADDRESS):
+        self.context = zmq.Context.instance()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(address)
+        self._ids = itertools.count()
+        self._answers = {}
+        # number of futures of every request that haven't taken their answers yet
+        self._waiting = {}
+
+    def close(self):
+        self.socket.close()
+
+    def batch(self) -> RpcBatch:
+        return RpcBatch(self)
+
+    def call_async(self, method: str, *args) -> RpcFuture:
+        '''
+            Sends the call without waiting for the answer
+        '''
+        batch = self.batch()
+        future = batch.call(method, *args)
+        batch.send()
+        return future
+
+    def call(self, method: str, *args, timeout = None):
+        '''
+            Calls the method on the server and waits for the answer
+
+            :param timeout: time to wait in ms, None - wait forever
+        '''
+        return self.call_async(method, *args).result(timeout)
+
+    def _send(self, request_id, calls):
+        self._waiting[request_id] = len(calls)
+        self.socket.send(msgpack.packb([request_id, calls]))
+
+    def _take(self, request_id, index, timeout):
+        '''
+            Receives the answers until the one for request_id comes and gives the answer of the call number index
+        '''
+        while(request_id not in self._answers):
+            if(timeout is not None and not self.socket.poll(timeout)):
+                raise TimeoutError("No answer from the RPC server")
+            self._receive()
+        answer = self._answers[request_id][index]
+        self._waiting[request_id] -= 1
+        if(self._waiting[request_id] == 0):
+            del self._waiting[request_id]
+            del self._answers[request_id]
+        return answer
+
+    def _receive(self):
+        answer_id, answers = msgpack.unpackb(self.socket.recv())
+        # answers to requests the server couldn't read have no id
+        if(answer_id in self._waiting):
+            self._answers[answer_id] = answers
+
+    def _drain(self):
+        '''
+            Takes all the answers that have come without waiting
+        '''
+        while(self.socket.poll(0)):
+            self._receive()
@@ -0,0 +1,191 @@
+import collections
+import random
+import time
+
+import wlmData
+import wlmConst
+from WLM_methods import cDependFrequencyPID
+
+# speed of light in nm*THz: frequency [THz] = C / vacuum wavelength [nm]
+C = 299792.458
+
+
+class SimulationLimit(Exception):
+    '''
+        Raised by SimulatedDLL when the limit of measurements is reached. Stops the methods which never
+        return by themselves (e.g. triangle_PID_course)
+    '''
+    pass
+
+
+class SimulatedDLL:
+    '''
+        Model of the laser and WLM used in place of wlmData.dll to run the methods without the hardware
+        (benchmarks, development). The frequency depends linearly on the PID output (koef THz per mV) and
+        has gaussian noise and linear drift. A new measurement is made once per exposure (every read if
+        exposure is 0), between them the reads repeat the last one as WLM does.
+        The functions the model doesn't know are answered with ResERR_NoErr
+
+        Example:
+            sim = SimulatedDLL(noise=1e-08)
+            sim.install()
+            reference_const_PID_stabilisator(True, 400.0001, sim.koef, 4096, 0, 2048, callback=callback)
+            sim.uninstall()
+    '''
+    def __init__(self, frequency = 400., koef = cDependFrequencyPID, PID = 2048., noise = 0., drift = 0.,
+                 exposure = 0., power = 1000., modes = (), limit = None, trace = False, seed = None):
+        '''
+            :param frequency: frequency in THz at PID = 2048 mV
+            :param koef: koef of dependency between PID mV and frequency
+            :param PID: PID output in mV at the start
+            :param noise: standard deviation of the frequency in THz
+            :param drift: drift of the frequency in THz/s
+            :param exposure: exposure in ms (time of one measurement)
+            :param power: power measured by WLM in uW
+            :param modes: resonances of a resonator after the laser as (frequency THz, width THz, height)
+                          tuples, seen by power_meter()
+            :param limit: number of measurements after which SimulationLimit is raised or None
+            :param trace: keep (time, PID, frequency) of every measurement in self.trace
+            :param seed: seed of the noise
+        '''
+        self.frequency = frequency
+        self.koef = koef
+        self.PID = PID
+        self.noise = noise
+        self.drift = drift
+        self.exposure = exposure
+        self.power = power
+        self.modes = list(modes)
+        self.limit = limit
+        self.trace = [] if trace else None
+        self.calls = collections.Counter()
+        self.measurements = 0
+        self._random = random.Random(seed)
+        self._start = time.perf_counter()
+        self._measured = None
+        self._value = 0.
+        self._installed = None
+
+    def install(self):
+        '''
+            Replaces wlmData.dll with the model
+        '''
+        if(self._installed is None):
+            self._installed = wlmData.dll
+            wlmData.dll = self
+
+    def uninstall(self):
+        if(self._installed is not None):
+            wlmData.dll = self._installed
+            self._installed = None
+
+    def laser_frequency(self) -> float:
+        '''
+            :return: frequency of the laser now in THz without the noise of WLM
+        '''
+        return (self.frequency + self.koef * (self.PID - 2048.)
+                + self.drift * (time.perf_counter() - self._start))
+
+    def transmission(self, frequency = None) -> float:
+        '''
+            :param frequency: frequency in THz, None - the frequency of the laser now
+            :return: sum of the lorentzian resonances of modes at the frequency
+        '''
+        if(frequency is None):
+            frequency = self.laser_frequency()
+        return sum(height / (1 + (2 * (frequency - centre) / width)**2) for centre, width, height in self.modes)
+
+    def power_meter(self):
+        '''
+            :return: object with the property read like ThorlabsPM100 giving the transmission of modes
+        '''
+        return SimulatedPowerMeter(self)
+
+    def _measure(self) -> float:
+        now = time.perf_counter()
+        if(self._measured is not None and now - self._measured < self.exposure / 1000):
+            return self._value
+        self.measurements += 1
+        if(self.limit is not None and self.measurements > self.limit):
+            raise SimulationLimit()
+        self._measured = now
+        self._value = self.laser_frequency() + (self._random.gauss(0., self.noise) if self.noise > 0 else 0.)
+        if(self.trace is not None):
+            self.trace.append((now, self.PID, self._value))
+        return self._value
+
+    def __getattr__(self, name):
+        if(name.startswith("_")):
+            raise AttributeError(name)
+        calls = self.calls
+
+        def call(*args):
+            calls[name] += 1
+            return wlmConst.ResERR_NoErr
+        return call
+
+    def GetFrequencyNum(self, chan, value):
+        self.calls["GetFrequencyNum"] += 1
+        return self._measure()
+
+    def GetWavelengthNum(self, chan, value):
+        self.calls["GetWavelengthNum"] += 1
+        return C / self._measure()
+
+    def ConvertUnit(self, value, unit_from, unit_to):
+        self.calls["ConvertUnit"] += 1
+        if(value <= 0 or unit_from == unit_to):
+            return value
+        units = (unit_from, unit_to)
+        if(units == (wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency)
+                or units == (wlmConst.cReturnFrequency, wlmConst.cReturnWavelengthVac)):
+            return C / value
+        return wlmConst.ErrUnitNotAvailable
+
+    def GetDeviationSignalNum(self, chan, value):
+        self.calls["GetDeviationSignalNum"] += 1
+        return self.PID
+
+    def SetDeviationSignalNum(self, chan, value):
+        self.calls["SetDeviationSignalNum"] += 1
+        self.PID = value
+        return wlmConst.ResERR_NoErr
+
+    def SetPIDCourseNum(self, chan, course):
+        '''
+            Takes the course "= wavelength" and puts the laser on the wavelength as the regulation of WLM would
+        '''
+        self.calls["SetPIDCourseNum"] += 1
+        text = course.value.decode() if hasattr(course, "value") else course
+        wave = float(text.strip().lstrip("="))
+        self.PID = 2048. + (C / wave - self.frequency) / self.koef
+        return wlmConst.ResERR_NoErr
+
+    def GetPowerNum(self, chan, value):
+        self.calls["GetPowerNum"] += 1
+        return self.power
+
+    def GetExposureNum(self, chan, arr, value):
+        self.calls["GetExposureNum"] += 1
+        return int(self.exposure)
+
+    def SetExposureNum(self, chan, arr, value):
+        self.calls["SetExposureNum"] += 1
+        self.exposure = value
+        return wlmConst.ResERR_NoErr
+
+    def GetExposureRange(self, which):
+        self.calls["GetExposureRange"] += 1
+        return 1 if which == wlmConst.cExpoMin else 9999
+
+
+class SimulatedPowerMeter:
+    '''
+        Power meter after the resonator of a SimulatedDLL
+    '''
+    def __init__(self, dll: SimulatedDLL):
+        self.dll = dll
+
+    @property
+    def read(self) -> float:
+        return self.dll.transmission()
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import wlmData
+import wlmConst
+from Lock_methods import OUT_OF_RANGE, UNLOCKED, classify_lock
+from WLM_methods import cDependFrequencyPID, reference_const_PID_stabilisator
+
+
+class Stabiliser:
+    '''
+        Keeps reference_const_PID_stabilisator running in a separate thread so the reference
+        can be changed and the state read while it works (e.g. by RPC or a supervisor).
+        A new reference restarts the stabiliser from the current PID value, or from the PID of the reference
+        if there is a PIDLookup which knows it. pause() holds it between two iterations (e.g. while WLM
+        calibrates) without ending its thread
+    '''
+    def __init__(self, koef = cDependFrequencyPID, max_PID_val = 4096, time_pause = 100, chan = 1, callback = None,
+                 detector = None, lookup = None, profiler = None, on_finish = None):
+        '''
+            :param koef: koef of dependency between PID mV and frequency
+            :param max_PID_val: max val in mV for PID
+            :param time_pause: pause after setting PID in ms
+            :param chan: channel to use
+            :param callback: function called every iteration with the same arguments as the callback
+                             of reference_const_PID_stabilisator. If it returns True the stabiliser stops
+            :param detector: ModeHopDetector or None
+            :param lookup: PIDLookup filled with the samples of the stabiliser and used to start from the PID of
+                           the reference (saved when the stabiliser stops), or None
+            :param profiler: LoopProfiler timing the iterations of the stabiliser or None
+            :param on_finish: function called as on_finish(result) when the thread of the stabiliser ends or None
+        '''
+        self.koef = koef
+        self.max_PID_val = max_PID_val
+        self.time_pause = time_pause
+        self.chan = chan
+        self.callback = callback
+        self.detector = detector
+        self.lookup = lookup
+        self.profiler = profiler
+        self.on_finish = on_finish
+        self.mode = True
+        self.reference = None
+        self.PID = None
+        self.frequency = 0.
+        self.delta = 0.
+        self.stabilised = False
+        self.result = None
+        self._restart = False
+        self._stop = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+        self._held = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resume.is_set()
+
+    @property
+    def lock_state(self) -> int:
+        '''
+            :return: one of the states of Lock_methods
+        '''
+        if(self.result == -42):
+            return OUT_OF_RANGE
+        if(not self.running):
+            return UNLOCKED
+        return classify_lock(self.frequency, self.stabilised)
+
+    def state(self) -> dict:
+        '''
+            :return: the state of the stabiliser as a dictionary
+        '''
+        return {"running": self.running, "paused": self.paused, "reference": self.reference, "mode": self.mode, "PID": self.PID,
+                "frequency": self.frequency, "delta": self.delta, "stabilised": self.stabilised,
+                "lock_state": self.lock_state, "result": self.result}
+
+    def set_reference(self, reference_wl: float, mode = True, start_PID_point = None):
+        '''
+            Sets a new reference and starts the stabiliser if it isn't running
+
+            :param reference_wl: frequency in THz if mode else wavelength in nm
+            :param mode: True - reference_wl is frequency
+            :param start_PID_point: PID in mV to start from. None - the PID of the reference from the lookup or
+                                    the current PID of the channel
+        '''
+        if(start_PID_point is None and self.lookup is not None):
+            frequency = reference_wl
+            if(not mode):
+                frequency = wlmData.dll.ConvertUnit(reference_wl, wlmConst.cReturnWavelengthVac,
+                                                    wlmConst.cReturnFrequency)
+            start_PID_point = self.lookup.PID_for(frequency, self.PID)
+            if(start_PID_point is not None):
+                start_PID_point = min(max(start_PID_point, 0), self.max_PID_val)
+        with self._lock:
+            self.reference = reference_wl
+            self.mode = mode
+            if(self.running):
+                if(start_PID_point is not None):
+                    self.PID = start_PID_point
+                self._restart = True
+                return
+            if(start_PID_point is None):
+                start_PID_point = wlmData.dll.GetDeviationSignalNum(self.chan, 0)
+            self.PID = start_PID_point
+            self.result = None
+            self._stop.clear()
+            self._resume.set()
+            self._thread = threading.Thread(target=self._run, name="stabiliser", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout = None):
+        '''
+            Stops the stabiliser and waits for its thread
+
+            :param timeout: time to wait in s, None - until it stops
+        '''
+        self._stop.set()
+        self._resume.set()
+        self.wait(timeout)
+
+    def pause(self, timeout = None) -> bool:
+        '''
+            Holds the stabiliser after its current iteration until resume(). PID isn't changed while it's held,
+            the thread, the callbacks and the lock state are kept
+
+            :param timeout: time to wait for the iteration to end in s, None - until it ends
+            :return: True if it's held, False if it isn't running (or the iteration didn't end in timeout)
+        '''
+        if(not self.running):
+            return False
+        self._resume.clear()
+        start = time.perf_counter()
+        while(not self._held.wait(0.01)):
+            if(not self.running or (timeout is not None and time.perf_counter() - start >= timeout)):
+                self._resume.set()
+                return False
+        return True
+
+    def resume(self):
+        '''
+            Lets the stabiliser go on after pause()
+        '''
+        self._resume.set()
+
+    def wait(self, timeout = None) -> bool:
+        '''
+            Waits until the stabiliser stops by itself (PID out of range, the callback) or by stop()
+
+            :param timeout: time to wait in s, None - until it stops
+            :return: True if it isn't running
+        '''
+        thread = self._thread
+        if(thread is not None):
+            thread.join(timeout)
+        return not self.running
+
+    def _step(self, PID_current, frequency, delta, stabilised) -> bool:
+        self.PID = PID_current
+        self.frequency = frequency
+        self.delta = delta
+        self.stabilised = stabilised
+        if(self.lookup is not None):
+            self.lookup.add(PID_current, frequency)
+        if(self.callback is not None and self.callback(PID_current, frequency, delta, stabilised)):
+            self._stop.set()
+        if(not self._resume.is_set()):
+            self._held.set()
+            self._resume.wait()
+            self._held.clear()
+        return self._stop.is_set() or self._restart
+
+    def _run(self):
+        while(not self._stop.is_set()):
+            with self._lock:
+                self._restart = False
+                reference = self.reference
+                mode = self.mode
+                PID = self.PID
+            self.result = reference_const_PID_stabilisator(mode, reference, self.koef, self.max_PID_val,
+                                                           self.time_pause, PID, self.chan, callback = self._step,
+                                                           detector = self.detector, profiler = self.profiler)
+            if(self.result == -42):
+                break
+        self.stabilised = False
+        if(self.lookup is not None):
+            self.lookup.autosave()
+        if(self.on_finish is not None):
+            self.on_finish(self.result)
@@ -0,0 +1,312 @@
+import collections
+import math
+import threading
+import time
+
+import numpy as np
+
+from Event_methods import WAVELENGTH_MODES
+
+# speed of light in nm*THz
+C = 299792.458
+
+
+class _Octave:
+    '''
+        Allan variance of one tau: differences of the means of two adjacent blocks of m values of the stream
+        it is fed with, for every new value (overlapping)
+    '''
+    def __init__(self, m: int):
+        self.m = m
+        self.values = collections.deque()
+        self.sum_a = 0.
+        self.sum_b = 0.
+        self.squares = 0.
+        self.n = 0
+
+    def push(self, x: float):
+        values = self.values
+        values.append(x)
+        self.sum_b += x
+        if(len(values) > self.m):
+            # the value on the border goes from the newer block to the older one
+            moving = values[-1 - self.m]
+            self.sum_b -= moving
+            self.sum_a += moving
+        if(len(values) > 2 * self.m):
+            self.sum_a -= values.popleft()
+        if(len(values) == 2 * self.m):
+            self.squares += ((self.sum_b - self.sum_a) / self.m)**2
+            self.n += 1
+
+    def restart(self):
+        '''
+            Starts a new stream keeping the sum of the differences (no difference goes across a gap)
+        '''
+        self.values.clear()
+        self.sum_a = 0.
+        self.sum_b = 0.
+
+
+class AllanDeviation:
+    '''
+        Allan deviation for tau = tau0 * 2**k updated by every sample with constant memory per octave.
+        The samples are averaged by pairs into the streams of 2, 4, 8... samples; the octave k takes the
+        differences of blocks of min(2**k, 2**overlap_bits) values of the stream of 2**max(0, k - overlap_bits)
+        samples. So it's the overlapping Allan deviation up to tau0 * 2**overlap_bits and an estimate
+        overlapped by 2**overlap_bits per tau above it; overlap_bits = 0 gives the classic (non overlapping) one
+    '''
+    def __init__(self, overlap_bits = 3, max_octaves = 24):
+        '''
+            :param overlap_bits: log2 of the number of overlapping blocks per tau (memory is 2**(overlap_bits+1)
+                                 values per octave)
+            :param max_octaves: number of the octaves of tau
+        '''
+        self.overlap_bits = overlap_bits
+        self.max_octaves = max_octaves
+        self.count = 0
+        self.octaves = [_Octave(2**min(k, overlap_bits)) for k in range(max_octaves)]
+        self._pending = [None] * max(1, max_octaves - overlap_bits)
+
+    def _octaves_of(self, level: int):
+        if(level == 0):
+            return range(min(self.overlap_bits + 1, self.max_octaves))
+        k = level + self.overlap_bits
+        return range(k, k + 1) if k < self.max_octaves else range(0)
+
+    def update(self, x: float):
+        '''
+            :param x: new sample (e.g. the frequency offset in Hz)
+        '''
+        self.count += 1
+        level = 0
+        while(True):
+            for k in self._octaves_of(level):
+                self.octaves[k].push(x)
+            if(level + 1 >= len(self._pending)):
+                break
+            if(self._pending[level] is None):
+                self._pending[level] = x
+                break
+            x = (self._pending[level] + x) / 2
+            self._pending[level] = None
+            level += 1
+
+    def restart(self):
+        '''
+            Starts a new stream after a gap in the samples, the differences accumulated are kept
+        '''
+        for octave in self.octaves:
+            octave.restart()
+        self._pending = [None] * len(self._pending)
+
+    def deviations(self, tau0: float):
+        '''
+            :param tau0: time between the samples in s
+            :return: list of (tau in s, Allan deviation in the units of the samples, number of differences)
+                     of the octaves having a result
+        '''
+        return [(tau0 * 2**k, math.sqrt(o.squares / (2 * o.n)), o.n) for k, o in enumerate(self.octaves) if o.n > 0]
+
+
+class WelchPSD:
+    '''
+        Welch estimate of the power spectral density of a stream: segments of nperseg samples overlapping by half,
+        mean removed, Hann window, the periodograms are averaged
+    '''
+    def __init__(self, nperseg = 256):
+        '''
+            :param nperseg: length of a segment
+        '''
+        self.nperseg = nperseg
+        self.window = np.hanning(nperseg)
+        self.segments = 0
+        self._values = collections.deque(maxlen=nperseg)
+        self._new = 0
+        self._sum = np.zeros(nperseg // 2 + 1)
+
+    def update(self, x: float):
+        self._values.append(x)
+        self._new += 1
+        if(len(self._values) == self.nperseg and self._new >= self.nperseg // 2):
+            segment = np.fromiter(self._values, float, self.nperseg)
+            spectrum = np.fft.rfft((segment - segment.mean()) * self.window)
+            self._sum += np.abs(spectrum)**2
+            self.segments += 1
+            self._new = 0
+
+    def restart(self):
+        '''
+            Starts a new stream after a gap in the samples, the averaged periodograms are kept
+        '''
+        self._values.clear()
+        self._new = 0
+
+    def density(self, fs: float):
+        '''
+            :param fs: sample rate in Hz
+            :return: (frequencies in Hz, one-sided PSD in units**2/Hz) - tuple pack, empty arrays if no segment
+                     is complete
+        '''
+        if(self.segments == 0 or fs <= 0):
+            return np.empty(0), np.empty(0)
+        psd = self._sum / self.segments / (fs * np.sum(self.window**2))
+        psd[1:-1 if self.nperseg % 2 == 0 else None] *= 2
+        return np.fft.rfftfreq(self.nperseg, 1 / fs), psd
+
+
+class StabilityMonitor:
+    '''
+        Stability of the locked frequency: Allan deviation and PSD of the frequency offset from the first
+        sample, one sample per measurement of WLM. The samples come from the wavelength events of the channel
+        (on_event as a listener of an EventPump) with the time stamps of WLM, or, without a channel, from the
+        callback of the stabiliser, which is called many times per measurement while it's stabilised, so only
+        the new values are taken. The stabiliser callback tells whether the laser is locked (only the locked
+        samples are taken if locked_only). After the lock was lost, or when the time between two samples is
+        longer than gap * tau0, the streams are restarted: no difference or segment goes across a gap and tau0
+        is the mean time between the samples inside the streams.
+        Can be read from another thread (GUI, logs)
+
+        Example:
+            monitor = StabilityMonitor(chan=1)
+            pump.add_listener(monitor.on_event)
+            reference_const_PID_stabilisator(True, reference, koef, 4096, time_pause,
+                                             callback=monitor.stabiliser_callback())
+            print(monitor.report())
+    '''
+    def __init__(self, overlap_bits = 3, max_octaves = 24, nperseg = 256, locked_only = True, chan = None, gap = 5.):
+        '''
+            :param overlap_bits: see AllanDeviation
+            :param max_octaves: number of the octaves of tau
+            :param nperseg: length of the segments of the PSD
+            :param locked_only: take only the samples while the stabiliser is stabilised
+            :param chan: channel whose wavelength events give the samples, None - the stabiliser callback gives them
+            :param gap: time between two samples in tau0 which restarts the streams
+        '''
+        self.overlap_bits = overlap_bits
+        self.max_octaves = max_octaves
+        self.nperseg = nperseg
+        self.locked_only = locked_only
+        self.chan = chan
+        self.gap = gap
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.allan = AllanDeviation(self.overlap_bits, self.max_octaves)
+            self.psd = WelchPSD(self.nperseg)
+            self.nominal = None
+            self.count = 0
+            self.restarts = 0
+            self.locked = False
+            self._last = None
+            self._last_value = None
+            self._broken = False
+            self._interval_sum = 0.
+            self._intervals = 0
+
+    def _restart(self):
+        self.allan.restart()
+        self.psd.restart()
+        self.restarts += 1
+
+    def update(self, frequency: float, t = None):
+        '''
+            :param frequency: frequency in THz of one measurement (values <= 0 are WLM errors and are skipped)
+            :param t: time of the measurement in s, None - now
+        '''
+        if(frequency <= 0):
+            return
+        t = time.time() if t is None else t
+        with self._lock:
+            if(self.nominal is None):
+                self.nominal = frequency
+            if(self._last is not None):
+                interval = t - self._last
+                tau0 = self._interval_sum / self._intervals if self._intervals > 0 else None
+                if(self._broken or interval <= 0 or (tau0 is not None and interval > self.gap * tau0)):
+                    self._restart()
+                else:
+                    self._interval_sum += interval
+                    self._intervals += 1
+            self._broken = False
+            # offset in Hz, the THz values themselves have too few digits left for the sums
+            x = (frequency - self.nominal) * 1e12
+            self.allan.update(x)
+            self.psd.update(x)
+            self.count += 1
+            self._last = t
+
+    def set_locked(self, locked: bool):
+        '''
+            :param locked: the stabiliser is stabilised. When it's lost the next sample starts new streams
+        '''
+        with self._lock:
+            if(self.locked and not locked):
+                self._broken = True
+            self.locked = locked
+
+    @property
+    def tau0(self) -> float:
+        '''
+            :return: mean time between the samples in s
+        '''
+        if(self._intervals == 0):
+            return 0.
+        return self._interval_sum / self._intervals
+
+    def on_event(self, mode: int, int_val: int, dbl_val: float):
+        '''
+            Listener for EventPump: the wavelength event of the channel is one measurement, int_val is its time
+            stamp in ms
+        '''
+        if(self.chan is None or mode != WAVELENGTH_MODES.get(self.chan)):
+            return
+        if(dbl_val <= 0 or (self.locked_only and not self.locked)):
+            return
+        self.update(C / dbl_val, int_val / 1000)
+
+    def stabiliser_callback(self, callback = None):
+        '''
+            :param callback: callback of the stabiliser to call after the update or None
+            :return: callback for reference_const_PID_stabilisator (or Stabiliser)
+        '''
+        def update(PID_current, frequency, delta, stabilised):
+            self.set_locked(stabilised)
+            if(self.chan is None and (stabilised or not self.locked_only)):
+                # the stabiliser reads the same measurement again until WLM makes a new one
+                if(frequency != self._last_value):
+                    self._last_value = frequency
+                    self.update(frequency)
+            if(callback is not None):
+                return callback(PID_current, frequency, delta, stabilised)
+            return False
+        return update
+
+    def deviations(self):
+        '''
+            :return: list of (tau in s, fractional Allan deviation, Allan deviation in Hz, number of differences)
+        '''
+        with self._lock:
+            if(self.nominal is None):
+                return []
+            return [(tau, sigma / (self.nominal * 1e12), sigma, n) for tau, sigma, n in self.allan.deviations(self.tau0)]
+
+    def density(self):
+        '''
+            :return: (frequencies in Hz, PSD of the frequency in Hz**2/Hz) - tuple pack
+        '''
+        with self._lock:
+            tau0 = self.tau0
+            return self.psd.density(1 / tau0 if tau0 > 0 else 0.)
+
+    def report(self) -> str:
+        '''
+            :return: the Allan deviations as a table for logs
+        '''
+        lines = ["%d samples, tau0 %.4g s, %d gaps" % (self.count, self.tau0, self.restarts),
+                 "%12s %12s %12s %8s" % ("tau s", "ADEV", "Hz", "n")]
+        for tau, fractional, sigma, n in self.deviations():
+            lines.append("%12.4g %12.3e %12.4g %8d" % (tau, fractional, sigma, n))
+        return "\n".join(lines)
@@ -0,0 +1,91 @@
+import csv
+
+# speed of light in nm*THz
+C = 299792.458
+
+
+def valid(samples, index = -1):
+    '''
+        Drops the samples with a WLM error (value <= 0) in the field index
+
+        :param samples: generator of (i, tuple) like iter_wavelength_PID_bond
+        :param index: index of the measured value in the tuple
+        :return: generator of the good samples
+    '''
+    for i, sample in samples:
+        if(sample[index] > 0):
+            yield i, sample
+
+
+def until(samples, predicate, inclusive = True):
+    '''
+        Stops the sweep as soon as predicate(sample) is True (the source generator is closed,
+        so it gives back its settings)
+
+        :param samples: generator of (i, tuple)
+        :param predicate: function of the tuple
+        :param inclusive: yield the sample which stopped the sweep
+        :return: generator of the samples
+    '''
+    try:
+        for i, sample in samples:
+            if(predicate(sample)):
+                if(inclusive):
+                    yield i, sample
+                return
+            yield i, sample
+    finally:
+        close = getattr(samples, "close", None)
+        if(close is not None):
+            close()
+
+
+def write_csv(samples, path: str, header = None):
+    '''
+        Writes every sample into a csv file as it passes (flushed per row, so the file is full
+        if the sweep is interrupted) and yields it further
+
+        :param samples: generator of (i, tuple)
+        :param path: csv file (rewritten)
+        :param header: names of the columns after i or None
+        :return: generator of the samples
+    '''
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        if(header is not None):
+            writer.writerow(("i",) + tuple(header))
+        for i, sample in samples:
+            writer.writerow((i,) + tuple(sample))
+            f.flush()
+            yield i, sample
+
+
+def to_lookup(samples, lookup, unit = None):
+    '''
+        Adds the (PID, wavelength) samples of a PID sweep into a PIDLookup as they pass
+
+        :param samples: generator of (i, (PID, wavelength in nm)) like iter_wavelength_PID_bond
+        :param lookup: PIDLookup
+        :param unit: function converting the measured value into frequency in THz, None - wavelength in nm
+        :return: generator of the samples. The lookup is saved when the sweep ends (or is stopped)
+    '''
+    try:
+        for i, sample in samples:
+            PID, value = sample[0], sample[1]
+            if(value > 0):
+                lookup.add(PID, unit(value) if unit is not None else C / value)
+            yield i, sample
+    finally:
+        lookup.autosave()
+
+
+def last(samples):
+    '''
+        Runs the sweep to the end keeping only the last sample
+
+        :return: (i, tuple) or None if there was no sample
+    '''
+    result = None
+    for result in samples:
+        pass
+    return result
@@ -0,0 +1,142 @@
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import zmq
+
+# address the server binds by default. Clients on other computers use the IP of the WLM host instead of 127.0.0.1
+DEFAULT_ADDRESS = "tcp://127.0.0.1:5556"
+
+# topics of the messages. A message is two frames: topic and the packed payload
+TOPIC_EVENT = b"wlm"
+TOPIC_STATUS = b"stabiliser"
+
+# time [s], Mode, IntVal, DblVal of WaitForWLMEvent - 24 bytes
+EVENT_FORMAT = struct.Struct("<diid")
+# time [s], channel, PID [mV], frequency [THz], delta [THz], stabilised - 37 bytes
+STATUS_FORMAT = struct.Struct("<diddd?")
+
+WlmEvent = namedtuple("WlmEvent", ("time", "mode", "int_val", "dbl_val"))
+StabiliserStatus = namedtuple("StabiliserStatus", ("time", "chan", "PID", "frequency", "delta", "stabilised"))
+
+
+class TelemetryServer:
+    '''
+        Publishes the WLM events and the stabiliser status to any number of subscribers (ZeroMQ PUB).
+        Only the process that owns the DLL runs the server, analysis processes and dashboards use TelemetryClient.
+        Slow subscribers lose messages instead of slowing down the publisher.
+        The WLM events come from an EventPump: pump.add_listener(server.on_event)
+    '''
+    def __init__(self, address = DEFAULT_ADDRESS, hwm = 10000):
+        '''
+            :param address: ZeroMQ address to bind
+            :param hwm: max number of messages queued for every subscriber
+        '''
+        self.context = zmq.Context.instance()
+        self.socket = self.context.socket(zmq.PUB)
+        self.socket.setsockopt(zmq.SNDHWM, hwm)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind(address)
+        # ZeroMQ sockets aren't thread safe and the events and the status come from different threads
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self.socket.close()
+
+    def _send(self, topic, payload):
+        with self._lock:
+            if(self.socket.closed):
+                return
+            try:
+                self.socket.send_multipart((topic, payload), zmq.NOBLOCK)
+            except zmq.Again:
+                pass
+
+    def publish_event(self, mode: int, int_val: int, dbl_val: float, t = None):
+        '''
+            Publishes one WLM event (the values WaitForWLMEvent returns)
+
+            :param t: time of the event in s (time.time() if None)
+        '''
+        self._send(TOPIC_EVENT, EVENT_FORMAT.pack(time.time() if t is None else t, mode, int_val, dbl_val))
+
+    def publish_status(self, chan: int, PID: float, frequency: float, delta: float, stabilised: bool, t = None):
+        '''
+            Publishes the state of one iteration of the stabiliser
+        '''
+        self._send(TOPIC_STATUS, STATUS_FORMAT.pack(time.time() if t is None else t, chan, PID, frequency, delta,
+                                                    stabilised))
+
+    def stabiliser_callback(self, chan = 1, callback = None):
+        '''
+            Makes the callback for reference_const_PID_stabilisator that publishes the status of every iteration
+
+            :param chan: channel of the stabiliser
+            :param callback: another callback of the stabiliser to call after publishing or None
+            :return: the callback
+        '''
+        def publish(PID_current, frequency, delta, stabilised):
+            self.publish_status(chan, PID_current, frequency, delta, stabilised)
+            if(callback is not None):
+                return callback(PID_current, frequency, delta, stabilised)
+            return False
+        return publish
+
+    def on_event(self, mode: int, int_val: int, dbl_val: float):
+        '''
+            Listener for EventPump publishing every WLM event
+        '''
+        self.publish_event(mode, int_val, dbl_val)
+
+
+class TelemetryClient:
+    '''
+        Subscribes to a TelemetryServer and decodes its messages into WlmEvent and StabiliserStatus
+    '''
+    def __init__(self, address = DEFAULT_ADDRESS, topics = (TOPIC_EVENT, TOPIC_STATUS)):
+        '''
+            :param address: address of the server
+            :param topics: topics to receive
+        '''
+        self.context = zmq.Context.instance()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        for topic in topics:
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic)
+        self.socket.connect(address)
+
+    def close(self):
+        self.socket.close()
+
+    def receive(self, timeout = None):
+        '''
+            Gets the next message
+
+            :param timeout: time to wait in ms, None - wait forever
+            :return: WlmEvent, StabiliserStatus or None on timeout
+        '''
+        if(timeout is not None and not self.socket.poll(timeout)):
+            return None
+        topic, payload = self.socket.recv_multipart()
+        return decode(topic, payload)
+
+    def __iter__(self):
+        while(True):
+            yield self.receive()
+
+
+def decode(topic: bytes, payload: bytes):
+    '''
+        Unpacks the payload of the message
+
+        :param topic: TOPIC_EVENT or TOPIC_STATUS
+        :param payload: packed values
+        :return: WlmEvent or StabiliserStatus
+    '''
+    if(topic == TOPIC_EVENT):
+        return WlmEvent(*EVENT_FORMAT.unpack(payload))
+    elif(topic == TOPIC_STATUS):
+        return StabiliserStatus(*STATUS_FORMAT.unpack(payload))
+    raise ValueError("Unknown topic %r" % topic)
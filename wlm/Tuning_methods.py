@@ -0,0 +1,265 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from WLM_methods import cDependFrequencyPID
+
+# the step ladder of reference_const_PID_stabilisator: lower bounds of the bands of |delta| in THz
+# (the last one starts the band of PID_step = delta / koef) and the PID steps of the bands in mV
+LADDER_EDGES = (1e-06, 5e-06, 1e-05, 5e-05, 1e-04, 1e-03)
+LADDER_STEPS = (0.125, 0.625, 3.125, 15.625, 156.25)
+
+# number of parameter sets simulated at once by one process: enough to make the numpy calls worth it
+CHUNK = 256
+
+
+class PlantModel:
+    '''
+        Vectorised model of the laser and WLM for simulating many controllers at once:
+        frequency = frequency0 + slope * (PID - 2048) + drift * t + noise. The PID output is quantised
+        to quantum mV and the measurement sees the PID of delay iterations before (exposure delay).
+        One iteration of a controller takes period s
+    '''
+    def __init__(self, slope = cDependFrequencyPID, drift = 0., noise = 0., delay = 0, quantum = 0.125,
+                 period = 0.1, max_PID_val = 4096):
+        '''
+            :param slope: real dependency between PID mV and frequency in THz/mV
+            :param drift: drift of the frequency in THz/s
+            :param noise: standard deviation of the measured frequency in THz
+            :param delay: number of iterations the measurement is late
+            :param quantum: resolution of the PID output in mV
+            :param period: time of one iteration in s
+            :param max_PID_val: max val in mV for PID
+        '''
+        self.slope = slope
+        self.drift = drift
+        self.noise = noise
+        self.delay = delay
+        self.quantum = quantum
+        self.period = period
+        self.max_PID_val = max_PID_val
+
+    def frequency(self, PID, i: int):
+        '''
+            :param PID: array of PID outputs in mV
+            :param i: number of the iteration
+            :return: array of the laser frequencies in THz as the offsets from the one at PID = 2048 mV
+        '''
+        return self.slope * (np.round(PID / self.quantum) * self.quantum - 2048.) + self.drift * i * self.period
+
+
+def _track(last, squares, error, i: int, iterations: int, tolerance: float):
+    '''
+        Accumulates the settle iteration (the last one outside the tolerance + 1) and the sum of squared errors
+        of the second half of the run
+    '''
+    last = np.where(np.abs(error) >= tolerance, i + 1, last)
+    if(i >= iterations // 2):
+        squares = squares + error**2
+    return last, squares
+
+
+def _rms(squares, iterations: int):
+    return np.sqrt(squares / (iterations - iterations // 2))
+
+
+def simulate_ladder(plant: PlantModel, steps, edges, offsets, koef = cDependFrequencyPID, iterations = 500,
+                    tolerance = 1e-06, seed = None):
+    '''
+        Runs reference_const_PID_stabilisator with many ladders at once
+
+        :param plant: PlantModel
+        :param steps: (n, 5) PID steps of the bands in mV
+        :param edges: (n, 6) lower bounds of the bands in THz
+        :param offsets: (n,) references as frequency offsets in THz from the start point (PID = 2048 mV)
+        :param koef: koef of the controller
+        :param iterations: number of iterations
+        :param tolerance: max error in THz of a settled laser
+        :param seed: seed of the noise
+        :return: (iterations to settle, rms error in THz, True if PID went out of range) - tuple pack of (n,) arrays
+    '''
+    steps = np.asarray(steps, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    reference = np.asarray(offsets, dtype=float)
+    n = len(reference)
+    rng = np.random.default_rng(seed)
+    PID = np.full(n, 2048.)
+    history = [PID.copy() for _ in range(plant.delay + 1)]
+    PID_step = np.zeros(n)
+    stabilised = np.zeros(n, dtype=bool)
+    failed = np.zeros(n, dtype=bool)
+    last = np.zeros(n, dtype=int)
+    squares = np.zeros(n)
+    rows = np.arange(n)
+    for i in range(iterations):
+        active = ~stabilised & ~failed
+        PID = np.where(active, PID + PID_step, PID)
+        history.append(PID)
+        history.pop(0)
+        last, squares = _track(last, squares, reference - plant.frequency(PID, i), i, iterations, tolerance)
+        measured = plant.frequency(history[0], i)
+        if(plant.noise > 0):
+            measured = measured + rng.normal(0., plant.noise, n)
+        delta = reference - measured
+        abs_dev = np.abs(delta)
+        # 0 - below the ladder (the step stays), 1..5 - the bands of steps, 6 - delta / koef
+        band = (abs_dev >= edges[:, 0]).astype(int) + np.sum(abs_dev[:, None] > edges[:, 1:], axis=1)
+        ladder = steps[rows, np.clip(band - 1, 0, 4)] * -np.sign(delta)
+        new_step = np.where(band == 6, delta / koef, np.where(band > 0, ladder, PID_step))
+        out = (PID + new_step > plant.max_PID_val) | (PID + new_step < 0)
+        failed |= out & ~failed
+        PID_step = np.where(failed, 0., new_step)
+        stabilised = np.round(delta, 7) == 0
+    return last, _rms(squares, iterations), failed
+
+
+def simulate_max_dev(plant: PlantModel, max_devs, koefs, offsets, iterations = 500, tolerance = 1e-06, seed = None):
+    '''
+        Runs wl_stabilisation_through_PID_const with many max_dev and koef values at once
+
+        :param plant: PlantModel
+        :param max_devs: (n,) max deviations in mV
+        :param koefs: (n,) koefs of the controller
+        :param offsets: (n,) references as frequency offsets in THz from the start point (PID = 2048 mV)
+        :param iterations: number of iterations
+        :param tolerance: max error in THz of a settled laser
+        :param seed: seed of the noise
+        :return: (iterations to settle, rms error in THz, True if PID went out of range) - tuple pack of (n,) arrays
+    '''
+    max_devs = np.asarray(max_devs, dtype=float)
+    koefs = np.asarray(koefs, dtype=float)
+    reference = np.asarray(offsets, dtype=float)
+    n = len(reference)
+    rng = np.random.default_rng(seed)
+    PID = np.full(n, 2048.)
+    history = [PID.copy() for _ in range(plant.delay + 1)]
+    flag = np.zeros(n, dtype=bool)
+    flag2 = np.ones(n, dtype=bool)
+    first = np.ones(n, dtype=bool)
+    PID_step = np.zeros(n)
+    PID_prev = np.zeros(n)
+    failed = np.zeros(n, dtype=bool)
+    last = np.zeros(n, dtype=int)
+    squares = np.zeros(n)
+    measured = plant.frequency(PID, 0)
+    for i in range(iterations):
+        delta = reference - measured
+        sign = -np.sign(delta)
+        PID_step = np.where(flag2 & (delta != 0), 0.125 * sign, PID_step)
+        PID_step = np.where(~flag & first, delta / koefs, PID_step)
+        PID_step = np.where((np.abs(PID_step - PID_prev) > max_devs) & (delta != 0), 100. * sign, PID_step)
+        zero = np.round(delta, 7) == 0
+        locking = zero & ~flag
+        first &= ~locking
+        flag2 &= ~locking
+        unlocking = ~zero & flag
+        flag2 |= unlocking
+        flag = np.where(zero, True, np.where(unlocking, False, flag))
+        move = ~flag & ~failed
+        failed |= move & ((PID + PID_step > plant.max_PID_val) | (PID + PID_step < 0))
+        PID = np.where(move & ~failed, PID + PID_step, PID)
+        history.append(PID)
+        history.pop(0)
+        last, squares = _track(last, squares, reference - plant.frequency(PID, i), i, iterations, tolerance)
+        measured = plant.frequency(history[0], i)
+        if(plant.noise > 0):
+            measured = measured + rng.normal(0., plant.noise, n)
+        PID_prev = PID_step
+    return last, _rms(squares, iterations), failed
+
+
+def _chunks(n: int, size = CHUNK):
+    '''
+        :return: list of (start, end) of the chunks of at most size parameter sets
+    '''
+    return [(a, min(a + size, n)) for a in range(0, n, size)]
+
+
+def _parallel(function, arrays, fixed, processes, seed):
+    '''
+        Splits the arrays into chunks simulated by function in a process pool. The chunks and their seeds
+        depend only on the number of the parameter sets, so the noise and the result are the same for any
+        number of processes
+
+        :param function: simulate_ladder or simulate_max_dev
+        :param arrays: arrays of the parameter sets (the first axis is split)
+        :param fixed: the plant and the arguments after the arrays
+        :return: the concatenated results
+    '''
+    n = len(arrays[0])
+    processes = os.cpu_count() if processes is None else processes
+    chunks = _chunks(n)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    if(processes <= 1):
+        results = [function(fixed[0], *[a[lo:hi] for a in arrays], *fixed[1:], s) for (lo, hi), s in zip(chunks, seeds)]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(function, fixed[0], *[a[lo:hi] for a in arrays], *fixed[1:], s)
+                       for (lo, hi), s in zip(chunks, seeds)]
+            results = [future.result() for future in futures]
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def _offsets(n: int, trials: int, max_offset: float, seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-max_offset, max_offset, (n, trials))
+
+
+def ladder_surface(plant: PlantModel, step_scales, edge_scales, koef = cDependFrequencyPID, trials = 16,
+                   max_offset = 2e-03, iterations = 500, tolerance = 1e-06, processes = None, seed = 0):
+    '''
+        Settle time and rms error of reference_const_PID_stabilisator for the ladder scaled
+        by every pair of the scales (the steps by step_scale, the bands by edge_scale)
+
+        :param plant: PlantModel
+        :param step_scales: factors of LADDER_STEPS
+        :param edge_scales: factors of LADDER_EDGES
+        :param koef: koef of the controller
+        :param trials: number of random references per ladder (the same for all the ladders)
+        :param max_offset: max distance of a reference from the start in THz
+        :param iterations: number of iterations per run
+        :param tolerance: max error in THz of a settled laser
+        :param processes: number of processes, None - all the cores, 1 - in this process
+        :param seed: seed of the references and the noise
+        :return: (mean settle time in s, mean rms error in THz, share of runs which didn't settle) - tuple pack
+                 of (len(step_scales), len(edge_scales)) arrays
+    '''
+    step_scales = np.asarray(step_scales, dtype=float)
+    edge_scales = np.asarray(edge_scales, dtype=float)
+    shape = (len(step_scales), len(edge_scales))
+    s, e = np.meshgrid(step_scales, edge_scales, indexing="ij")
+    sets = s.size
+    offsets = np.broadcast_to(_offsets(1, trials, max_offset, seed), (sets, trials)).reshape(-1)
+    steps = np.repeat(s.reshape(-1, 1) * np.array(LADDER_STEPS), trials, axis=0)
+    edges = np.repeat(e.reshape(-1, 1) * np.array(LADDER_EDGES), trials, axis=0)
+    settle, rms, failed = _parallel(simulate_ladder, (steps, edges, offsets), (plant, koef, iterations, tolerance),
+                                    processes, seed)
+    return _surface(settle, rms, failed, shape, trials, iterations, plant.period)
+
+
+def max_dev_surface(plant: PlantModel, max_devs, koef_scales, koef = cDependFrequencyPID, trials = 16,
+                    max_offset = 2e-03, iterations = 500, tolerance = 1e-06, processes = None, seed = 0):
+    '''
+        Settle time and rms error of wl_stabilisation_through_PID_const for every pair of max_dev and
+        koef (koef * koef_scale, the error of the koef the controller is given)
+
+        :return: (mean settle time in s, mean rms error in THz, share of runs which didn't settle) - tuple pack
+                 of (len(max_devs), len(koef_scales)) arrays
+    '''
+    max_devs = np.asarray(max_devs, dtype=float)
+    koef_scales = np.asarray(koef_scales, dtype=float)
+    shape = (len(max_devs), len(koef_scales))
+    m, k = np.meshgrid(max_devs, koef_scales * koef, indexing="ij")
+    sets = m.size
+    offsets = np.broadcast_to(_offsets(1, trials, max_offset, seed), (sets, trials)).reshape(-1)
+    settle, rms, failed = _parallel(simulate_max_dev, (np.repeat(m.reshape(-1), trials), np.repeat(k.reshape(-1), trials),
+                                                     offsets), (plant, iterations, tolerance), processes, seed)
+    return _surface(settle, rms, failed, shape, trials, iterations, plant.period)
+
+
+def _surface(settle, rms, failed, shape, trials, iterations, period):
+    unsettled = (settle >= iterations) | failed
+    settle = np.where(failed, iterations, settle).reshape(shape + (trials,))
+    return (settle.mean(axis=2) * period, rms.reshape(shape + (trials,)).mean(axis=2),
+            unsettled.reshape(shape + (trials,)).mean(axis=2))
@@ -216,7 +216,8 @@ def set_PID_const(chan: int, value: float):
 # In gui could be setting of channel (chan), choosing the units (mode) i.e. nm/THZ, timer to wait after each setting of PID (time_pause),
 # start point for PID and channel to use.
 # the method should be made as a separate process
-def reference_const_PID_stabilisator(mode: bool,  reference_wl: float, koef: float, max_PID_val: int, time_pause: int,  start_PID_point = 4096/2, chan = 1):
+def reference_const_PID_stabilisator(mode: bool,  reference_wl: float, koef: float, max_PID_val: int, time_pause: int,  start_PID_point = 4096/2, chan = 1,
+                                     callback = None, detector = None, profiler = None):
     '''
         The function stabilises the reference value of frequency
         2nd version of algorithm
@@ -228,6 +229,11 @@ def reference_const_PID_stabilisator(mode: bool,  reference_wl: float, koef: flo
         :param time_pause: pause after setting value needed
         :param start_PID_point: starting point of PID setting.
         :param chan: shows the channel to use
+        :param callback: function called every iteration as callback(PID_current, frequency, delta, stabilised).
+                         If it returns True the stabilisation stops. On a WLM error frequency is the error code
+                         (<= 0), delta is 0 and PID is held
+        :param detector: ModeHopDetector or None. On a mode hop PID isn't stepped until the laser settles
+        :param profiler: LoopProfiler timing the phases of the iterations or None
         :return: nothing or -42 (PID is out of range)
     '''
     stabilised = False
@@ -237,13 +243,48 @@ def reference_const_PID_stabilisator(mode: bool,  reference_wl: float, koef: flo
     if(not mode):
         reference = wlmData.dll.ConvertUnit(reference, wlmConst.cReturnWavelengthVac,
                                 wlmConst.cReturnFrequency)
+    if(detector is not None):
+        detector.reset()
+        # recover() must wait for the laser of this channel
+        detector.chan = chan
     while(True):
+        if(profiler is not None):
+            profiler.begin()
+        applied_step = 0
         if(not stabilised):
             PID_current = PID_current + PID_step
+            applied_step = PID_step
             wlmData.dll.SetDeviationSignalNum(chan, PID_current)
+            if(profiler is not None):
+                profiler.mark("set")
             time.sleep(time_pause / 1000)
-        wave_current = wlmData.dll.ConvertUnit(wlmData.dll.GetWavelengthNum(chan, 0), wlmConst.cReturnWavelengthVac,
-                                       wlmConst.cReturnFrequency)
+            if(profiler is not None):
+                profiler.mark("wait")
+        wave_current = wlmData.dll.GetWavelengthNum(chan, 0)
+        if(profiler is not None):
+            profiler.mark("read")
+        wave_current = wlmData.dll.ConvertUnit(wave_current, wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency)
+        if(profiler is not None):
+            profiler.mark("convert")
+        if(detector is not None and detector.update(applied_step, wave_current)):
+            # mode hop: the jump of frequency says nothing about PID, so hold PID until the laser settles
+            PID_step = 0
+            stabilised = False
+            # the callback is still called while waiting, so the stabiliser can be stopped
+            def settling(frequency):
+                delta = reference - frequency if frequency > 0 else 0.
+                return callback is not None and callback(PID_current, frequency, delta, False)
+            if(detector.recover(settling) is None):
+                return
+            continue
+        if(wave_current <= 0):
+            # WLM error (low signal, overexposed...): the value says nothing about PID, so PID is held and
+            # the callback gets the error code as the frequency
+            PID_step = 0
+            stabilised = False
+            if(callback is not None and callback(PID_current, wave_current, 0., False)):
+                return
+            continue
         delta = reference - wave_current
         abs_dev = abs(delta)
         # 0.125 changes in 180 kHz. it's the 7th from point int THz view of freq
@@ -274,12 +315,20 @@ def reference_const_PID_stabilisator(mode: bool,  reference_wl: float, koef: flo
                 PID_step = 156.25
         elif(abs_dev > 10e-04 ):
             PID_step = delta / koef
+        if(detector is not None):
+            PID_step = detector.limit(PID_step)
         if(( PID_current + PID_step ) > max_PID_val or ( PID_current + PID_step ) < 0):
             return -42
         if(round(delta,7) == 0.0000000):
             stabilised = True
         elif(stabilised):
             stabilised = False
+        if(profiler is not None):
+            profiler.mark("compute")
+        if(callback is not None and callback(PID_current, wave_current, delta, stabilised)):
+            return
+        if(profiler is not None):
+            profiler.mark("callback")
 
 # this method could be called with some timing as a separate process
 # In UI could've been made Timing field, field that shows the result that refreshes every "timing" ms
@@ -398,9 +447,19 @@ def wavelength_regulation(cycle_steps, initial_wave, delta_wave, time_pause_set,
         The function uses SetPIDCourse, hence we need PID regulator on when use
         it.
     '''
-    d = {}
+    return dict(iter_wavelength_regulation(cycle_steps, initial_wave, delta_wave, time_pause_set, time_pause_getpwr,
+                                           wl_precision))
+
+def iter_wavelength_regulation(cycle_steps, initial_wave, delta_wave, time_pause_set, time_pause_getpwr, wl_precision):
+    '''
+        The same as wavelength_regulation but yields every step as soon as it's measured, so a sweep of any
+        length takes constant memory and the consumer can stop it any time (e.g. when a mode is found)
+
+        :param cycle_steps: how many cycles of 'set - measure' do we need, None - no limit
+        :return: generator of (i, (time, wavelength set, wavelength got, power)) tuples, i from 1
+    '''
     i = 1
-    while(i <= cycle_steps):
+    while(cycle_steps is None or i <= cycle_steps):
         wl_set = round(initial_wave + i*delta_wave, wl_precision)
         time1 = time.time()
         set_wl2(wl_set)
@@ -409,9 +468,8 @@ def wavelength_regulation(cycle_steps, initial_wave, delta_wave, time_pause_set,
         power1 = round(wlmData.dll.GetPowerNum(1,0),2)
         time.sleep(time_pause_getpwr * 0.001)
         time2 = time.time()
-        d[i] = (round((time2-time1)*1000,2), wl_set, wavelength1, power1)
+        yield i, (round((time2-time1)*1000,2), wl_set, wavelength1, power1)
         i+=1
-    return d
 
 def wavelength_PID_bond(points, PID_step, PID_start, expo_time):
     '''
@@ -425,17 +483,29 @@ def wavelength_PID_bond(points, PID_step, PID_start, expo_time):
 
         Comment: here wavelength is in [nm]
     '''
+    return dict(iter_wavelength_PID_bond(points, PID_step, PID_start, expo_time))
+
+def iter_wavelength_PID_bond(points, PID_step, PID_start, expo_time):
+    '''
+        The same as wavelength_PID_bond but yields every point as soon as it's measured.
+        PID goes back to PID_start also when the consumer stops early (closes the generator)
+
+        :param points: the number of PID points, None - until PID leaves [0, 4096] mV
+        :return: generator of (i, (PID, wavelength)) tuples
+    '''
     i = 0
-    d = {}
-    while (i < points):
-        PID = PID_start + i*PID_step
-        wlmData.dll.SetDeviationSignalNum(1, PID)
-        time.sleep((expo_time)/1000)
-        wave = wlmData.dll.GetWavelengthNum(1, 0)
-        d[i] = (PID, wave)
-        i+=1
-    wlmData.dll.SetDeviationSignalNum(1, PID_start)
-    return d
+    try:
+        while (points is None or i < points):
+            PID = PID_start + i*PID_step
+            if(points is None and (PID < 0 or PID > 4096)):
+                break
+            wlmData.dll.SetDeviationSignalNum(1, PID)
+            time.sleep((expo_time)/1000)
+            wave = wlmData.dll.GetWavelengthNum(1, 0)
+            yield i, (PID, wave)
+            i+=1
+    finally:
+        wlmData.dll.SetDeviationSignalNum(1, PID_start)
 
 # Don't need it really. Better to make general plotter than. To reduce code for plotting
 def plot_wavelength_PID_bond(points, PID_step):
@@ -476,7 +546,8 @@ def wl_stabilisation_after_set(wave, time_pause, precision):
     return round((time2-time1)*1000,2)
 
 # obsolete version of stabiliser
-def wl_stabilisation_through_PID_const(reference_wl, koef, max_dev, time_pause, timer, start_PID_point = 1860):
+def wl_stabilisation_through_PID_const(reference_wl, koef, max_dev, time_pause, timer, start_PID_point = 1860,
+                                       profiler = None):
     '''
         Function stabilises the wavelength on reference_val
         1st version of algorithm
@@ -487,6 +558,7 @@ def wl_stabilisation_through_PID_const(reference_wl, koef, max_dev, time_pause,
         :param time_pause: pause after setting PID inside alg-m
         :param timer: lifetime of function in sec
         :param start_PID_point: start point for al-m to change PID
+        :param profiler: LoopProfiler timing the phases of the iterations or None
         :return:
     '''
     flag = False
@@ -506,7 +578,11 @@ def wl_stabilisation_through_PID_const(reference_wl, koef, max_dev, time_pause,
     wave = wlmData.dll.ConvertUnit(wlmData.dll.GetWavelengthNum(1, 0), wlmConst.cReturnWavelengthVac,
                                    wlmConst.cReturnFrequency)
     while(True):
+        if(profiler is not None):
+            profiler.begin()
         current = wlmData.dll.GetDeviationSignalNum(1,0)
+        if(profiler is not None):
+            profiler.mark("read")
         delta = reference_wl_Thz - wave
         if(flag2):
             if (delta > 0):
@@ -530,11 +606,21 @@ def wl_stabilisation_through_PID_const(reference_wl, koef, max_dev, time_pause,
         elif(flag):
             flag = False
             flag2 = True
+        if(profiler is not None):
+            profiler.mark("compute")
         if(not flag):
             wlmData.dll.SetDeviationSignalNum(1, current + PID_step)
+            if(profiler is not None):
+                profiler.mark("set")
         time.sleep(time_pause/1000)
-        wave = wlmData.dll.ConvertUnit(wlmData.dll.GetWavelengthNum(1, 0), wlmConst.cReturnWavelengthVac,
-                                       wlmConst.cReturnFrequency)
+        if(profiler is not None):
+            profiler.mark("wait")
+        wave = wlmData.dll.GetWavelengthNum(1, 0)
+        if(profiler is not None):
+            profiler.mark("read")
+        wave = wlmData.dll.ConvertUnit(wave, wlmConst.cReturnWavelengthVac, wlmConst.cReturnFrequency)
+        if(profiler is not None):
+            profiler.mark("convert")
         PID_prev = PID_step
         time2 = time.time()
         if((time2-time1)>timer):